@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+
+##################################################
+# chart_values.py
+#
+# Builds the values file for the CORTX Helm chart from a
+# solution.yaml file.
+#
+# This produces the same values as the buildValues function
+# in deploy-cortx-cloud.sh, but builds them in memory and
+# writes the file once, instead of rewriting it with a
+# sequence of "yq -i" invocations.  deploy-cortx-cloud.sh
+# runs it when python3 and PyYAML are available, and uses
+# yq only when they are not.
+#
+# With --dry-run, the values are compared to a values file
+# generated by deploy-cortx-cloud.sh instead of written,
+# and any differences are printed.
+#
+##################################################
+
+import argparse
+import copy
+import difflib
+import os
+import re
+import sys
+
+import yaml
+
+from cortx_solution import merge
+from k8s import kubectl_json, node_schedulable
+
+
+# Maximum number of consul and kafka/zookeeper replicas
+MAX_CONSUL_REPLICAS = 3
+MAX_KAFKA_REPLICAS = 3
+
+DEFAULT_BLOCK_STORAGE_CLASS = 'cortx-local-block-storage'
+
+IMAGE_RE = re.compile(r'(?P<registry>.*?)/(?P<repository>.*):(?P<tag>.*)')
+
+
+def get_path(data, path):
+    """Return the value at a dot-separated path, or None if missing."""
+    for key in path.split('.'):
+        if not isinstance(data, dict):
+            return None
+        data = data.get(key)
+    return data
+
+
+def set_path(data, path, value):
+    """Set the value at a dot-separated path, creating maps as needed."""
+    keys = path.split('.')
+    for key in keys[:-1]:
+        if not isinstance(data.get(key), dict):
+            data[key] = {}
+        data = data[key]
+    data[keys[-1]] = value
+
+
+def split_image(image):
+    """Split an image name into registry, repository and tag."""
+    m = IMAGE_RE.match(image or '')
+    return m.groupdict() if m else {}
+
+
+def count_worker_nodes():
+    """Return the number of cluster nodes that allow scheduling."""
+    nodes = kubectl_json(['get', 'nodes'])['items']
+    return sum(1 for node in nodes if node_schedulable(node))
+
+
+def build_values(solution, num_worker_nodes, secret_name=None,
+                 block_storage_class=DEFAULT_BLOCK_STORAGE_CLASS):
+    """Return the CORTX chart values for a solution.
+
+       Arguments:
+           solution: The "solution" dict of a solution.yaml file.
+           num_worker_nodes: Number of schedulable nodes in the
+                  Kubernetes cluster.  Used for consul/kafka replicas.
+           secret_name: Name of the CORTX secret.  Defaults to
+                  solution.secrets.name or
+                  solution.secrets.external_secret.
+           block_storage_class: Storage class of the block devices.
+    """
+    def sol(path):
+        # Values are copied so the result never aliases the solution
+        return copy.deepcopy(get_path(solution, path))
+
+    common = 'common.'
+    ra = 'common.resource_allocation.'
+
+    if secret_name is None:
+        secret_name = (sol('secrets.name') or
+                       sol('secrets.external_secret') or '')
+
+    num_motr_client = sol(common + 'motr.num_client_inst') or 0
+    data_only = solution['deployment_type'] == 'data-only'
+    components = {
+        'server': not data_only,
+        'ha': not data_only,
+        'control': not data_only,
+        'client': num_motr_client >= 1,
+    }
+
+    num_consul_replicas = min(num_worker_nodes, MAX_CONSUL_REPLICAS)
+    num_kafka_replicas = min(num_worker_nodes, MAX_KAFKA_REPLICAS)
+    data_node_count = len(solution['storage_sets'][0]['nodes'])
+    total_server_pods = (data_node_count *
+                         sol(common + 's3.instances_per_node'))
+
+    values = {}
+
+    def v(path, value):
+        set_path(values, path, value)
+
+    v('global.storageClass', 'local-path')
+    v('consul.server.storageClass', 'local-path')
+    v('existingSecret', secret_name)
+    v('existingCertificateSecret', sol(common + 'ssl.external_secret') or '')
+    v('global.cortx.setupLoggingDetail', 'component')
+
+    values['consul']['server'] = merge(values['consul']['server'],
+                                       sol(ra + 'consul.server'))
+    v('consul.client', sol(ra + 'consul.client'))
+    for key in values['consul']:
+        if isinstance(values['consul'][key], dict):
+            values['consul'][key]['image'] = sol('images.consul')
+    v('consul.server.replicas', num_consul_replicas)
+
+    images = solution.get('images') or {}
+    v('kafka.image', split_image(images.get('kafka')))
+    v('kafka.zookeeper.image', split_image(images.get('zookeeper')))
+    v('control.image', split_image(images.get('cortxcontrol')))
+    v('ha.image', split_image(images.get('cortxha')))
+    v('server.image', split_image(images.get('cortxserver')))
+    v('data.image', split_image(images.get('cortxdata')))
+    v('client.image', split_image(images.get('cortxclient')))
+
+    v('kafka.resources', sol(ra + 'kafka.resources'))
+    v('kafka.persistence.size', sol(ra + 'kafka.storage_request_size'))
+    v('kafka.zookeeper.resources', sol(ra + 'zookeeper.resources'))
+    v('kafka.zookeeper.persistence.size',
+      sol(ra + 'zookeeper.storage_request_size'))
+    for key in ('replicaCount', 'defaultReplicationFactor',
+                'offsetsTopicReplicationFactor',
+                'transactionStateLogReplicationFactor',
+                'zookeeper.replicaCount'):
+        v('kafka.' + key, num_kafka_replicas)
+
+    v('server.auth.adminUser', sol(common + 's3.default_iam_users.auth_user'))
+    v('server.auth.adminAccessKey',
+      sol(common + 's3.default_iam_users.auth_admin'))
+    v('server.maxStartTimeout', sol(common + 's3.max_start_timeout'))
+    v('server.extraConfiguration', sol(common + 's3.extra_configuration'))
+    v('server.rgw.resources', sol(ra + 'server.rgw.resources'))
+
+    for component, enabled in components.items():
+        v(component + '.enabled', enabled)
+
+    storage_sets = []
+    for storage_set in sol('storage_sets'):
+        storage_sets.append({
+            ('containerGroupSize' if key == 'container_group_size' else key):
+            value for key, value in storage_set.items() if key != 'nodes'})
+    v('storageSets', storage_sets)
+
+    s3 = common + 'external_services.s3.'
+    for port in ('http', 'https'):
+        node_port = sol(s3 + 'nodePorts.' + port)
+        if node_port is not None and node_port != '':
+            v('server.service.nodePorts.' + port, node_port)
+    v('server.service.type', sol(s3 + 'type'))
+    v('server.service.instanceCount', sol(s3 + 'count'))
+    v('server.service.ports.http', sol(s3 + 'ports.http'))
+    v('server.service.ports.https', sol(s3 + 'ports.https'))
+
+    control = common + 'external_services.control.'
+    agent = ra + 'control.agent.resources.'
+    v('control.service.type', sol(control + 'type'))
+    v('control.service.ports.https', sol(control + 'ports.https'))
+    for key in ('requests.memory', 'requests.cpu',
+                'limits.memory', 'limits.cpu'):
+        v('control.agent.resources.' + key, sol(agent + key))
+    node_port = sol(control + 'nodePorts.https')
+    if node_port is not None and node_port != '':
+        v('control.service.nodePorts.https', node_port)
+
+    v('ha.faultTolerance.resources',
+      sol(ra + 'ha.fault_tolerance.resources'))
+    v('ha.healthMonitor.resources', sol(ra + 'ha.health_monitor.resources'))
+    v('ha.k8sMonitor.resources', sol(ra + 'ha.k8s_monitor.resources'))
+
+    v('server.replicaCount', total_server_pods)
+
+    v('hare.hax.ports.http.protocol', sol(common + 'hax.protocol'))
+    v('data.replicaCount', data_node_count)
+    v('data.blockDevicePersistence.storageClass', block_storage_class)
+
+    v('hare.hax.ports.http.port', sol(common + 'hax.port_num'))
+    v('hare.hax.resources', sol(ra + 'hare.hax.resources'))
+    v('data.extraConfiguration', sol(common + 'motr.extra_configuration'))
+    v('data.ios.resources', sol(ra + 'data.motr.resources'))
+    v('data.confd.resources', sol(ra + 'data.confd.resources'))
+
+    v('client.replicaCount', data_node_count if components['client'] else 0)
+    v('client.instanceCount', num_motr_client)
+
+    return values
+
+
+def diff_values(expected, actual, expected_name='expected',
+                actual_name='actual'):
+    """Return a unified diff of two values dicts, ignoring key order."""
+    def lines(data):
+        return yaml.safe_dump(data, default_flow_style=False,
+                              sort_keys=True).splitlines(keepends=True)
+    return ''.join(difflib.unified_diff(lines(expected), lines(actual),
+                                        expected_name, actual_name))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Generate CORTX Helm chart values from a solution file')
+    parser.add_argument('-s', '--solution', required=True)
+    parser.add_argument('-o', '--output', default='cortx-values.yaml')
+    parser.add_argument('--worker-nodes', type=int,
+                        help='Number of schedulable nodes.  If not '
+                             'specified, the cluster is queried.')
+    parser.add_argument('--secret-name')
+    parser.add_argument('--dry-run', metavar='VALUES_FILE',
+                        help='Compare with VALUES_FILE (e.g. generated by '
+                             'deploy-cortx-cloud.sh) instead of writing '
+                             'the output')
+    args = parser.parse_args()
+
+    solution = yaml.safe_load(open(args.solution))['solution']
+    num_worker_nodes = args.worker_nodes
+    if num_worker_nodes is None:
+        num_worker_nodes = count_worker_nodes()
+    block_storage_class = os.environ.get(
+        'CORTX_DEPLOY_CUSTOM_BLOCK_STORAGE_CLASS', DEFAULT_BLOCK_STORAGE_CLASS)
+
+    values = build_values(solution, num_worker_nodes, args.secret_name,
+                          block_storage_class)
+
+    if args.dry_run:
+        reference = yaml.safe_load(open(args.dry_run))
+        diff = diff_values(reference, values, args.dry_run, 'generated')
+        if diff:
+            sys.stdout.write(diff)
+            sys.exit(1)
+        print(f'Generated values match {args.dry_run}')
+        sys.exit(0)
+
+    with open(args.output, 'w') as f:
+        yaml.safe_dump(values, f, default_flow_style=False, sort_keys=False)
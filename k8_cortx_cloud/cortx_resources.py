@@ -0,0 +1,119 @@
+##################################################
+# cortx_resources.py
+#
+# Kubernetes quantity parsing and the CPU and memory
+# requests of the CORTX pods, from the resource_allocation
+# section of a solution file.
+#
+# Shared by plan-cortx-cloud.py, which sizes clusters, and
+# test/regression/preflight.py, which checks the nodes of
+# a cluster before a deployment.
+#
+##################################################
+
+import math
+
+
+# Limits applied by deploy-cortx-cloud.sh
+MAX_CONSUL_INST = 3
+MAX_KAFKA_INST = 3
+
+MEMORY_UNITS = {
+    'Ki': 2**10, 'Mi': 2**20, 'Gi': 2**30, 'Ti': 2**40, 'Pi': 2**50,
+    'k': 10**3, 'K': 10**3, 'M': 10**6, 'G': 10**9, 'T': 10**12,
+    'P': 10**15,
+}
+
+
+def parse_memory(value):
+    """Convert a Kubernetes quantity such as "512Mi" or "1G" to bytes."""
+    value = str(value).strip()
+    for unit in sorted(MEMORY_UNITS, key=len, reverse=True):
+        if value.endswith(unit):
+            return float(value[:-len(unit)]) * MEMORY_UNITS[unit]
+    return float(value)
+
+
+def parse_cpu(value):
+    """Convert a Kubernetes CPU quantity such as "250m" or "2" to cores."""
+    value = str(value).strip()
+    if value.endswith('m'):
+        return float(value[:-1]) / 1000
+    return float(value)
+
+
+class Requests:
+    def __init__(self, cpu=0.0, memory=0.0):
+        """CPU (cores) and memory (bytes) requested by containers."""
+        self.cpu = cpu
+        self.memory = memory
+
+    @classmethod
+    def from_resources(cls, resources):
+        requests = (resources or {}).get('resources', {}).get('requests', {})
+        return cls(parse_cpu(requests.get('cpu', 0)),
+                   parse_memory(requests.get('memory', 0)))
+
+    def __add__(self, other):
+        return Requests(self.cpu + other.cpu, self.memory + other.memory)
+
+    def __mul__(self, count):
+        return Requests(self.cpu * count, self.memory * count)
+
+
+class ResourceModel:
+    def __init__(self, solution):
+        """Pods and resource requests of a deployment, from a solution.
+
+           Follows deploy-cortx-cloud.sh: one data pod per CVG group and
+           s3.instances_per_node server pods on every node, one consul
+           client per node, and up to MAX_CONSUL_INST consul servers and
+           MAX_KAFKA_INST kafka and zookeeper pods.
+
+           Arguments:
+               solution: The "solution" dict of a solution.yaml file.
+        """
+        common = solution['common']
+        alloc = common['resource_allocation']
+        self.data_only = solution.get('deployment_type') == 'data-only'
+        self.servers_per_node = 0 if self.data_only else \
+            int(common['s3']['instances_per_node'])
+        self.clients_per_node = \
+            1 if common['motr'].get('num_client_inst') else 0
+
+        hax = Requests.from_resources(alloc['hare']['hax'])
+        self.ios = Requests.from_resources(alloc['data']['motr'])
+        self.data_pod = hax + Requests.from_resources(alloc['data']['confd'])
+        self.server_pod = hax + Requests.from_resources(alloc['server']['rgw'])
+        self.client_pod = hax
+        self.consul_client = Requests.from_resources(alloc['consul']['client'])
+        self.consul_server = Requests.from_resources(alloc['consul']['server'])
+        self.kafka = Requests.from_resources(alloc['kafka'])
+        self.zookeeper = Requests.from_resources(alloc['zookeeper'])
+        self.singletons = Requests()
+        self.singleton_count = 0
+        if not self.data_only:
+            ha = alloc['ha']
+            self.singletons = (
+                Requests.from_resources(alloc['control']['agent']) +
+                Requests.from_resources(ha['fault_tolerance']) +
+                Requests.from_resources(ha['health_monitor']) +
+                Requests.from_resources(ha['k8s_monitor']))
+            self.singleton_count = 2
+
+    @staticmethod
+    def groups(cvgs, group_size):
+        """Return the number of data pods for cvgs CVGs per node."""
+        return math.ceil(cvgs / int(group_size or 1))
+
+    def local(self, groups, cvgs):
+        """Return the Requests of the pods placed on every node."""
+        return (self.data_pod * groups + self.ios * cvgs +
+                self.server_pod * self.servers_per_node +
+                self.client_pod * self.clients_per_node +
+                self.consul_client)
+
+    def spread(self, consul_servers, kafka_replicas):
+        """Return the Requests of the pods placed on some nodes only."""
+        return (self.singletons + self.consul_server * consul_servers +
+                (self.kafka + self.zookeeper) * kafka_replicas)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+
+##################################################
+# cortx_solution.py
+#
+# Reads values from a solution.yaml file.
+#
+# SolutionIndex parses a solution file once and answers
+# any number of path lookups (including glob patterns in
+# the style of parse_scripts/parse_yaml.sh) from a flat
+# index.  Run as a script, it prints a batch of values in
+# a shell-eval-able or JSON form, so a shell script can get
+# all the values it needs with a single process.
+#
+# deploy-cortx-cloud.sh, prereq-deploy-cortx-cloud.sh and
+# logs-cortx-cloud.sh use it when python3 and PyYAML are
+# available, and parse_yaml.sh otherwise.
+#
+# merge() deep merges solution data with the semantics of
+# the yq "*" operator.
+#
+##################################################
+
+import argparse
+import fnmatch
+import json
+import re
+import shlex
+import sys
+
+import yaml
+
+
+def merge(base, override):
+    """Deep merge override into base, with yq "*" semantics.
+
+       Neither argument is modified.  The result shares unmodified
+       subtrees with the inputs, so it must be treated as read-only
+       (or deep-copied before being changed).
+    """
+    if not isinstance(base, dict) or not isinstance(override, dict):
+        return override
+    merged = dict(base)
+    for key, value in override.items():
+        if key in merged:
+            merged[key] = merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def _scalar_str(value):
+    """Format a scalar the way it appears in YAML (null is "")."""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    return str(value)
+
+
+def flatten(data, prefix=''):
+    """Yield (path, value) for every scalar in data, in document order.
+
+       Paths are dot-separated map keys, e.g. "solution.namespace".
+       As with parse_yaml.sh, list items do not add a path component,
+       so several entries may share a path.
+    """
+    if isinstance(data, dict):
+        for key, value in data.items():
+            yield from flatten(value, f'{prefix}{key}.')
+    elif isinstance(data, list):
+        for item in data:
+            yield from flatten(item, prefix)
+    else:
+        yield prefix[:-1], data
+
+
+class SolutionIndex:
+    def __init__(self, data):
+        """Flattened path -> value index of a solution.
+
+           Arguments:
+               data: Parsed solution data, or the name of a solution
+                     file to load.
+        """
+        if isinstance(data, str):
+            with open(data) as f:
+                data = yaml.safe_load(f)
+        self.data = data
+        self.entries = list(flatten(data))
+        self.by_path = {}
+        for path, value in self.entries:
+            self.by_path.setdefault(path, []).append(value)
+        self._patterns = {}
+
+    def get(self, path, default=None):
+        """Return the (first) value at path, or default.
+
+           A YAML null returns default, as getSolutionValue does.
+        """
+        values = self.by_path.get(path)
+        if not values or values[0] is None:
+            return default
+        return values[0]
+
+    def getall(self, path):
+        """Return all values at path (more than one if inside lists)."""
+        return list(self.by_path.get(path, []))
+
+    def glob(self, pattern):
+        """Return [(path, value)] for all entries matching a glob."""
+        if '*' not in pattern and '?' not in pattern and '[' not in pattern:
+            return [(pattern, v) for v in self.by_path.get(pattern, [])]
+        regex = self._patterns.get(pattern)
+        if regex is None:
+            regex = re.compile(fnmatch.translate(pattern))
+            self._patterns[pattern] = regex
+        return [(path, value) for path, value in self.entries
+                if regex.match(path)]
+
+    def parse_yaml(self, pattern):
+        """Return glob matches formatted like parse_yaml.sh output."""
+        return ';'.join(f'{path}>{_scalar_str(value)}'
+                        for path, value in self.glob(pattern)
+                        if _scalar_str(value))
+
+    def query(self, queries):
+        """Look up a batch of paths.
+
+           queries is a list of "name=path" or "path" strings.  Returns
+           a dict of name to value string.  If no name is given, the
+           name is the path with non-alphanumerics replaced by "_".
+           A glob path gives the matches in parse_yaml.sh format.
+        """
+        results = {}
+        for query in queries:
+            name, sep, path = query.partition('=')
+            if not sep:
+                path = name
+                name = re.sub(r'\W', '_', path)
+            if any(c in path for c in '*?['):
+                results[name] = self.parse_yaml(path)
+            else:
+                results[name] = _scalar_str(self.get(path))
+        return results
+
+    def values(self):
+        """Return a dict of every path to its (first) value string."""
+        return {path: _scalar_str(self.get(path)) for path in self.by_path}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Look up values in a solution.yaml file')
+    parser.add_argument('solution', help='solution.yaml file')
+    parser.add_argument('queries', nargs='*', metavar='[NAME=]PATH',
+                        help='YAML path to look up, e.g. '
+                             'namespace=solution.namespace.  With --array, '
+                             'every path is looked up if none are given.')
+    parser.add_argument('--format', choices=['shell', 'json'],
+                        default='shell',
+                        help='Print NAME=value lines for "eval", '
+                             'or a JSON object')
+    parser.add_argument('--array', metavar='NAME',
+                        help='With --format shell, print a single bash '
+                             'associative array declaration of NAME '
+                             'instead, indexed by NAME (or PATH)')
+    args = parser.parse_args()
+    if not args.queries and not args.array:
+        parser.error('no PATH given')
+
+    index = SolutionIndex(args.solution)
+    results = index.query(args.queries) if args.queries else index.values()
+    if args.format == 'json':
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    elif args.array:
+        items = ' '.join(f'[{shlex.quote(name)}]={shlex.quote(value)}'
+                         for name, value in results.items())
+        print(f'declare -gA {args.array}=({items})')
+    else:
+        for name, value in results.items():
+            print(f'{name}={shlex.quote(value)}')
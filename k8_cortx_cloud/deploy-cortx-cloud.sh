@@ -19,9 +19,35 @@ readonly cortx_secret_fields
 readonly cortx_localblockstorage_storageclassname=${CORTX_DEPLOY_CUSTOM_BLOCK_STORAGE_CLASS:-"cortx-local-block-storage"}
 readonly cortx_localblockstorage_skipdeployment=${CORTX_DEPLOY_CUSTOM_BLOCK_STORAGE_CLASS:-}
 
+# The Python helpers in this directory are used when python3 and PyYAML
+# are available.  Otherwise, the solution file is read with parse_yaml.sh
+# and yq.  Either way, a helper that fails makes the deployment fail.
+if python3 -c 'import yaml' &> /dev/null; then
+    readonly use_python=true
+else
+    readonly use_python=false
+fi
+
 # Enabled/disabled flags for components
 declare -A components
 
+# Every scalar of the solution file, by path, when use_python is true
+declare -A solution_values
+
+#######################################
+# Load all values of the solution file with a single cortx_solution.py
+# call, for getSolutionValue.
+#######################################
+function loadSolutionValues()
+{
+    local values
+    if ! values=$(python3 cortx_solution.py --array solution_values "${solution_yaml}"); then
+        echo "ERROR: Failed to read ${solution_yaml}"
+        exit 1
+    fi
+    eval "${values}"
+}
+
 function parseSolution()
 {
     ./parse_scripts/parse_yaml.sh "${solution_yaml}" "$1"
@@ -51,6 +77,11 @@ function getSolutionValue()
         return 1
     fi
 
+    if [[ ${use_python} == true ]]; then
+        echo "${solution_values[${yaml_path}]:-}"
+        return 0
+    fi
+
     local value
     value=$(parseSolution "${yaml_path}")
     # discard everything before and including the first '>'
@@ -68,6 +99,8 @@ function configurationCheck()
         exit 1
     fi
 
+    [[ ${use_python} == true ]] && loadSolutionValues
+
     # The deployment type determines which components are enabled
     components=(
         [client]=true
@@ -148,7 +181,30 @@ function configurationCheck()
 }
 
 # Generate a values.yaml file for the CORTX Helm Chart
+#
+# When python3 and PyYAML are available, the values are built in a single
+# pass by chart_values.py.  Otherwise, they are built with the sequence of
+# yq calls in buildValuesWithYq.
 buildValues() {
+    local -r values_file="$1"
+
+    if [[ ${use_python} == false ]]; then
+        buildValuesWithYq "${values_file}"
+        return
+    fi
+
+    if ! CORTX_DEPLOY_CUSTOM_BLOCK_STORAGE_CLASS="${cortx_localblockstorage_storageclassname}" \
+        python3 chart_values.py \
+            --solution "${solution_yaml}" \
+            --output "${values_file}" \
+            --worker-nodes "${num_worker_nodes}" \
+            --secret-name "${cortx_secret_name}"; then
+        echo "ERROR: Failed to generate ${values_file}"
+        exit 1
+    fi
+}
+
+buildValuesWithYq() {
     set -eu
 
     local -r values_file="$1"
@@ -391,8 +447,7 @@ fi
 
 printf "\n"
 
-namespace=$(parseSolution 'solution.namespace')
-namespace=$(echo "${namespace}" | cut -f2 -d'>')
+namespace=$(getSolutionValue 'solution.namespace')
 
 # Split parsed output into an array of vars and vals
 IFS=',' read -r -a parsed_node_array < <(yq e '.solution.storage_sets[0].nodes' --output-format=csv "${solution_yaml}")
@@ -448,13 +503,11 @@ function deployRancherProvisioner()
     mkdir -p "${rancher_prov_path}"
     rancher_prov_file="${rancher_prov_path}/local-path-storage.yaml"
     cp "$(pwd)/cortx-cloud-3rd-party-pkg/templates/local-path-storage-template.yaml" "${rancher_prov_file}"
-    image=$(parseSolution 'solution.images.rancher')
-    image=$(echo "${image}" | cut -f2 -d'>')
+    image=$(getSolutionValue 'solution.images.rancher')
     ./parse_scripts/subst.sh "${rancher_prov_file}" "rancher.image" "${image}"
     ./parse_scripts/subst.sh "${rancher_prov_file}" "rancher.host_path" "${storage_prov_path}/local-path-provisioner"
 
-    image=$(parseSolution 'solution.images.busybox')
-    image=$(echo "${image}" | cut -f2 -d'>')
+    image=$(getSolutionValue 'solution.images.busybox')
     ./parse_scripts/subst.sh "${rancher_prov_file}" "rancher.helperPod.image" "${image}"
 
     kubectl apply -f "${rancher_prov_file}"
@@ -621,6 +674,16 @@ function waitForClusterReady()
 
     printf "\nNow waiting for all CORTX resources to become available, press Ctrl-C to quit...\n\n"
 
+    local -i rc=0
+
+    if [[ ${use_python} == true ]]; then
+        # Watch all CORTX pods with one connection, show a table of the
+        # ready replicas of every workload, and report the time to ready
+        python3 rollout.py --solution "${solution_yaml}" || rc=$?
+        set +u
+        return ${rc}
+    fi
+
     trap killBackgroundJobs INT
 
     local pids=()
@@ -652,7 +715,6 @@ function waitForClusterReady()
         pids+=($!)
     fi
 
-    local -i rc=0
     for pid in "${pids[@]}"; do
         wait "${pid}" || rc=$?
     done
@@ -665,7 +727,7 @@ function waitForClusterReady()
 }
 
 # Extract storage provisioner path from the "solution.yaml" file
-storage_prov_path=$(parseSolution solution.common.storage_provisioner_path | cut -f2 -d'>')
+storage_prov_path=$(getSolutionValue 'solution.common.storage_provisioner_path')
 
 # Get number of consul replicas and make sure it doesn't exceed the limit
 num_consul_replicas=${num_worker_nodes}
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+
+##################################################
+# get-logs-from-pvc.py
+#
+# Recovers the contents of PVCs from non-running CORTX
+# containers, like get-logs-from-pvc.sh.
+#
+# Unlike get-logs-from-pvc.sh, which has a Job write a
+# .tgz inside its pod and copies it out once tar is done,
+# this streams tar's output out of the pod as it is
+# produced, and compresses it locally into <PVC>.tgz.
+#
+# The files of a PVC are transferred in chunks of about
+# --chunk-size bytes.  Each chunk becomes a separate gzip
+# member of the output file, and progress is recorded in
+# <PVC>.tgz.state after each chunk.  If a transfer is
+# interrupted, running the command again with --resume
+# continues after the last complete chunk.
+#
+# Several PVCs can be given; up to --jobs of them are
+# transferred concurrently.
+#
+##################################################
+
+import argparse
+import datetime
+import gzip
+import json
+import os
+import subprocess  # nosec
+import sys
+import tarfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+
+
+STARTUP_TIMEOUT = '120s'
+CHUNK_SIZE = 64 * 1024
+DEFAULT_TRANSFER_CHUNK = 256 * 1024 * 1024
+
+JOB_TEMPLATE = '''apiVersion: batch/v1
+kind: Job
+metadata:
+  name: "{job_name}"
+  namespace: "{namespace}"
+spec:
+  template:
+    spec:
+      containers:
+        - image: "{image}"
+          name: tar-pvc
+          command:
+            - sh
+            - -c
+            - |
+              until [ -f /tmp/stopme ]; do
+                sleep 1
+              done
+          volumeMounts:
+            - mountPath: "/etc/{pvc}"
+              name: data
+      volumes:
+        - name: data
+          persistentVolumeClaim:
+            claimName: "{pvc}"
+      restartPolicy: OnFailure
+'''
+
+
+class TransferError(Exception):
+    pass
+
+
+def kubectl(namespace, *args, stdin=None, check=True):
+    cmd = ['kubectl'] + list(args) + [f'--namespace={namespace}']
+    child = subprocess.run(cmd, input=stdin, stdout=subprocess.PIPE,  # nosec B603
+                           stderr=subprocess.PIPE, check=False)
+    if check and child.returncode != 0:
+        raise TransferError(f'{" ".join(cmd)} failed: '
+                            f'{child.stderr.decode().strip()}')
+    return child.stdout.decode()
+
+
+class Progress:
+    def __init__(self):
+        """Byte counts of the transfers in progress, for a status line."""
+        self.lock = threading.Lock()
+        self.totals = {}
+        self.done = {}
+        self.start = time.monotonic()
+
+    def add(self, pvc, total, done=0):
+        with self.lock:
+            self.totals[pvc] = total
+            self.done[pvc] = done
+
+    def update(self, pvc, count):
+        with self.lock:
+            self.done[pvc] += count
+
+    def line(self):
+        with self.lock:
+            done = sum(self.done.values())
+            total = sum(self.totals.values())
+            parts = [f'{pvc}: {self.done[pvc] * 100 // max(self.totals[pvc], 1)}%'
+                     for pvc in self.totals]
+        rate = done / max(time.monotonic() - self.start, 1e-6)
+        return (f'{done / 2**20:.1f}/{total / 2**20:.1f} MiB '
+                f'({rate / 2**20:.1f} MiB/s)  ' + '  '.join(parts))
+
+    def report(self, stop, interval=1.0):
+        """Print a status line every interval seconds until stop is set."""
+        while not stop.wait(interval):
+            print(f'\r{self.line()}', end='', file=sys.stderr, flush=True)
+        print(f'\r{self.line()}', file=sys.stderr, flush=True)
+
+
+class PvcTransfer:
+    def __init__(self, pvc, namespace, image, path=None,
+                 chunk_size=DEFAULT_TRANSFER_CHUNK, progress=None):
+        """Streams the files of one PVC into <pvc>.tgz."""
+        self.pvc = pvc
+        self.namespace = namespace
+        self.image = image
+        self.target = f'{pvc}/{path}' if path else pvc
+        self.chunk_size = chunk_size
+        self.progress = progress or Progress()
+        self.outfile = f'{pvc}.tgz'
+        self.partfile = f'{pvc}.tgz.part'
+        self.statefile = f'{pvc}.tgz.state'
+        datestr = datetime.datetime.now().strftime('%Y%m%d.%H%M%S')
+        self.job_name = f'cortx-log-{pvc}-{datestr}'
+        self.pod = None
+
+    def log(self, msg):
+        print(f'[{self.pvc}] {msg}', file=sys.stderr, flush=True)
+
+    def _start_job(self):
+        self.log(f'Starting job {self.job_name}.')
+        manifest = JOB_TEMPLATE.format(job_name=self.job_name, pvc=self.pvc,
+                                       namespace=self.namespace,
+                                       image=self.image)
+        kubectl(self.namespace, 'apply', '-f', '-', stdin=manifest.encode())
+        kubectl(self.namespace, 'wait', '--for=condition=ready',
+                f'--selector=job-name={self.job_name}',
+                f'--timeout={STARTUP_TIMEOUT}', 'pod')
+        self.pod = kubectl(self.namespace, 'get', 'pods',
+                           f'--selector=job-name={self.job_name}',
+                           '--output=jsonpath={.items[0].metadata.name}')
+        if not self.pod:
+            raise TransferError('Could not get pod name')
+
+    def _stop_job(self):
+        if self.pod:
+            kubectl(self.namespace, 'exec', self.pod, '--', 'touch',
+                    '/tmp/stopme', check=False)
+        kubectl(self.namespace, 'delete', 'job', self.job_name, check=False)
+
+    def _list_files(self):
+        """Return [size, name] of the files to transfer, in tar order."""
+        out = kubectl(self.namespace, 'exec', self.pod, '--', 'sh', '-c',
+                      f'cd /etc && find "{self.target}" -type f '
+                      "-exec stat -c '%s %n' {} +")
+        files = []
+        for line in out.splitlines():
+            size, name = line.split(' ', 1)
+            files.append([int(size), name])
+        return files
+
+    def _chunks(self, files):
+        """Split files into chunks.  Returns (chunks, chunk sizes)."""
+        chunks, sizes = [], []
+        chunk, size = [], 0
+        for file_size, name in files:
+            if chunk and size + file_size > self.chunk_size:
+                chunks.append(chunk)
+                sizes.append(size)
+                chunk, size = [], 0
+            chunk.append(name)
+            size += file_size
+        if chunk:
+            chunks.append(chunk)
+            sizes.append(size)
+        return chunks, sizes
+
+    def _save_state(self, state):
+        tmpfile = self.statefile + '.tmp'
+        with open(tmpfile, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmpfile, self.statefile)
+
+    def _transfer_chunk(self, names, out):
+        """Stream one chunk of files out of the pod as a gzip member."""
+        cmd = ['kubectl', 'exec', '-i', self.pod,
+               f'--namespace={self.namespace}', '--',
+               'tar', 'cf', '-', '-C', '/etc', '-T', '-']
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE,  # nosec B603
+                                stdout=subprocess.PIPE)
+        feeder = threading.Thread(target=self._feed, daemon=True,
+                                  args=(proc.stdin, names))
+        feeder.start()
+        comp = zlib.compressobj(6, zlib.DEFLATED, 31)
+        try:
+            # Members are re-emitted without tar's end-of-archive blocks,
+            # so that the chunks form a single tar stream.
+            with tarfile.open(fileobj=proc.stdout, mode='r|') as tar:
+                for member in tar:
+                    out.write(comp.compress(
+                        member.tobuf(format=tarfile.GNU_FORMAT)))
+                    if not member.isreg():
+                        continue
+                    f = tar.extractfile(member)
+                    for data in iter(lambda f=f: f.read(CHUNK_SIZE), b''):
+                        out.write(comp.compress(data))
+                        self.progress.update(self.pvc, len(data))
+                    out.write(comp.compress(
+                        b'\0' * (-member.size % tarfile.BLOCKSIZE)))
+            # Drain the padding after the end-of-archive marker
+            while proc.stdout.read(CHUNK_SIZE):
+                pass
+        except tarfile.TarError as e:
+            proc.kill()
+            raise TransferError(f'Transfer from pod {self.pod} failed: {e}')
+        except BaseException:
+            proc.kill()
+            raise
+        finally:
+            result = proc.wait()
+            feeder.join()
+        if result != 0:
+            raise TransferError(f'tar failed in pod {self.pod}')
+        out.write(comp.flush())
+
+    @staticmethod
+    def _feed(stdin, names):
+        try:
+            stdin.write(''.join(n + '\n' for n in names).encode())
+            stdin.close()
+        except BrokenPipeError:
+            pass
+
+    def run(self, resume=False):
+        state = None
+        if resume and os.path.exists(self.statefile):
+            with open(self.statefile) as f:
+                state = json.load(f)
+        try:
+            self._start_job()
+            if state:
+                self.log(f'Resuming after chunk {state["done"]} of '
+                         f'{len(state["chunks"])}.')
+            else:
+                chunks, sizes = self._chunks(self._list_files())
+                state = {'chunks': chunks, 'sizes': sizes, 'done': 0,
+                         'offset': 0}
+                self._save_state(state)
+            self.progress.add(self.pvc, sum(state['sizes']),
+                              sum(state['sizes'][:state['done']]))
+
+            mode = 'r+b' if state['offset'] else 'wb'
+            with open(self.partfile, mode) as out:
+                out.truncate(state['offset'])
+                out.seek(state['offset'])
+                for i in range(state['done'], len(state['chunks'])):
+                    self._transfer_chunk(state['chunks'][i], out)
+                    out.flush()
+                    os.fsync(out.fileno())
+                    state['done'] = i + 1
+                    state['offset'] = out.tell()
+                    self._save_state(state)
+                # End of archive marker, as its own gzip member
+                out.write(gzip.compress(b'\0' * tarfile.BLOCKSIZE * 2))
+        finally:
+            self._stop_job()
+        os.replace(self.partfile, self.outfile)
+        os.remove(self.statefile)
+        self.log(f'Saved {self.outfile}.')
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Recover contents of PVCs from non-running CORTX '
+                    'containers.  To see all available PVCs: '
+                    'kubectl get pvc -n $NAMESPACE')
+    parser.add_argument('pvc', nargs='+',
+                        help='Name of a PersistentVolumeClaim to collect '
+                             'data from')
+    parser.add_argument('-s', dest='solution',
+                        default=os.environ.get('CORTX_SOLUTION_CONFIG_FILE',
+                                               'solution.yaml'),
+                        help='The cluster solution configuration file')
+    parser.add_argument('-d', dest='path',
+                        help='Collect files from this directory within the '
+                             'PVC only, relative to the root of the PVC')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='Force overwrite the output file')
+    parser.add_argument('--resume', action='store_true',
+                        help='Continue interrupted transfers')
+    parser.add_argument('-j', '--jobs', type=int, default=4,
+                        help='Number of PVCs to transfer concurrently')
+    parser.add_argument('--chunk-size', type=int, default=256,
+                        help='Size in MiB of the chunks of files a transfer '
+                             'is resumed from')
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.solution):
+        print(f'ERROR: {args.solution} does not exist.')
+        return 1
+    with open(args.solution) as f:
+        solution = yaml.safe_load(f)['solution']
+
+    for pvc in args.pvc:
+        if os.path.exists(f'{pvc}.tgz') and not args.force:
+            print(f"ERROR: {pvc}.tgz already exists. Use '--force' to "
+                  "overwrite an existing file.")
+            return 1
+
+    progress = Progress()
+    transfers = [PvcTransfer(pvc, solution['namespace'],
+                             solution['images']['busybox'], args.path,
+                             args.chunk_size * 2**20, progress)
+                 for pvc in args.pvc]
+    stop = threading.Event()
+    reporter = threading.Thread(target=progress.report, args=(stop,),
+                                daemon=True)
+    reporter.start()
+    failed = 0
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        futures = [executor.submit(t.run, args.resume) for t in transfers]
+        for transfer, future in zip(transfers, futures):
+            try:
+                future.result()
+            except (TransferError, OSError) as e:
+                transfer.log(f'Failed to collect files: {e}')
+                failed += 1
+    stop.set()
+    reporter.join()
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,306 @@
+##################################################
+# k8s.py
+#
+# Helpers for querying Kubernetes state, used by the
+# regression tests and by rollout.py.
+#
+# Rather than running one "kubectl get" per resource kind
+# and label selector, a Snapshot fetches all objects of
+# interest with a single API query (or loads a previously
+# recorded one) and indexes them by kind and label so
+# that any number of queries can be evaluated in memory.
+#
+# A Watch keeps a live view of objects using a single
+# watch stream, for waiting on state transitions.
+#
+##################################################
+
+import json
+import re
+import subprocess  # nosec
+import threading
+import time
+import urllib.parse
+
+
+class KubectlError(Exception):
+    pass
+
+
+def kubectl_json(args):
+    """Run kubectl with JSON output and return the decoded object."""
+    cmd = ['kubectl'] + list(args) + ['--output', 'json']
+    child = subprocess.run(cmd, stdout=subprocess.PIPE,  # nosec B603
+                           stderr=subprocess.PIPE, check=False)
+    if child.returncode != 0:
+        raise KubectlError(f'{" ".join(cmd)} failed: '
+                           f'{child.stderr.decode().strip()}')
+    return json.loads(child.stdout)
+
+
+def parse_selector(selector):
+    """Parse an equality-based label selector.
+
+       Returns a list of (key, operator, value) tuples where operator
+       is one of '=' or '!='.  ('==' is accepted as a synonym for '='.)
+    """
+    if not selector:
+        return []
+    terms = []
+    for term in selector.split(','):
+        term = term.strip()
+        if not term:
+            continue
+        m = re.match(r'^([^!=\s]+)\s*(!=|==|=)\s*(\S*)$', term)
+        if not m:
+            raise ValueError(f'Unsupported label selector term: {term}')
+        key, op, value = m.groups()
+        terms.append((key, '=' if op == '==' else op, value))
+    return terms
+
+
+def match_labels(labels, selector):
+    """Return True if the labels dict matches the label selector."""
+    if isinstance(selector, str):
+        selector = parse_selector(selector)
+    for key, op, value in selector:
+        if op == '=' and labels.get(key) != value:
+            return False
+        if op == '!=' and labels.get(key) == value:
+            return False
+    return True
+
+
+def pod_ready(pod):
+    """Return True if a pod is Running and all its containers are ready."""
+    if pod['metadata'].get('deletionTimestamp'):
+        return False
+    status = pod.get('status', {})
+    if status.get('phase') != 'Running':
+        return False
+    containers = status.get('containerStatuses', [])
+    return bool(containers) and all(c.get('ready') for c in containers)
+
+
+def pod_failed(pod):
+    """Return True if a pod (or one of its init containers) has errored.
+
+       This corresponds to kubectl showing the pod as "Error" or
+       "Init:Error".
+    """
+    status = pod.get('status', {})
+    if status.get('phase') == 'Failed':
+        return True
+    for key in ('initContainerStatuses', 'containerStatuses'):
+        for c in status.get(key, []):
+            terminated = c.get('state', {}).get('terminated') or {}
+            if terminated.get('reason') == 'Error':
+                return True
+    return False
+
+
+def node_schedulable(node):
+    """Return True if a node has no NoSchedule taints."""
+    taints = node.get('spec', {}).get('taints', [])
+    return not any(t.get('effect') == 'NoSchedule' for t in taints)
+
+
+class Snapshot:
+    # Kinds fetched by from_cluster().  "all" covers the workload
+    # kinds (pods, services, deployments, statefulsets, daemonsets...).
+    KINDS = 'all,pvc,pv,nodes'
+
+    def __init__(self, data):
+        """An indexed, point-in-time view of Kubernetes objects.
+
+           Arguments:
+               data: A decoded "kubectl get -o json" result, i.e.
+                     a List object with an "items" array.
+        """
+        self.data = data
+        self.items = data.get('items', [])
+
+        # kind -> [object]
+        self.by_kind = {}
+        # (kind, label key, label value) -> set of object indexes
+        self.by_label = {}
+        for i, obj in enumerate(self.items):
+            kind = obj['kind']
+            self.by_kind.setdefault(kind, []).append(obj)
+            labels = obj['metadata'].get('labels') or {}
+            for key, value in labels.items():
+                self.by_label.setdefault((kind, key, value), set()).add(i)
+
+    @classmethod
+    def from_cluster(cls, namespace, kinds=None):
+        """Fetch a snapshot of a namespace with a single kubectl call."""
+        return cls(kubectl_json(['get', kinds or cls.KINDS,
+                                 '--namespace', namespace]))
+
+    @classmethod
+    def from_file(cls, filename):
+        """Load a snapshot previously recorded with save()."""
+        with open(filename) as f:
+            return cls(json.load(f))
+
+    def save(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.data, f)
+
+    def get(self, kind, selector=None, namespace=None):
+        """Return all objects of a kind matching a label selector.
+
+           Objects are returned in snapshot order.
+        """
+        terms = parse_selector(selector)
+        candidates = None
+        for key, op, value in terms:
+            if op != '=':
+                continue
+            found = self.by_label.get((kind, key, value), set())
+            candidates = found if candidates is None else candidates & found
+        if candidates is None:
+            objs = self.by_kind.get(kind, [])
+        else:
+            objs = [self.items[i] for i in sorted(candidates)]
+        return [obj for obj in objs
+                if match_labels(obj['metadata'].get('labels') or {}, terms)
+                and (namespace is None
+                     or obj['metadata'].get('namespace') == namespace)]
+
+
+# API paths used by Watch, by resource.  Namespaced resources
+# have a "{namespace}" placeholder.
+API_PATHS = {
+    'pods': '/api/v1/namespaces/{namespace}/pods',
+    'persistentvolumeclaims':
+        '/api/v1/namespaces/{namespace}/persistentvolumeclaims',
+    'persistentvolumes': '/api/v1/persistentvolumes',
+    'nodes': '/api/v1/nodes',
+    'deployments': '/apis/apps/v1/namespaces/{namespace}/deployments',
+    'statefulsets': '/apis/apps/v1/namespaces/{namespace}/statefulsets',
+}
+
+
+class Watch:
+    def __init__(self, resource, namespace=None, selector=None):
+        """Keeps an up-to-date view of objects from a watch stream.
+
+           The objects are listed once, and then a single watch stream
+           (via "kubectl get --raw") is opened from the resourceVersion
+           of that list.  Every event updates self.objects (a dict of
+           object name to object) and wakes up threads blocked in
+           wait_for(), so waiters react to changes as they happen instead
+           of polling.  If the API server closes the stream, the objects
+           are listed again and a new stream is opened.
+
+           Arguments:
+               resource: One of the resources in API_PATHS, e.g. "pods"
+               namespace: Namespace to watch, for namespaced resources
+               selector: Optional label selector
+        """
+        self.path = API_PATHS[resource].format(namespace=namespace)
+        self.selector = selector
+        self.objects = {}
+        self.cond = threading.Condition()
+        self.proc = None
+        self.thread = None
+        self.stopped = False
+
+    def _url(self, **params):
+        if self.selector:
+            params['labelSelector'] = self.selector
+        if not params:
+            return self.path
+        return self.path + '?' + urllib.parse.urlencode(params)
+
+    def start(self):
+        """List the objects and start watching for changes."""
+        resource_version = self._list()
+        self.thread = threading.Thread(target=self._run,
+                                       args=(resource_version,),
+                                       daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        with self.cond:
+            self.stopped = True
+            self.cond.notify_all()
+        if self.proc and self.proc.poll() is None:
+            self.proc.terminate()
+            self.proc.wait()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _list(self):
+        data = kubectl_json(['get', '--raw', self._url()])
+        with self.cond:
+            self.objects = {o['metadata']['name']: o for o in data['items']}
+            self.cond.notify_all()
+        return data['metadata']['resourceVersion']
+
+    def _apply(self, event):
+        """Apply a watch event.  Returns False if the watch must restart."""
+        if event.get('type') == 'ERROR':
+            # Usually "410 Gone": the resourceVersion is too old
+            return False
+        obj = event.get('object', {})
+        name = obj.get('metadata', {}).get('name')
+        if not name:
+            return True
+        with self.cond:
+            if event['type'] == 'DELETED':
+                self.objects.pop(name, None)
+            elif event['type'] in ('ADDED', 'MODIFIED'):
+                self.objects[name] = obj
+            self.cond.notify_all()
+        return True
+
+    def _watch(self, resource_version):
+        """Stream watch events until the stream ends or errors."""
+        url = self._url(watch='true', resourceVersion=resource_version,
+                        allowWatchBookmarks='false')
+        self.proc = subprocess.Popen(['kubectl', 'get', '--raw', url],  # nosec B603
+                                     stdout=subprocess.PIPE,
+                                     stderr=subprocess.DEVNULL)
+        for line in self.proc.stdout:
+            if self.stopped:
+                break
+            line = line.strip()
+            if not line:
+                continue
+            event = json.loads(line)
+            resource_version = (event.get('object', {}).get('metadata', {})
+                                .get('resourceVersion', resource_version))
+            if not self._apply(event):
+                break
+        if self.proc.poll() is None:
+            self.proc.terminate()
+        self.proc.wait()
+
+    def _run(self, resource_version):
+        while not self.stopped:
+            self._watch(resource_version)
+            if self.stopped:
+                break
+            try:
+                resource_version = self._list()
+            except KubectlError:
+                time.sleep(1)
+
+    def wait_for(self, predicate, timeout=None):
+        """Block until predicate(objects) is true.
+
+           predicate is called with the list of current objects each
+           time the view changes.  Returns True if the predicate was
+           satisfied, or False on timeout.
+        """
+        with self.cond:
+            return self.cond.wait_for(
+                lambda: self.stopped or predicate(list(self.objects.values())),
+                timeout) and not self.stopped
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+
+##################################################
+# logs-cortx-cloud.py
+#
+# Collects the logs of all CORTX pods into a single
+# .tgz support bundle, like logs-cortx-cloud.sh.
+#
+# Unlike logs-cortx-cloud.sh, which starts the collection
+# for every pod at once and compresses the whole folder
+# at the end, this:
+#
+#   * Collects from at most --jobs pods at a time, and at
+#     most --per-node pods on the same node, so large
+#     clusters don't overwhelm the API server or kubelets.
+#   * Streams each pod's describe output, container logs
+#     and support bundle straight into the archive.  Each
+#     archive member is compressed by the worker that
+#     collects it, as a separate gzip member, and written
+#     to the archive as soon as it is complete.  (A .tgz
+#     made of concatenated gzip members is a valid gzip
+#     file.)  Nothing is written to disk but the archive:
+#     a member's compressed data is held in memory until
+#     it is complete.
+#   * Enforces --size_limit on the bytes collected from
+#     each pod as they stream in.  As each of the --jobs
+#     workers holds at most one member, of at most
+#     --size_limit bytes, the memory used is bounded, and
+#     the collection doesn't start if that bound exceeds
+#     --max-memory.
+#
+##################################################
+
+import argparse
+import collections
+import datetime
+import gzip
+import json
+import os
+import subprocess  # nosec
+import sys
+import tarfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import yaml
+
+
+CHUNK_SIZE = 64 * 1024
+CORTX_PREFIXES = ('cortx-control-', 'cortx-data-', 'cortx-ha-',
+                  'cortx-server-', 'cortx-client-')
+SUPPORT_BUNDLE_PATH = 'var/cortx/support_bundle'
+
+SUPPORT_BUNDLE_SCRIPT = '''cortx_support_bundle generate \
+  --cluster_conf_path "${CORTX_CONFSTORE_URL}" \
+  --location "${location}" \
+  --bundle_id "${name}" \
+  --message "${name}" \
+  --modules "${modules}" \
+  --duration "${duration}" \
+  --size_limit "${size_limit}" \
+  --binlogs "${binlogs}" \
+  --coredumps "${coredumps}" \
+  --stacktrace "${stacktrace}" \
+  --all "${all}"'''
+
+
+def parse_size(size):
+    """Convert a size such as "500MB", "1GB" or "1024" to bytes."""
+    size = size.strip().upper()
+    for unit, factor in (('GB', 1024**3), ('MB', 1024**2)):
+        if size.endswith(unit):
+            return int(float(size[:-len(unit)]) * factor)
+    return int(size)
+
+
+def compressed_bound(size):
+    """Return the largest gzip compressed size of size bytes of data.
+
+       This is zlib's deflateBound(), plus the gzip header and trailer.
+    """
+    return size + (size >> 12) + (size >> 14) + (size >> 25) + 13 + 18
+
+
+def physical_memory():
+    return os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+
+
+class SizeLimitExceeded(Exception):
+    pass
+
+
+class Budget:
+    def __init__(self, limit):
+        """Number of bytes that may still be collected from a pod."""
+        self.remaining = limit
+
+    def take(self, data):
+        """Return the part of data that fits in the budget."""
+        if len(data) > self.remaining:
+            data = data[:self.remaining]
+        self.remaining -= len(data)
+        return data
+
+
+class TarGzWriter:
+    def __init__(self, fileobj, level=6):
+        """Writes a .tgz archive whose members are added concurrently.
+
+           Each member is compressed by the calling thread into its own
+           gzip members: one for the tar header, and one for the data.
+           The header needs the size of the data, so the compressed data
+           is held in memory until the member is complete (see
+           member_memory()).  Only the writing of the finished member to
+           fileobj is serialized.
+        """
+        self.fileobj = fileobj
+        self.level = level
+        self.lock = threading.Lock()
+        self.mtime = int(time.time())
+
+    @staticmethod
+    def member_memory(size):
+        """Return the most memory held for a member of size bytes."""
+        return compressed_bound(size + tarfile.BLOCKSIZE)
+
+    def _compressor(self):
+        # wbits=31 produces a gzip stream
+        return zlib.compressobj(self.level, zlib.DEFLATED, 31)
+
+    def add_stream(self, name, chunks, budget=None):
+        """Add a member with the data from an iterable of byte chunks.
+
+           If budget is specified, the data is truncated once the budget
+           is used up, and SizeLimitExceeded is raised after the
+           truncated member has been added.
+
+           Returns the number of bytes in the member.
+        """
+        comp = self._compressor()
+        size = 0
+        exceeded = False
+        data = []
+        for chunk in chunks:
+            if budget:
+                taken = budget.take(chunk)
+                exceeded = len(taken) < len(chunk)
+                chunk = taken
+            size += len(chunk)
+            data.append(comp.compress(chunk))
+            if exceeded:
+                break
+        data.append(comp.compress(b'\0' * (-size % tarfile.BLOCKSIZE)))
+        data.append(comp.flush())
+
+        info = tarfile.TarInfo(name)
+        info.size = size
+        info.mtime = self.mtime
+        info.mode = 0o644
+        header = gzip.compress(info.tobuf(format=tarfile.GNU_FORMAT),
+                               compresslevel=self.level)
+        with self.lock:
+            self.fileobj.write(header)
+            self.fileobj.writelines(data)
+        if exceeded:
+            raise SizeLimitExceeded(name)
+        return size
+
+    def close(self):
+        """Write the end-of-archive marker."""
+        with self.lock:
+            self.fileobj.write(gzip.compress(b'\0' * tarfile.BLOCKSIZE * 2))
+            self.fileobj.flush()
+
+
+def command_output(cmd, header=b''):
+    """Yield the output of a command in chunks, starting with header."""
+    if header:
+        yield header
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE,  # nosec B603
+                            stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            chunk = proc.stdout.read1(CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        # Stops the command early if the consumer stopped reading
+        if proc.poll() is None:
+            proc.kill()
+        proc.stdout.close()
+        proc.wait()
+
+
+class LogCollector:
+    def __init__(self, namespace, args):
+        """Collects the logs of the pods in a namespace.
+
+           args are the parsed command line arguments.
+        """
+        self.namespace = namespace
+        self.args = args
+        self.writer = None
+        self.date = datetime.datetime.now().strftime('%F_%H-%M')
+        self.folder = f'logs-cortx-cloud-{self.date}'
+        self.size_limit = parse_size(args.size_limit)
+        self.node_slots = {}
+        self.print_lock = threading.Lock()
+
+    def log(self, msg):
+        with self.print_lock:
+            print(msg, flush=True)
+
+    def kubectl(self, *args):
+        return ['kubectl'] + list(args) + [f'--namespace={self.namespace}']
+
+    def list_pods(self):
+        """Return the pods to collect from, with a single API call."""
+        out = subprocess.run(self.kubectl('get', 'pods', '--output', 'json'),  # nosec B603
+                             stdout=subprocess.PIPE, check=True).stdout
+        pods = []
+        for pod in json.loads(out)['items']:
+            if pod.get('status', {}).get('reason') == 'Evicted':
+                continue
+            node = pod['spec'].get('nodeName', '')
+            if self.args.nodename and node != self.args.nodename:
+                continue
+            name = pod['metadata']['name']
+            containers = []
+            if name.startswith(CORTX_PREFIXES):
+                containers = [c['name'] for c in
+                              pod['spec'].get('containers', []) +
+                              pod['spec'].get('initContainers', [])]
+            pods.append((name, node, containers))
+        return pods
+
+    def collect_pod(self, pod, node, containers):
+        with self.node_slots[node]:
+            budget = Budget(self.size_limit)
+            try:
+                self._collect_pod(pod, containers, budget)
+            except SizeLimitExceeded as e:
+                self.log(f'⚠️  {pod}: size limit of {self.args.size_limit} '
+                         f'reached at {e}; remaining logs skipped')
+            except subprocess.CalledProcessError as e:
+                self.log(f'❌ {pod}: {e}')
+
+    def _collect_pod(self, pod, containers, budget):
+        prefix = f'{self.folder}/{pod}'
+        header = f'================= Detail of {pod} =================\n\n'
+        self.writer.add_stream(
+            f'{prefix}.detail.txt',
+            command_output(self.kubectl('describe', 'pod', pod),
+                           header.encode()), budget)
+
+        if not containers:
+            header = f'================= Logs of {pod} =================\n'
+            self.writer.add_stream(
+                f'{prefix}.logs.txt',
+                command_output(self.kubectl('logs', pod), header.encode()),
+                budget)
+            return
+
+        for container in containers:
+            header = (f'================= Logs of {pod} / {container} '
+                      '=================\n')
+            self.writer.add_stream(
+                f'{prefix}-{container}.logs.txt',
+                command_output(self.kubectl('logs', pod, '-c', container),
+                               header.encode()), budget)
+
+        self._collect_support_bundle(pod, containers[0], budget)
+
+    def _collect_support_bundle(self, pod, container, budget):
+        name = f'bundle-logs-{pod}-{self.date}'
+        args = self.args
+        self.log(f' ⭐ Generating support-bundle logs for pod: {pod}')
+        env = [f'location=file:///{SUPPORT_BUNDLE_PATH}', f'name={name}',
+               f'modules={args.modules}', f'duration={args.duration}',
+               f'size_limit={args.size_limit}',
+               f'binlogs={args.binlogs}', f'coredumps={args.coredumps}',
+               f'stacktrace={args.stacktrace}', f'all={args.all}']
+        exec_ = self.kubectl('exec', pod, '-c', container)
+        subprocess.run(exec_ + ['--', 'env'] + env +  # nosec B603
+                       ['bash', '-c', SUPPORT_BUNDLE_SCRIPT],
+                       stdout=subprocess.DEVNULL, check=True)
+        try:
+            # Stream the bundle out of the pod as a tar stream, and copy
+            # its members into the archive.  Each member is compressed as
+            # it is read, and only its compressed form is held.
+            proc = subprocess.Popen(exec_ + ['--', 'tar', 'cf', '-', '-C',  # nosec B603
+                                             f'/{SUPPORT_BUNDLE_PATH}', name],
+                                    stdout=subprocess.PIPE)
+            try:
+                with tarfile.open(fileobj=proc.stdout, mode='r|') as bundle:
+                    for member in bundle:
+                        if not member.isfile():
+                            continue
+                        f = bundle.extractfile(member)
+                        self.writer.add_stream(
+                            f'{self.folder}/{member.name}',
+                            iter(lambda f=f: f.read(CHUNK_SIZE), b''), budget)
+            finally:
+                if proc.poll() is None:
+                    proc.kill()
+                proc.wait()
+        finally:
+            subprocess.run(exec_ + ['--', 'bash', '-c',  # nosec B603
+                                    f'rm -rf /{SUPPORT_BUNDLE_PATH}'],
+                           check=False)
+
+    def memory_bound(self):
+        """Return the most memory held by the workers for the archive."""
+        return self.args.jobs * TarGzWriter.member_memory(self.size_limit)
+
+    def run(self, writer):
+        """Collect the logs into writer.  Returns the number of pods."""
+        self.writer = writer
+        pods = self.list_pods()
+        by_node = collections.OrderedDict()
+        for pod in pods:
+            by_node.setdefault(pod[1], []).append(pod)
+            self.node_slots[pod[1]] = threading.BoundedSemaphore(
+                                          self.args.per_node)
+
+        # Interleave the pods of each node, so workers rarely wait on
+        # a node's slots while pods of other nodes are queued.
+        queue = []
+        while any(by_node.values()):
+            for node_pods in by_node.values():
+                if node_pods:
+                    queue.append(node_pods.pop(0))
+
+        with ThreadPoolExecutor(max_workers=self.args.jobs) as executor:
+            for future in [executor.submit(self.collect_pod, *pod)
+                           for pod in queue]:
+                future.result()
+        return len(pods)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Collect logs from CORTX pods into a support bundle')
+    parser.add_argument('-s', '--solution-config', dest='solution',
+                        default=None,
+                        help='The cluster solution configuration file. '
+                             'Defaults to $CORTX_SOLUTION_CONFIG_FILE or '
+                             '"solution.yaml"')
+    parser.add_argument('-n', '--nodename',
+                        help='Collect logs from pods running only on NODE')
+    parser.add_argument('--modules', default='')
+    parser.add_argument('--duration', default='P5D',
+                        help='Maximum duration of each pod\'s support bundle '
+                             'operation, in ISO 8601 duration format')
+    parser.add_argument('--size_limit', default='500MB',
+                        help='Maximum size of each pod\'s logs and support '
+                             'bundle.  Units MB and GB are supported.')
+    for flag in ('binlogs', 'coredumps', 'stacktrace', 'all'):
+        parser.add_argument(f'--{flag}', action='store_const', const='True',
+                            default='False')
+    parser.add_argument('-j', '--jobs', type=int, default=8,
+                        help='Maximum number of pods to collect from at once')
+    parser.add_argument('--per-node', type=int, default=2,
+                        help='Maximum number of pods on the same node to '
+                             'collect from at once')
+    parser.add_argument('--max-memory',
+                        help='Maximum memory that the logs being collected '
+                             'may take, which must be at least --jobs times '
+                             '--size_limit.  Units MB and GB are supported.  '
+                             'Defaults to the physical memory.')
+    args = parser.parse_args()
+
+    solution = args.solution or os.environ.get('CORTX_SOLUTION_CONFIG_FILE',
+                                               'solution.yaml')
+    if not os.path.isfile(solution):
+        print(f'ERROR: {solution} does not exist.')
+        return 1
+    with open(solution) as f:
+        namespace = yaml.safe_load(f)['solution']['namespace']
+
+    collector = LogCollector(namespace, args)
+    max_memory = parse_size(args.max_memory) if args.max_memory else \
+        physical_memory()
+    if collector.memory_bound() > max_memory:
+        print(f'ERROR: {args.jobs} jobs with a --size_limit of '
+              f'{args.size_limit} may hold up to '
+              f'{collector.memory_bound() // 1024**2}MB of logs in memory, '
+              f'more than the maximum of {max_memory // 1024**2}MB.  Lower '
+              f'--jobs or --size_limit, or raise --max-memory.')
+        return 1
+    outfile = f'{collector.folder}.tgz'
+    print('######################################################')
+    print(f'# ✍️  Generating logs, namespace: {namespace}, '
+          f'date: {collector.date}')
+    print('######################################################')
+
+    with open(outfile, 'wb') as f:
+        writer = TarGzWriter(f)
+        pods_found = collector.run(writer)
+        writer.close()
+
+    if args.nodename and pods_found == 0:
+        os.remove(outfile)
+        print(f'\n❌ No pods are running on the node: "{args.nodename}".')
+    else:
+        print(f'\n\n📦 "{outfile}" file generated')
+    print('\n✔️  All done\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
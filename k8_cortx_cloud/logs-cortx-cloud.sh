@@ -108,8 +108,15 @@ if [[ ! -f ${solution_yaml} ]]; then
     exit 1
 fi
 
-namespace=$(parseSolution 'solution.namespace')
-namespace=$(echo "${namespace}" | cut -f2 -d'>')
+# Read the solution file with cortx_solution.py when python3 and PyYAML
+# are available, and with parse_yaml.sh otherwise
+if python3 -c 'import yaml' &> /dev/null; then
+  values=$(python3 "${DIR}/cortx_solution.py" "${solution_yaml}" namespace=solution.namespace) || exit 1
+  eval "${values}"
+else
+  namespace=$(parseSolution 'solution.namespace')
+  namespace=$(echo "${namespace}" | cut -f2 -d'>')
+fi
 logs_folder="logs-cortx-cloud-${date}"
 outfile="${logs_folder}.tgz"
 mkdir "${logs_folder}" -p
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+
+##################################################
+# plan-cortx-cloud.py
+#
+# Sizes CORTX clusters over a grid of candidate layouts.
+#
+# Every combination of node count, CVGs per node, data
+# drives per CVG, drive size, container group size and
+# SNS/DIX durability is evaluated for:
+#
+#   * raw and usable data capacity
+#   * durability validity, with the same rules as
+#     solution_validation_scripts/solution-validation.sh
+#   * the number of pods deploy-cortx-cloud.sh creates
+#   * CPU and memory requests, from the resource_allocation
+#     section of the template solution file (see
+#     cortx_resources.py)
+#
+# The grid is evaluated in memory, one column at a time,
+# without running yq.  The results are printed as CSV, and
+# a solution file is written for each valid combination
+# with --output-dir, with storage laid out the same way as
+# generate-cvg-yaml.sh does.
+#
+##################################################
+
+import argparse
+import csv
+import itertools
+import os
+import string
+import sys
+
+import yaml
+
+from cortx_resources import (MAX_CONSUL_INST, MAX_KAFKA_INST, parse_cpu,
+                             parse_memory, ResourceModel)
+
+
+# First device used for CVGs, as in solution.example.yaml
+DEVICE_OFFSET = 2
+
+GRID = ['nodes', 'cvgs', 'data', 'size', 'group', 'sns', 'dix']
+
+
+def parse_durability(value):
+    """Return the total of an "N+K+S" durability, and the data fraction."""
+    parts = [int(v) for v in value.split('+')]
+    total = sum(parts)
+    return total, parts[0] / total if total else 0.0
+
+
+def device_path(index):
+    """Return the index-th /dev/sdX path: sda..sdz, sdaa, sdab, ..."""
+    letters = string.ascii_lowercase
+    name = ''
+    index += 1
+    while index:
+        index, rem = divmod(index - 1, 26)
+        name = letters[rem] + name
+    return '/dev/sd' + name
+
+
+class Model(ResourceModel):
+    """Evaluates cluster layouts with the pod and resource model."""
+
+    def evaluate(self, grid, node_cpu=None, node_memory=None):
+        """Evaluate every combination of a grid.
+
+           grid is a dict of column name (see GRID) to a list with one
+           value per combination.  Returns a dict of result columns.
+        """
+        nodes, cvgs, data = grid['nodes'], grid['cvgs'], grid['data']
+        n = len(nodes)
+        size = [int(parse_memory(s)) for s in grid['size']]
+        sns = [parse_durability(s) for s in grid['sns']]
+        dix = [parse_durability(d) for d in grid['dix']]
+
+        total_cvgs = [a * b for a, b in zip(nodes, cvgs)]
+        raw = [t * d * s for t, d, s in zip(total_cvgs, data, size)]
+        usable = [round(r * f) for r, (_, f) in zip(raw, sns)]
+        groups = [self.groups(c, g) for c, g in zip(cvgs, grid['group'])]
+        shared = [min(x, MAX_CONSUL_INST) for x in nodes]
+        kafka = [min(x, MAX_KAFKA_INST) for x in nodes]
+
+        per_node_pods = [g + self.servers_per_node + self.clients_per_node + 1
+                         for g in groups]
+        pods = [x * p + self.singleton_count + s + 2 * k
+                for x, p, s, k in zip(nodes, per_node_pods, shared, kafka)]
+
+        # Requests of the pods on every node, and of the pods placed
+        # on some of the nodes only
+        local = [self.local(g, c) for g, c in zip(groups, cvgs)]
+        spread = [self.spread(s, k) for s, k in zip(shared, kafka)]
+        cpu = [x * l.cpu + r.cpu for x, l, r in zip(nodes, local, spread)]
+        memory = [round(x * l.memory + r.memory)
+                  for x, l, r in zip(nodes, local, spread)]
+        node_cpu_req = [c / x for c, x in zip(cpu, nodes)]
+        node_memory_req = [round(m / x) for m, x in zip(memory, nodes)]
+
+        reasons = [[] for _ in range(n)]
+        for i in range(n):
+            if sns[i][0] > total_cvgs[i]:
+                reasons[i].append(f'SNS {sns[i][0]} > {total_cvgs[i]} CVGs')
+            if dix[i][0] > nodes[i]:
+                reasons[i].append(f'DIX {dix[i][0]} > {nodes[i]} nodes')
+            if node_cpu is not None and node_cpu_req[i] > node_cpu:
+                reasons[i].append(f'{node_cpu_req[i]:.2f} CPUs per node')
+            if node_memory is not None and node_memory_req[i] > node_memory:
+                reasons[i].append(
+                    f'{node_memory_req[i] / 2**30:.1f}Gi memory per node')
+
+        return {
+            'valid': [not r for r in reasons],
+            'reason': ['; '.join(r) for r in reasons],
+            'raw_bytes': raw,
+            'usable_bytes': usable,
+            'pods': pods,
+            'cpu_requests': cpu,
+            'memory_requests': memory,
+            'node_cpu_requests': node_cpu_req,
+            'node_memory_requests': node_memory_req,
+        }
+
+
+def make_grid(values):
+    """Return the cartesian product of value lists as columns."""
+    combos = list(itertools.product(*(values[k] for k in GRID)))
+    return {k: [c[i] for c in combos] for i, k in enumerate(GRID)}
+
+
+def make_solution(template, node_names, cvgs, data, size, metadata_size,
+                  group, sns, dix):
+    """Return a solution with the given layout, based on template.
+
+       Sections that are not changed are shared with the template, not
+       copied.
+    """
+    storage = []
+    device = DEVICE_OFFSET
+    for i in range(cvgs):
+        metadata = [{'path': device_path(device), 'size': metadata_size}]
+        device += 1
+        drives = [{'path': device_path(device + j), 'size': size}
+                  for j in range(data)]
+        device += data
+        storage.append({'name': f'cvg-{i + 1:02d}', 'type': 'ios',
+                        'devices': {'metadata': metadata, 'data': drives}})
+
+    storage_set = dict(template['solution']['storage_sets'][0])
+    storage_set.update({
+        'durability': {'sns': sns, 'dix': dix},
+        'container_group_size': group,
+        'nodes': list(node_names),
+        'storage': storage,
+    })
+    solution = dict(template['solution'])
+    solution['storage_sets'] = [storage_set]
+    return {'solution': solution}
+
+
+def solution_filename(row):
+    return 'solution-{nodes}n-{cvgs}c-{data}d-{size}-g{group}-' \
+           'sns{sns}-dix{dix}.yaml'.format(**row)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Evaluate capacity, durability and resource requests '
+                    'of CORTX cluster layouts')
+    parser.add_argument('-s', '--solution',
+                        default=os.environ.get('CORTX_SOLUTION_CONFIG_FILE',
+                                               'solution.example.yaml'),
+                        help='Solution file to take resource allocations '
+                             'from, and base generated solutions on')
+    parser.add_argument('--nodes', nargs='+', type=int, required=True,
+                        help='Node counts')
+    parser.add_argument('--cvgs', nargs='+', type=int, default=[1],
+                        help='CVGs per node')
+    parser.add_argument('--data', nargs='+', type=int, default=[1],
+                        help='Data drives per CVG')
+    parser.add_argument('--size', nargs='+', default=['5Gi'],
+                        help='Data drive sizes, e.g. 100Gi')
+    parser.add_argument('--metadata-size',
+                        help='Metadata drive size.  Defaults to the data '
+                             'drive size.')
+    parser.add_argument('--group', nargs='+', type=int,
+                        help='Container group sizes.  Defaults to the '
+                             'solution file\'s container_group_size.')
+    parser.add_argument('--sns', nargs='+', default=['1+0+0'],
+                        help='SNS durabilities, N+K+S')
+    parser.add_argument('--dix', nargs='+', default=['1+0+0'],
+                        help='DIX durabilities, 1+K+0')
+    parser.add_argument('--node-cpu', type=parse_cpu,
+                        help='CPUs available to CORTX on each node')
+    parser.add_argument('--node-memory', type=parse_memory,
+                        help='Memory available to CORTX on each node, '
+                             'e.g. 16Gi')
+    parser.add_argument('--node-list',
+                        help='File of node names, one per line.  Defaults '
+                             'to node-1, node-2, ...')
+    parser.add_argument('--valid-only', action='store_true',
+                        help='Only print valid combinations')
+    parser.add_argument('-o', '--output-dir',
+                        help='Write a solution file for each valid '
+                             'combination to this directory')
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.solution):
+        print(f'ERROR: {args.solution} does not exist.', file=sys.stderr)
+        return 1
+    with open(args.solution) as f:
+        template = yaml.safe_load(f)
+
+    node_names = None
+    if args.node_list:
+        with open(args.node_list) as f:
+            node_names = [line.strip() for line in f if line.strip()]
+        if max(args.nodes) > len(node_names):
+            print(f'ERROR: {args.node_list} lists {len(node_names)} nodes, '
+                  f'fewer than {max(args.nodes)}.', file=sys.stderr)
+            return 1
+
+    groups = args.group or \
+        [template['solution']['storage_sets'][0]['container_group_size']]
+    grid = make_grid({'nodes': args.nodes, 'cvgs': args.cvgs,
+                      'data': args.data, 'size': args.size, 'group': groups,
+                      'sns': args.sns, 'dix': args.dix})
+    model = Model(template['solution'])
+    results = model.evaluate(grid, args.node_cpu, args.node_memory)
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    columns = GRID + list(results)
+    writer = csv.writer(sys.stdout)
+    writer.writerow(columns)
+    valid = 0
+    for i in range(len(grid['nodes'])):
+        row = {k: v[i] for k, v in itertools.chain(grid.items(),
+                                                   results.items())}
+        if row['valid']:
+            valid += 1
+        elif args.valid_only:
+            continue
+        writer.writerow([round(row[k], 3) if isinstance(row[k], float)
+                         else row[k] for k in columns])
+
+        if args.output_dir and row['valid']:
+            names = node_names[:row['nodes']] if node_names else \
+                [f'node-{j + 1}' for j in range(row['nodes'])]
+            solution = make_solution(template, names, row['cvgs'],
+                                     row['data'], row['size'],
+                                     args.metadata_size or row['size'],
+                                     row['group'], row['sns'], row['dix'])
+            path = os.path.join(args.output_dir, solution_filename(row))
+            with open(path, 'w') as f:
+                yaml.safe_dump(solution, f, sort_keys=False)
+
+    print(f'{valid} of {len(grid["nodes"])} combinations are valid.',
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -207,6 +207,44 @@ function parseSolution()
     echo "${OUTPUT}"
 }
 
+# The solution file is read with cortx_solution.py when it is next to
+# this script and python3 and PyYAML are available, and with
+# parseSolution otherwise.
+solution_module="$(dirname "${SCRIPT}")/cortx_solution.py"
+readonly solution_module
+if [[ -f ${solution_module} ]] && python3 -c 'import yaml' &> /dev/null; then
+    readonly use_python=true
+else
+    readonly use_python=false
+fi
+
+# Every scalar of the solution file, by path, when use_python is true
+declare -A solution_values
+
+function loadSolutionValues()
+{
+    [[ ${use_python} == true ]] || return 0
+    local values
+    if ! values=$(python3 "${solution_module}" --array solution_values "${solution_yaml}"); then
+        echo "ERROR: Failed to read ${solution_yaml}"
+        exit 1
+    fi
+    eval "${values}"
+}
+
+# Print the value at a YAML path in the solution file, e.g.
+# "solution.namespace"
+function getSolutionValue()
+{
+    if [[ ${use_python} == true ]]; then
+        echo "${solution_values[$1]:-}"
+        return 0
+    fi
+    local value
+    value=$(parseSolution "${solution_yaml}" "$1")
+    echo "${value#*>}"
+}
+
 function cleanupFolders()
 {
     printf "####################################################\n"
@@ -345,7 +383,6 @@ function symlinkBlockDevices()
     printf "####################################################\n"
 
     # Local variables
-    local filter
     local job_template
     local job_file
 
@@ -360,9 +397,8 @@ function symlinkBlockDevices()
     export SYMLINK_PATH_SEPARATOR=${symlink_block_devices_separator}
 
     # Retrieve CORTX container image specified in solution.yaml
-    filter="solution.images.cortxcontrol"
-    cortx_image_yaml=$(parseSolution "${solution_yaml}" ${filter})
-    export CORTX_IMAGE="${cortx_image_yaml#*>}"
+    CORTX_IMAGE=$(getSolutionValue 'solution.images.cortxcontrol')
+    export CORTX_IMAGE
 
     # Create comma-separated string from the device paths in solution.yaml
     # Template replacement variable
@@ -424,14 +460,12 @@ function installHelm()
     ./get_helm.sh
 }
 
+loadSolutionValues
+
 # Extract storage provisioner path from the "solution.yaml" file
-filter='solution.common.storage_provisioner_path'
-parse_storage_prov_output=$(parseSolution "${solution_yaml}" ${filter})
-# Get the storage provisioner var from the tuple
-fs_mount_path=$(echo "${parse_storage_prov_output}" | cut -f2 -d'>')
+fs_mount_path=$(getSolutionValue 'solution.common.storage_provisioner_path')
 
-namespace=$(parseSolution "${solution_yaml}" 'solution.namespace')
-namespace=$(echo "${namespace}" | cut -f2 -d'>')
+namespace=$(getSolutionValue 'solution.namespace')
 
 # Install helm this is a master node
 if [[ "${is_master_node}" = true ]]; then
@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+
+##################################################
+# rollout.py
+#
+# Waits for the CORTX workloads of a deployment to become
+# ready, like waitForClusterReady in deploy-cortx-cloud.sh.
+#
+# Instead of one "kubectl rollout status" per Deployment
+# and StatefulSet, the workloads are listed once and a
+# single k8s.Watch on the CORTX pods tracks the ready
+# replicas of all of them.  While waiting, a table of the
+# ready/desired replicas of every workload is shown (and
+# redrawn in place on a terminal), so the workload that
+# holds up a large deployment is easy to spot.
+#
+# Once all workloads are ready, or time out, the final
+# table is logged, and the time each pod took to become
+# ready (from its creation to its Ready condition) is
+# summarized per component.
+#
+# deploy-cortx-cloud.sh runs it to wait for the cluster
+# when python3 and PyYAML are available.  The regression
+# tests use it with their own logger and timer.
+#
+##################################################
+
+import argparse
+import math
+import os
+import re
+import sys
+import time
+from datetime import datetime, timezone
+
+from yaml import safe_load
+
+from k8s import KubectlError, pod_ready, Snapshot, Watch
+
+
+RELEASE_SELECTOR = 'app.kubernetes.io/instance=cortx'
+CORTX_SELECTOR = RELEASE_SELECTOR + ',app.kubernetes.io/name=cortx'
+
+# Components waited for, with the kind of their workloads and the
+# default timeout of deploy-cortx-cloud.sh, which can be overridden
+# with the same CORTX_DEPLOY_<COMPONENT>_TIMEOUT environment variables.
+COMPONENTS = [
+    ('control', 'Deployment', '10m'),
+    ('ha', 'Deployment', '4m'),
+    ('data', 'StatefulSet', '10m'),
+    ('server', 'StatefulSet', '10m'),
+    ('client', 'StatefulSet', '10m'),
+]
+
+# Percentiles of the time to ready that are reported
+PERCENTILES = [50, 90]
+
+
+def component_selector(component):
+    return f'app.kubernetes.io/component={component},{CORTX_SELECTOR}'
+
+
+def parse_duration(value):
+    """Return the seconds of a duration such as "90", "90s", "10m", "1h"."""
+    m = re.match(r'^(\d+)([smh]?)$', str(value).strip())
+    if not m:
+        raise ValueError(f'Invalid duration: {value}')
+    return int(m.group(1)) * {'': 1, 's': 1, 'm': 60, 'h': 3600}[m.group(2)]
+
+
+def _timestamp(value):
+    return datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ').replace(
+        tzinfo=timezone.utc).timestamp()
+
+
+def time_to_ready(pod):
+    """Return the seconds from creation until a ready pod became ready."""
+    for condition in pod.get('status', {}).get('conditions', []):
+        if condition.get('type') == 'Ready' and \
+                condition.get('status') == 'True':
+            return (_timestamp(condition['lastTransitionTime']) -
+                    _timestamp(pod['metadata']['creationTimestamp']))
+    return None
+
+
+def pod_workload(pod):
+    """Return the (kind, name) of the workload that owns a pod."""
+    for ref in pod['metadata'].get('ownerReferences') or []:
+        if ref.get('kind') == 'StatefulSet':
+            return 'StatefulSet', ref['name']
+        if ref.get('kind') == 'ReplicaSet':
+            # A ReplicaSet is named after its Deployment and pod template
+            suffix = '-' + (pod['metadata'].get('labels') or {}).get(
+                'pod-template-hash', '')
+            if ref['name'].endswith(suffix):
+                return 'Deployment', ref['name'][:-len(suffix)]
+    return None
+
+
+def _percentile(values, pct):
+    """Nearest-rank percentile of a sorted list."""
+    return values[max(0, math.ceil(pct / 100 * len(values)) - 1)]
+
+
+class ConsoleLogger:
+    """Prints messages, for use without the regression tests' Logger."""
+
+    def log(self, s=''):
+        print(s, flush=True)
+
+    def logwarning(self, s=''):
+        print(f'WARNING: {s}', flush=True)
+
+    def logfail(self, s=''):
+        print(f'ERROR: {s}', flush=True)
+
+
+class Workload:
+    def __init__(self, component, obj, timeout):
+        """Rollout state of a Deployment or StatefulSet."""
+        self.component = component
+        self.kind = obj['kind']
+        self.name = obj['metadata']['name']
+        self.desired = obj['spec'].get('replicas', 1)
+        self.timeout = timeout
+        self.ready = 0
+        # Seconds after the start of the wait when it became ready
+        self.elapsed = None
+        self.timed_out = False
+
+    @property
+    def title(self):
+        return f'{self.kind.lower()}/{self.name}'
+
+    @property
+    def done(self):
+        return self.elapsed is not None or self.timed_out
+
+    def status(self, now):
+        if self.elapsed is not None:
+            return f'ready after {self.elapsed:.0f}s'
+        if self.timed_out:
+            return f'TIMED OUT after {self.timeout}s'
+        return f'waiting {now:.0f}s'
+
+
+class RolloutMonitor:
+    def __init__(self, namespace, logger=None, timeouts=None, timer=None,
+                 live=None):
+        """Waits for the CORTX workloads of a namespace to be ready.
+
+           Arguments:
+               namespace: Namespace CORTX is deployed in.
+               logger: If specified, use this logger object for logging.
+                      Defaults to a ConsoleLogger.
+               timeouts: Optional dict of component name (e.g. "data")
+                      to the number of seconds to wait for each of its
+                      workloads.  The default is the timeout of
+                      deploy-cortx-cloud.sh.
+               timer: If specified, a timing.Timer (from the regression
+                      tests) that a span for each workload is recorded in.
+               live: If true, redraw the table of workloads in place.
+                      Defaults to whether stdout is a terminal.
+        """
+        self.logger = logger or ConsoleLogger()
+        self.timer = timer
+        self.namespace = namespace
+        self.live = sys.stdout.isatty() if live is None else live
+        self.timeouts = {}
+        for component, _, default in COMPONENTS:
+            env = f'CORTX_DEPLOY_{component.upper()}_TIMEOUT'
+            self.timeouts[component] = (timeouts or {}).get(
+                component, parse_duration(os.environ.get(env, default)))
+        self.workloads = {}
+        self.pods = []
+        self.drawn = 0
+
+    def _list_workloads(self):
+        snapshot = Snapshot.from_cluster(self.namespace,
+                                         kinds='deployments,statefulsets')
+        for component, kind, _ in COMPONENTS:
+            for obj in snapshot.get(kind, component_selector(component),
+                                    namespace=self.namespace):
+                workload = Workload(component, obj, self.timeouts[component])
+                if workload.desired:
+                    self.workloads[(workload.kind, workload.name)] = workload
+
+    def _table(self, now):
+        width = max(len(w.title) for w in self.workloads.values())
+        lines = [f'{"WORKLOAD":<{width}}  {"READY":>7}  STATUS']
+        for w in self.workloads.values():
+            ready = f'{w.ready}/{w.desired}'
+            lines.append(f'{w.title:<{width}}  {ready:>7}  {w.status(now)}')
+        return lines
+
+    def _draw(self, now):
+        lines = self._table(now)
+        if self.drawn:
+            # Move back to the start of the previous table
+            sys.stdout.write(f'\033[{self.drawn}F')
+        sys.stdout.write(''.join(f'{line}\033[K\n' for line in lines))
+        sys.stdout.flush()
+        self.drawn = len(lines)
+
+    def _update(self, pods):
+        """Update the workloads from the pods.  True when all are done."""
+        now = time.monotonic() - self.start
+        self.pods = pods
+        ready = dict.fromkeys(self.workloads, 0)
+        for pod in pods:
+            key = pod_workload(pod)
+            if key in ready and pod_ready(pod):
+                ready[key] += 1
+        for key, workload in self.workloads.items():
+            workload.ready = ready[key]
+            if workload.done:
+                continue
+            if workload.ready >= workload.desired:
+                workload.elapsed = now
+                if self.timer:
+                    end = time.perf_counter()
+                    self.timer.add(workload.title, end - now, end,
+                                   parent=self.parent)
+                if not self.live:
+                    self.logger.log(f'Rollout of {workload.title} finished '
+                                    f'after {now:.0f} seconds')
+            elif now >= workload.timeout:
+                workload.timed_out = True
+                if not self.live:
+                    self.logger.logfail(f'Rollout of {workload.title} timed '
+                                        f'out after {now:.0f} seconds')
+        if self.live:
+            self._draw(now)
+        return all(w.done for w in self.workloads.values())
+
+    def wait(self):
+        """Wait for all workloads.  Returns the list of timed out ones."""
+        self._list_workloads()
+        if not self.workloads:
+            self.logger.logwarning('No CORTX workloads found')
+            return []
+        self.start = time.monotonic()
+        self.parent = self.timer.current() if self.timer else None
+        with Watch('pods', self.namespace, CORTX_SELECTOR) as watch:
+            # Wake up every second to refresh the table and check timeouts
+            while not watch.wait_for(self._update, 1):
+                if watch.stopped:
+                    break
+        if self.drawn:
+            # Replace the live table with the logged one, so that the
+            # final state is in the log file too
+            sys.stdout.write(f'\033[{self.drawn}F\033[J')
+            sys.stdout.flush()
+        for line in self._table(time.monotonic() - self.start):
+            self.logger.log(line)
+        self.report()
+        return [w for w in self.workloads.values() if w.timed_out]
+
+    def distribution(self):
+        """Return {component: (times to ready, slowest pod name)}."""
+        times = {}
+        for pod in self.pods:
+            seconds = time_to_ready(pod) if pod_ready(pod) else None
+            key = pod_workload(pod)
+            if seconds is None or key not in self.workloads:
+                continue
+            times.setdefault(self.workloads[key].component, []).append(
+                (seconds, pod['metadata']['name']))
+        return {component: ([t for t, _ in sorted(values)],
+                            max(values)[1])
+                for component, values in times.items()}
+
+    def report(self):
+        """Log the distribution of the time to ready of each component."""
+        distribution = self.distribution()
+        if not distribution:
+            return
+        header = ' '.join(f'{f"p{p}":>5}' for p in PERCENTILES)
+        self.logger.log(f'{"Time to ready (s)":<18} {"pods":>5} {"min":>5} '
+                        f'{header} {"max":>5}  slowest')
+        for component, _, _ in COMPONENTS:
+            if component not in distribution:
+                continue
+            times, slowest = distribution[component]
+            pcts = ' '.join(f'{_percentile(times, p):>5.0f}'
+                            for p in PERCENTILES)
+            self.logger.log(f'{component:<18} {len(times):>5} '
+                            f'{times[0]:>5.0f} {pcts} {times[-1]:>5.0f}  '
+                            f'{slowest}')
+
+
+def wait_for_rollout(namespace, logger=None, timeouts=None, timer=None,
+                     live=None):
+    """Wait for all CORTX workloads.  Returns 0 on success, 1 on failure."""
+    monitor = RolloutMonitor(namespace, logger=logger, timeouts=timeouts,
+                             timer=timer, live=live)
+    try:
+        timed_out = monitor.wait()
+    except KubectlError as e:
+        monitor.logger.logfail(f'Waiting for the CORTX workloads failed: {e}')
+        return 1
+    if timed_out:
+        monitor.logger.logfail(
+            'A timeout occurred while waiting for '
+            f'{", ".join(w.title for w in timed_out)}')
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Wait for the CORTX workloads to be ready')
+    parser.add_argument('-s', '--solution', required=True)
+    parser.add_argument('--timeout', action='append', default=[],
+                        metavar='COMPONENT=DURATION',
+                        help='Timeout for the workloads of a component, '
+                             'e.g. data=15m')
+    parser.add_argument('--no-live', action='store_true',
+                        help='Log completed workloads instead of redrawing '
+                             'the table')
+    args = parser.parse_args()
+
+    timeouts = {}
+    for value in args.timeout:
+        component, _, duration = value.partition('=')
+        try:
+            timeouts[component] = parse_duration(duration)
+        except ValueError as e:
+            parser.error(str(e))
+    solution = safe_load(open(args.solution))['solution']
+    sys.exit(wait_for_rollout(solution['namespace'], timeouts=timeouts,
+                              live=False if args.no_live else None))
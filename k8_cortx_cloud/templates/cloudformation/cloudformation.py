@@ -2,6 +2,9 @@
 
 import sys
 import json
+import gzip
+import base64
+import re
 import string
 import argparse
 
@@ -217,6 +220,55 @@ def eni():
     }
 
 
+# CloudFormation limits, in bytes
+TEMPLATE_BODY_LIMIT = 51200
+TEMPLATE_S3_LIMIT = 1048576
+USERDATA_LIMIT = 16384
+
+# How the bootstrap script is included in each node's UserData:
+#   inline:  the script itself, uncompressed
+#   gzip:    the script, gzip compressed and base64 encoded
+#   mapping: gzip+base64 as well, but stored once in the template's
+#            Mappings section and referenced by each node
+BOOTSTRAP_MODES = ['inline', 'gzip', 'mapping']
+
+# Path of the bootstrap script on the nodes for gzip/mapping modes
+BOOTSTRAP_PATH = '/root/cortx-bootstrap.sh'
+
+# Shell variables the bootstrap script is parameterized with, and the
+# CloudFormation values they are set from in each node's UserData.
+STACK_VARS = [
+    ('CFN_STACK', 'AWS::StackName'),
+    ('CFN_REGION', 'AWS::Region'),
+    ('KUBERNETES_TOKEN', 'KubernetesToken'),
+    ('CONTROL_PLANE_IP', 'ControlPlaneENI.PrimaryPrivateIpAddress'),
+    ('VERSION_DEPLOYMENT_REPO', 'VersionDeploymentRepo'),
+    ('DISK_SIZE_MOTR', 'DiskSizeMotr'),
+    ('SETUP_SIZE', 'SetupSize'),
+    ('DURABILITY_SNS', 'DurabilitySNS'),
+    ('DURABILITY_DIX', 'DurabilityDIX'),
+]
+
+# solution.yaml image key -> template parameter
+IMAGES = [
+    ('cortxcontrol', 'ImageCORTXControl'),
+    ('cortxdata', 'ImageCORTXData'),
+    ('cortxserver', 'ImageCORTXServer'),
+    ('cortxha', 'ImageCORTXHA'),
+    ('cortxclient', 'ImageCORTXClient'),
+    ('openldap', 'ImageOpenLDAP'),
+    ('consul', 'ImageConsul'),
+    ('kafka', 'ImageKafka'),
+    ('zookeeper', 'ImageZookeeper'),
+    ('rancher', 'ImageRancher'),
+    ('busybox', 'ImageBusybox'),
+]
+
+
+def image_var(image):
+    return 'IMAGE_' + image.upper()
+
+
 def node(eni_name, userdata):
     return {
         "Type": "AWS::EC2::Instance",
@@ -234,7 +286,7 @@ def node(eni_name, userdata):
                 "Fn::Base64": {
                     "Fn::Join": [
                         "\n",
-                        userdata + ["DEPLOY_SUCCESS=true"]]
+                        userdata]
                 }
             }
         },
@@ -246,28 +298,95 @@ def node(eni_name, userdata):
     }
 
 
-def prepare(name):
+CFN_BOOTSTRAP_URL = 'https://s3.amazonaws.com/cloudformation-examples/aws-cfn-bootstrap-py3-latest.tar.gz'
+YQ_URL = 'https://github.com/mikefarah/yq/releases/download/v4.19.1/yq_linux_amd64'
+DOCKER_REPO_URL = 'https://download.docker.com/linux/centos/docker-ce.repo'
+
+# Created once the packages are installed.  On an image baked with the
+# packages preinstalled, the --prebaked-ami bootstrap skips installing them.
+PREBAKED_MARKER = '/etc/cortx-k8s-prebaked'
+
+
+def kubernetes_repo():
     return [
-        "#!/bin/bash",
-        "set -xeuo pipefail",
-        "env",
-        "cd /root",
+        "cat <<EOF | tee /etc/yum.repos.d/kubernetes.repo",
+        "[kubernetes]",
+        "name=Kubernetes",
+        "baseurl=https://packages.cloud.google.com/yum/repos/kubernetes-el7-\\$basearch",
+        "enabled=1",
+        "gpgcheck=1",
+        # https://cloud.google.com/compute/docs/troubleshooting/known-issues#keyexpired
+        "repo_gpgcheck=0",
+        "gpgkey=https://packages.cloud.google.com/yum/doc/yum-key.gpg https://packages.cloud.google.com/yum/doc/rpm-package-key.gpg",
+        "exclude=kubelet kubeadm kubectl",
+        "EOF",
+    ]
 
-        "yum update -y",
-        "yum install -y yum-utils git wget nvme-cli python3",
 
-        "wget --no-verbose https://s3.amazonaws.com/cloudformation-examples/aws-cfn-bootstrap-py3-latest.tar.gz",
+def install_packages(parallel=False):
+    if not parallel:
+        return [
+            "yum update -y",
+            "yum install -y yum-utils git wget nvme-cli python3",
+            "wget --no-verbose {}".format(CFN_BOOTSTRAP_URL),
+            "wget --no-verbose {} -O /usr/bin/yq".format(YQ_URL),
+            "yum-config-manager --add-repo {}".format(DOCKER_REPO_URL),
+        ] + kubernetes_repo() + [
+            "yum install -y containerd.io",
+            "yum install -y kubelet kubeadm kubectl --disableexcludes=kubernetes",
+            "tar -xf aws-cfn-bootstrap-py3-latest.tar.gz",
+            "(cd aws-cfn-bootstrap-2.0/ && python3 setup.py install)",
+            "chmod +x /usr/bin/yq",
+        ]
+
+    # Download with curl from the base image while yum runs, and
+    # install all packages in one yum transaction.
+    return [
+        "DOWNLOADS=()",
+        "curl -sSfL {} -o aws-cfn-bootstrap-py3-latest.tar.gz & DOWNLOADS+=($!)".format(CFN_BOOTSTRAP_URL),
+        "curl -sSfL {} -o /usr/bin/yq & DOWNLOADS+=($!)".format(YQ_URL),
+        "curl -sSfL {} -o /etc/yum.repos.d/docker-ce.repo".format(DOCKER_REPO_URL),
+    ] + kubernetes_repo() + [
+        "yum update -y",
+        "yum install -y yum-utils git wget nvme-cli python3 containerd.io kubelet kubeadm kubectl --disableexcludes=kubernetes",
+        'for pid in "${DOWNLOADS[@]}"; do wait $pid; done',
         "tar -xf aws-cfn-bootstrap-py3-latest.tar.gz",
         "(cd aws-cfn-bootstrap-2.0/ && python3 setup.py install)",
+        "chmod +x /usr/bin/yq",
+    ]
+
+
+def prepare(prebaked=False, parallel=False):
+    out = [
+        "set -xeuo pipefail",
+        "env",
+        "cd /root",
+
         "DEPLOY_SUCCESS=false",
         "function signal_cloudformation() {",
-        {"Fn::Sub": "/usr/local/bin/cfn-signal --stack ${{AWS::StackName}} --resource {} --region ${{AWS::Region}} --success $DEPLOY_SUCCESS".format(name)},
+        "if [[ -x /usr/local/bin/cfn-signal ]]; then",
+        '/usr/local/bin/cfn-signal --stack "$CFN_STACK" --resource "$CFN_RESOURCE" --region "$CFN_REGION" --success $DEPLOY_SUCCESS',
+        "fi",
         "}",
         "trap signal_cloudformation EXIT",
+    ]
 
-        "wget --no-verbose https://github.com/mikefarah/yq/releases/download/v4.19.1/yq_linux_amd64 -O /usr/bin/yq",
-        "chmod +x /usr/bin/yq",
-
+    if prebaked:
+        # NODE_ROLE=image only installs the packages, to bake an image
+        out += ["if [[ ! -f {} ]]; then".format(PREBAKED_MARKER)]
+        out += install_packages(parallel)
+        out += [
+            "touch {}".format(PREBAKED_MARKER),
+            "fi",
+            'if [[ "$NODE_ROLE" == image ]]; then',
+            "trap - EXIT",
+            "exit 0",
+            "fi",
+        ]
+    else:
+        out += install_packages(parallel)
+
+    return out + [
         "cat <<EOF | tee /etc/modules-load.d/containerd.conf",
         "overlay",
         "br_netfilter",
@@ -282,29 +401,14 @@ def prepare(name):
         "EOF",
         "sysctl --system",
 
-        "yum-config-manager --add-repo https://download.docker.com/linux/centos/docker-ce.repo",
-        "yum install -y containerd.io",
         "mkdir -p /etc/containerd",
         "containerd config default > /etc/containerd/config.toml",
         "systemctl enable containerd",
         "systemctl restart containerd",
 
-        "cat <<EOF | tee /etc/yum.repos.d/kubernetes.repo",
-        "[kubernetes]",
-        "name=Kubernetes",
-        "baseurl=https://packages.cloud.google.com/yum/repos/kubernetes-el7-\\$basearch",
-        "enabled=1",
-        "gpgcheck=1",
-        # https://cloud.google.com/compute/docs/troubleshooting/known-issues#keyexpired
-        "repo_gpgcheck=0",
-        "gpgkey=https://packages.cloud.google.com/yum/doc/yum-key.gpg https://packages.cloud.google.com/yum/doc/rpm-package-key.gpg",
-        "exclude=kubelet kubeadm kubectl",
-        "EOF",
-
         "setenforce 0",
         "sed -i 's/^SELINUX=enforcing$/SELINUX=permissive/' /etc/selinux/config",
 
-        "yum install -y kubelet kubeadm kubectl --disableexcludes=kubernetes",
         "systemctl enable --now kubelet",
 
         # magic!
@@ -334,7 +438,7 @@ def k8s_init():
         "apiVersion: kubeadm.k8s.io/v1beta3",
         "kind: InitConfiguration",
         "bootstrapTokens:",
-        {"Fn::Sub": "- token: \"${KubernetesToken}\""},
+        '- token: "$KUBERNETES_TOKEN"',
         "EOF",
         "kubeadm init --config kubeadm-config.yaml",
 
@@ -354,42 +458,48 @@ def k8s_init():
 
 def k8s_join():
     return [
-        {"Fn::Sub": "kubeadm join ${ControlPlaneENI.PrimaryPrivateIpAddress}:6443 --token ${KubernetesToken} --discovery-token-unsafe-skip-ca-verification"},
+        'kubeadm join "$CONTROL_PLANE_IP:6443" --token "$KUBERNETES_TOKEN" --discovery-token-unsafe-skip-ca-verification',
     ]
 
 
-def cortx_prepare(cvgs, datas):
+def cortx_clone():
+    return 'git clone -b "$VERSION_DEPLOYMENT_REPO" https://github.com/Seagate/cortx-k8s.git'
+
+
+def cortx_prepare(cvgs, datas, parallel=False):
+    # With parallel, the clone was started in the background earlier.
+    # Only the control plane, which deploys CORTX, generates the solution.
     return [
-        {"Fn::Sub": "git clone -b ${VersionDeploymentRepo} https://github.com/Seagate/cortx-k8s.git"},
+        'wait $CLONE' if parallel else cortx_clone(),
+        'if [[ "$NODE_ROLE" == control-plane ]]; then',
         "mv ./cortx-k8s/k8_cortx_cloud/solution.yaml ./cortx-k8s/k8_cortx_cloud/solution.yaml.orig",
-        {"Fn::Sub": "./cortx-k8s/k8_cortx_cloud/generate-cvg-yaml.sh --nodes nodes.txt --devices devices.txt --cvgs {} --data {} --solution ./cortx-k8s/k8_cortx_cloud/solution.yaml.orig  --datasize ${{DiskSizeMotr}}Gi --metadatasize ${{DiskSizeMotr}}Gi > ./cortx-k8s/k8_cortx_cloud/solution.yaml".format(cvgs, datas)},
+        "./cortx-k8s/k8_cortx_cloud/generate-cvg-yaml.sh --nodes nodes.txt --devices devices.txt --cvgs {} --data {} --solution ./cortx-k8s/k8_cortx_cloud/solution.yaml.orig  --datasize ${{DISK_SIZE_MOTR}}Gi --metadatasize ${{DISK_SIZE_MOTR}}Gi > ./cortx-k8s/k8_cortx_cloud/solution.yaml".format(cvgs, datas),
+        "fi",
         #TODO after bump to version with https://github.com/Seagate/cortx-k8s/pull/144
         # update prereq script args. Should be:
         #     ./prereq-deploy-cortx-cloud.sh -d /dev/sdb
         "(cd cortx-k8s/k8_cortx_cloud/ && ./prereq-deploy-cortx-cloud.sh /dev/sdb)",
+        'if [[ "$NODE_ROLE" == control-plane ]]; then',
         "yq -i '",
-        {"Fn::Sub": '  .solution.common.setup_size = "${SetupSize}"'},
-        {"Fn::Sub": '| .solution.common.storage_sets.durability.sns = "${DurabilitySNS}"'},
-        {"Fn::Sub": '| .solution.common.storage_sets.durability.dix = "${DurabilityDIX}"'},
-        {"Fn::Sub": '| .solution.images.cortxcontrol = "${ImageCORTXControl}"'},
-        {"Fn::Sub": '| .solution.images.cortxdata = "${ImageCORTXData}"'},
-        {"Fn::Sub": '| .solution.images.cortxserver = "${ImageCORTXServer}"'},
-        {"Fn::Sub": '| .solution.images.cortxha = "${ImageCORTXHA}"'},
-        {"Fn::Sub": '| .solution.images.cortxclient = "${ImageCORTXClient}"'},
-        {"Fn::Sub": '| .solution.images.openldap = "${ImageOpenLDAP}"'},
-        {"Fn::Sub": '| .solution.images.consul = "${ImageConsul}"'},
-        {"Fn::Sub": '| .solution.images.kafka = "${ImageKafka}"'},
-        {"Fn::Sub": '| .solution.images.zookeeper = "${ImageZookeeper}"'},
-        {"Fn::Sub": '| .solution.images.rancher = "${ImageRancher}"'},
-        {"Fn::Sub": '| .solution.images.busybox = "${ImageBusybox}"'},
+        '  .solution.common.setup_size = strenv(SETUP_SIZE)',
+        '| .solution.common.storage_sets.durability.sns = strenv(DURABILITY_SNS)',
+        '| .solution.common.storage_sets.durability.dix = strenv(DURABILITY_DIX)',
+    ] + [
+        '| .solution.images.{} = strenv({})'.format(image, image_var(image))
+        for image, _ in IMAGES
+    ] + [
         "' cortx-k8s/k8_cortx_cloud/solution.yaml",
         "cat cortx-k8s/k8_cortx_cloud/solution.yaml",
+        "fi",
     ]
 
 
 def cortx_deploy():
     return [
-        "for n in $(cat nodes.txt); do while ! kubectl wait --for=condition=Ready \"node/$n\"; do sleep 5; done; done",
+        # kubectl wait fails for nodes that have not joined yet, so wait
+        # for all to join first, then for all to be ready at once
+        "until [[ $(kubectl get nodes --no-headers | wc -l) -ge $(wc -l < nodes.txt) ]]; do sleep 5; done",
+        "kubectl wait --for=condition=Ready --timeout=20m $(sed 's|^|node/|' nodes.txt)",
         "(cd cortx-k8s/k8_cortx_cloud/ && ./deploy-cortx-cloud.sh)",
     ]
 
@@ -412,17 +522,17 @@ def device_list(disk_count):
     return out
 
 
-def node_list(worker_count):
-    out = ["NODE_DOMAIN=$(cat /etc/resolv.conf | grep search | awk '{print $2}')"]
-    nodes = ['Worker{}ENI'.format(i) for i in range(worker_count)]
-    nodes.append('ControlPlaneENI')
-    for e in nodes:
-        out.append({"Fn::Sub": "NODE_IP=${{{}.PrimaryPrivateIpAddress}}".format(e)})
-        out.append("SHORT_NAME=ip-$(echo \"$NODE_IP\" | sed 's/\./-/g')")
-        out.append("NODE_NAME=$SHORT_NAME.$NODE_DOMAIN")
-        out.append('echo "$NODE_NAME" >> nodes.txt')
-        out.append('echo "$NODE_IP" "$NODE_NAME" "$SHORT_NAME" >> /etc/hosts')
-    return out
+def node_list():
+    # NODE_IPS is set in the UserData of the control plane, see node_ips()
+    return [
+        "NODE_DOMAIN=$(cat /etc/resolv.conf | grep search | awk '{print $2}')",
+        "for NODE_IP in $NODE_IPS; do",
+        "SHORT_NAME=ip-$(echo \"$NODE_IP\" | sed 's/\\./-/g')",
+        "NODE_NAME=$SHORT_NAME.$NODE_DOMAIN",
+        'echo "$NODE_NAME" >> nodes.txt',
+        'echo "$NODE_IP" "$NODE_NAME" "$SHORT_NAME" >> /etc/hosts',
+        "done",
+    ]
 
 
 def motr_disk(device):
@@ -435,33 +545,186 @@ def motr_disk(device):
     }
 
 
-def control_plane(resources, worker_count, cvgs, datas):
+def bootstrap_script(cvgs, datas, prebaked=False, parallel=False):
+    """Return the lines of the bootstrap script shared by all nodes.
+
+       The script is parameterized with the shell variables set by
+       stack_vars(), plus CFN_RESOURCE and NODE_ROLE ("control-plane"
+       or "worker"), which are set in each node's UserData.  Only the
+       control plane lists the nodes and generates the solution, so
+       NODE_IPS (see node_ips()) is only set in its UserData.
+
+       With prebaked, package installation is skipped on images with
+       PREBAKED_MARKER, and NODE_ROLE "image" only installs packages.
+       With parallel, downloads and the cortx-k8s clone overlap with
+       the other steps.
+    """
+    clone = ['{} & CLONE=$!'.format(cortx_clone())] if parallel else []
+    return (
+        prepare(prebaked, parallel) +
+        clone +
+        ['if [[ "$NODE_ROLE" == control-plane ]]; then'] +
+        node_list() +
+        device_list(disk_count(cvgs, datas)) +
+        k8s_init() +
+        ['else'] +
+        k8s_join() +
+        ['fi'] +
+        cortx_prepare(cvgs, datas, parallel) +
+        ['if [[ "$NODE_ROLE" == control-plane ]]; then'] +
+        cortx_deploy() +
+        ['fi'] +
+        ["DEPLOY_SUCCESS=true"]
+    )
+
+
+def stack_vars():
+    """Return an Fn::Sub that exports the bootstrap script's variables."""
+    lines = ['export {}="${{{}}}"'.format(var, value)
+             for var, value in STACK_VARS]
+    lines += ['export {}="${{{}}}"'.format(image_var(image), param)
+              for image, param in IMAGES]
+    return {"Fn::Sub": '\n'.join(lines)}
+
+
+def node_ips(worker_count):
+    """Return an Fn::Sub that exports the IP addresses of all nodes.
+
+       Only the control plane's UserData includes it, which keeps the
+       template size linear in the number of nodes.
+    """
+    enis = ['Worker{}ENI'.format(i) for i in range(worker_count)]
+    enis.append('ControlPlaneENI')
+    return {"Fn::Sub": 'export NODE_IPS="{}"'.format(
+        ' '.join('${{{}.PrimaryPrivateIpAddress}}'.format(e) for e in enis))}
+
+
+def compress(lines):
+    """Return the script as gzip compressed, base64 encoded text."""
+    data = ('\n'.join(['#!/bin/bash'] + lines) + '\n').encode()
+    return base64.b64encode(gzip.compress(data, mtime=0)).decode()
+
+
+class Bootstrap:
+    def __init__(self, worker_count, cvgs, datas, mode='inline',
+                 prebaked=False, parallel=False):
+        """Renders the UserData of each node.
+
+           The bootstrap script and the variables set from the stack
+           are the same for all nodes, so they are built once and
+           shared by the UserData of every node.
+        """
+        self.mode = mode
+        self.script = bootstrap_script(cvgs, datas, prebaked, parallel)
+        self.vars = stack_vars()
+        self.node_ips = node_ips(worker_count)
+        self.compressed = compress(self.script) if mode != 'inline' else None
+
+    def mappings(self):
+        """Return the Mappings entries needed by the UserData."""
+        if self.mode != 'mapping':
+            return {}
+        return {"Bootstrap": {"Script": {"Gzip": self.compressed}}}
+
+    def userdata(self, name, role):
+        out = ["#!/bin/bash", self.vars]
+        if role == 'control-plane':
+            out.append(self.node_ips)
+        out.append('export CFN_RESOURCE={} NODE_ROLE={}'.format(name, role))
+        if self.mode == 'inline':
+            return out + self.script
+
+        unpack = "' | base64 -d | gunzip > {}".format(BOOTSTRAP_PATH)
+        if self.mode == 'gzip':
+            script = "echo '" + self.compressed + unpack
+        else:
+            script = {"Fn::Join": ["", [
+                "echo '",
+                {"Fn::FindInMap": ["Bootstrap", "Script", "Gzip"]},
+                unpack]]}
+        return out + [script, 'exec bash {}'.format(BOOTSTRAP_PATH)]
+
+
+def prebaked_image(out):
+    """Use an ImageId parameter instead of the stock AMI of the region."""
+    out['Parameters']['ImageId'] = {
+        "Description": "AMI with the node packages preinstalled",
+        "Type": "AWS::EC2::Image::Id"
+    }
+    out['Resources']['NodeTemplate']['Properties']['LaunchTemplateData']['ImageId'] = {"Ref": "ImageId"}
+
+
+def control_plane(resources, bootstrap):
     name = 'ControlPlane'
     eni_name = name + 'ENI'
 
     resources[eni_name] = eni()
     resources[name] = node(eni_name,
-        prepare(name) +
-        node_list(worker_count) +
-        device_list(disk_count(cvgs, datas)) +
-        k8s_init() +
-        cortx_prepare(cvgs, datas) +
-        cortx_deploy(),
-    )
+                           bootstrap.userdata(name, 'control-plane'))
 
 
-def worker(resources, worker_count, cvgs, datas, i):
+def worker(resources, bootstrap, i):
     name = 'Worker{}'.format(i)
     eni_name = name + 'ENI'
 
     resources[eni_name] = eni()
-    resources[name] = node(eni_name,
-        prepare(name) +
-        node_list(worker_count) +
-        device_list(disk_count(cvgs, datas)) +
-        k8s_join() +
-        cortx_prepare(cvgs, datas)
-    )
+    resources[name] = node(eni_name, bootstrap.userdata(name, 'worker'))
+
+
+def rendered_size(value, mappings):
+    """Estimate the size of a value once CloudFormation renders it.
+
+       Substituted stack values are assumed to be 15 bytes for IP
+       addresses and 64 bytes otherwise.
+    """
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, list):
+        return sum(rendered_size(v, mappings) for v in value)
+    if 'Fn::Base64' in value:
+        return rendered_size(value['Fn::Base64'], mappings)
+    if 'Fn::Join' in value:
+        delimiter, parts = value['Fn::Join']
+        return (rendered_size(parts, mappings) +
+                len(delimiter) * max(len(parts) - 1, 0))
+    if 'Fn::Sub' in value:
+        return len(re.sub(r'\$\{[^}]*\}',
+                          lambda m: 'x' * (15 if 'PrivateIpAddress' in m.group(0) else 64),
+                          value['Fn::Sub']))
+    if 'Fn::FindInMap' in value:
+        name, key, attr = value['Fn::FindInMap']
+        return len(mappings[name][key][attr])
+    return len(json.dumps(value))
+
+
+def size_report(out, text, bootstrap, file=sys.stderr):
+    """Print the template and UserData sizes, and warn about limits."""
+    size = len(text.encode())
+    print('Template size: {} bytes (limits: {} uploaded directly, '
+          '{} from S3)'.format(size, TEMPLATE_BODY_LIMIT, TEMPLATE_S3_LIMIT),
+          file=file)
+    if size > TEMPLATE_S3_LIMIT:
+        print('WARNING: template exceeds the CloudFormation size limit',
+              file=file)
+    elif size > TEMPLATE_BODY_LIMIT:
+        print('NOTE: template must be uploaded to S3', file=file)
+
+    script = len('\n'.join(bootstrap.script))
+    print('Bootstrap script: {} bytes'.format(script), end='', file=file)
+    if bootstrap.compressed:
+        print(', {} bytes gzip+base64'.format(len(bootstrap.compressed)),
+              end='', file=file)
+    print(' ({})'.format(bootstrap.mode), file=file)
+
+    mappings = out.get('Mappings', {})
+    sizes = {name: rendered_size(r['Properties']['UserData'], mappings)
+             for name, r in out['Resources'].items()
+             if r['Type'] == 'AWS::EC2::Instance'}
+    largest = max(sizes, key=sizes.get)
+    print('UserData: {} nodes, largest {} bytes ({}), limit {}'.format(
+        len(sizes), sizes[largest], largest, USERDATA_LIMIT), file=file)
+    if sizes[largest] > USERDATA_LIMIT:
+        print('WARNING: UserData exceeds the EC2 size limit', file=file)
 
 
 if __name__ == '__main__':
@@ -469,6 +732,21 @@ if __name__ == '__main__':
     parser.add_argument('--nodes', default=3, type=int, help='Number of nodes')
     parser.add_argument('--cvgs', default=2, type=int, help='Number of CVGs')
     parser.add_argument('--data', default=2, type=int, help='Number of data disks per CVG')
+    parser.add_argument('--bootstrap', default='inline', choices=BOOTSTRAP_MODES,
+                        help='How to include the node bootstrap script: inline in each '
+                             'node\'s UserData, gzip compressed in each node\'s UserData, '
+                             'or compressed once in the template\'s Mappings (smallest)')
+    parser.add_argument('--compact', action='store_true',
+                        help='Write the JSON without indentation or spaces')
+    parser.add_argument('--size-report', action='store_true',
+                        help='Print template and UserData sizes to stderr')
+    parser.add_argument('--prebaked-ami', action='store_true',
+                        help='Take the AMI as a parameter, and skip installing packages '
+                             'on images created with them preinstalled')
+    parser.add_argument('--parallel-downloads', action='store_true',
+                        help='Overlap downloads with package installation and setup')
+    parser.add_argument('--print-script', action='store_true',
+                        help='Print the node bootstrap script instead of the template')
     args = parser.parse_args()
 
     worker_count = args.nodes - 1
@@ -480,9 +758,22 @@ if __name__ == '__main__':
     for d in devices(disk_count(args.cvgs, args.data)):
         out['Resources']['NodeTemplate']['Properties']['LaunchTemplateData']['BlockDeviceMappings'].append(motr_disk(d))
 
-    control_plane(out['Resources'], worker_count, args.cvgs, args.data)
+    bootstrap = Bootstrap(worker_count, args.cvgs, args.data, args.bootstrap,
+                          args.prebaked_ami, args.parallel_downloads)
+    if args.print_script:
+        print('\n'.join(['#!/bin/bash'] + bootstrap.script))
+        sys.exit(0)
+    if args.prebaked_ami:
+        prebaked_image(out)
+    out['Mappings'].update(bootstrap.mappings())
+    control_plane(out['Resources'], bootstrap)
     for i in range(worker_count):
-        worker(out['Resources'], worker_count, args.cvgs, args.data, i)
-
-    json.dump(out, sys.stdout, indent=2, sort_keys=True)
-    sys.stdout.write('\n')
+        worker(out['Resources'], bootstrap, i)
+
+    if args.compact:
+        text = json.dumps(out, separators=(',', ':'), sort_keys=True)
+    else:
+        text = json.dumps(out, indent=2, sort_keys=True)
+    sys.stdout.write(text + '\n')
+    if args.size_report:
+        size_report(out, text, bootstrap)
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+##################################################
+# benchmark.py
+#
+# Deploy-time benchmark.
+#
+# Repeats deploy -> status -> destroy a number of times for
+# one solution variant, and records the duration of each
+# phase.  The samples are appended to a history file, and
+# compared with the samples of earlier runs of the same
+# variant.  A phase that is significantly slower than that
+# baseline is reported as a test failure, so a performance
+# regression fails the run like a functional failure does.
+#
+# A slowdown is flagged if the median is more than
+# --threshold percent above the baseline median and a
+# one-sided Mann-Whitney U test finds the samples are
+# larger than the baseline at the --alpha level.
+#
+##################################################
+
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import time
+
+from checker import Checker
+from cluster import Cluster
+from utils import Logger, StopWatch
+
+
+PHASES = ['deploy', 'status', 'destroy']
+PERCENTILES = [50, 90, 95]
+
+DEFAULT_HISTORY_FILE = 'benchmark-history.json'
+DEFAULT_ALPHA = 0.05
+DEFAULT_THRESHOLD = 10.0
+
+
+def percentiles(samples):
+    """Return a dict of percentile name (e.g. "p90") to value, plus min/max."""
+    samples = sorted(samples)
+    result = {'min': samples[0], 'max': samples[-1]}
+    for pct in PERCENTILES:
+        if len(samples) == 1:
+            value = samples[0]
+        else:
+            value = statistics.quantiles(samples, n=100,
+                                         method='inclusive')[pct - 1]
+        result[f'p{pct}'] = value
+    return result
+
+
+def mann_whitney_greater(samples, baseline):
+    """One-sided Mann-Whitney U test that samples exceed baseline.
+
+       Returns the p-value, using the normal approximation with a
+       continuity and tie correction.
+    """
+    n1, n2 = len(samples), len(baseline)
+    combined = sorted([(v, 0) for v in samples] + [(v, 1) for v in baseline])
+
+    # Rank with ties given their average rank
+    ranks = [0.0] * len(combined)
+    tie_term = 0
+    i = 0
+    while i < len(combined):
+        j = i
+        while j + 1 < len(combined) and combined[j + 1][0] == combined[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        t = j - i + 1
+        tie_term += t**3 - t
+        i = j + 1
+
+    r1 = sum(r for r, (_, group) in zip(ranks, combined) if group == 0)
+    u1 = r1 - n1 * (n1 + 1) / 2
+    n = n1 + n2
+    variance = n1 * n2 / 12 * ((n + 1) - tie_term / (n * (n - 1)))
+    if variance <= 0:
+        return 1.0
+    z = (u1 - n1 * n2 / 2 - 0.5) / math.sqrt(variance)
+    return 0.5 * math.erfc(z / math.sqrt(2))
+
+
+class History:
+    def __init__(self, filename):
+        """Benchmark results of earlier runs, by variant.
+
+           The file holds a dict of variant name to a list of runs,
+           oldest first.  Each run records its timestamp, whether
+           the functional checks passed, and the samples (in seconds)
+           of each phase.
+        """
+        self.filename = filename
+        self.runs = {}
+        if os.path.exists(filename):
+            with open(filename) as f:
+                self.runs = json.load(f)
+
+    def baseline(self, variant, phase, runs):
+        """Return the samples of a phase from the last passing runs."""
+        passed = [r for r in self.runs.get(variant, []) if r['passed']]
+        samples = []
+        for run in passed[-runs:]:
+            samples += run['phases'].get(phase, [])
+        return samples
+
+    def append(self, variant, phases, passed):
+        self.runs.setdefault(variant, []).append({
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'passed': passed,
+            'phases': phases,
+        })
+        tmpfile = self.filename + '.tmp'
+        with open(tmpfile, 'w') as f:
+            json.dump(self.runs, f, indent=2)
+        os.replace(tmpfile, self.filename)
+
+
+def run_iteration(cluster, checker, samples, i):
+    sw = StopWatch()
+    for phase in PHASES:
+        sw.start()
+        result = getattr(cluster, phase)()
+        sw.stop()
+        checker.test_equal(0, result, f'Iteration {i}: {phase}')
+        samples[phase].append(round(sw.elapsed(), 3))
+        if result != 0 and phase == 'deploy':
+            # Clean up so the next iteration starts from scratch
+            cluster.destroy()
+            return False
+    return True
+
+
+def run_benchmark(cluster, logger, checker, variant, iterations, history,
+                  baseline_runs=5, alpha=DEFAULT_ALPHA,
+                  threshold=DEFAULT_THRESHOLD, record=True):
+    """Run the benchmark and check the timings against the history.
+
+       Arguments:
+           cluster: Cluster to benchmark
+           logger: Logger object for logging
+           checker: Checker that functional and performance results
+                  are recorded with
+           variant: Name the results are recorded under in history
+           iterations: Number of deploy -> status -> destroy cycles
+           history: History object, or None to not compare or record
+           baseline_runs: Number of earlier passing runs whose samples
+                  form the baseline
+           alpha: Significance level of the slowdown test
+           threshold: Minimum median slowdown, in percent, to flag
+           record: If false, do not add the results to history
+    """
+    samples = {phase: [] for phase in PHASES}
+    for i in range(1, iterations + 1):
+        logger.logheader(f'Benchmark {variant}: iteration {i}/{iterations}')
+        if not run_iteration(cluster, checker, samples, i):
+            break
+
+    passed = not checker.fails
+    for phase in PHASES:
+        if not samples[phase]:
+            continue
+        stats = percentiles(samples[phase])
+        logger.log(f'TIMING: {phase.capitalize()}: ' +
+                   '  '.join(f'{k}={v:.1f}s' for k, v in stats.items()),
+                   color=Logger.OKBLUE)
+
+        baseline = history.baseline(variant, phase, baseline_runs) \
+            if history else []
+        if not passed or len(baseline) < 2:
+            continue
+        median = statistics.median(samples[phase])
+        base_median = statistics.median(baseline)
+        slowdown = (median / base_median - 1) * 100 if base_median else 0
+        p_value = mann_whitney_greater(samples[phase], baseline)
+        regressed = slowdown > threshold and p_value < alpha
+        checker.test(not regressed,
+                     f'Benchmark {phase}: median {median:.1f}s vs baseline '
+                     f'{base_median:.1f}s ({slowdown:+.1f}%, p={p_value:.3f})')
+
+    if history and record:
+        history.append(variant, samples, passed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Benchmark deploy, status and destroy of a solution')
+    parser.add_argument('-s', '--solution', action='append', required=True)
+    parser.add_argument('--localfs',
+                        help='Run prereq-deploy-cortx-cloud.sh once first')
+    parser.add_argument('-n', '--iterations', type=int, default=3)
+    parser.add_argument('--variant',
+                        help='Name to record results under.  Defaults to '
+                             'the solution file names.')
+    parser.add_argument('--history', default=DEFAULT_HISTORY_FILE,
+                        help='File that benchmark results are kept in')
+    parser.add_argument('--no-record', action='store_true',
+                        help='Compare with the history, but do not add '
+                             'this run to it')
+    parser.add_argument('--baseline-runs', type=int, default=5,
+                        help='Number of earlier runs to compare with')
+    parser.add_argument('--alpha', type=float, default=DEFAULT_ALPHA,
+                        help='Significance level for flagging a slowdown')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Minimum median slowdown in percent to flag')
+    args = parser.parse_args()
+
+    variant = args.variant or ','.join(os.path.basename(s)
+                                       for s in args.solution)
+    logger = Logger()
+    checker = Checker(logger)
+    history = History(args.history)
+    cluster = Cluster(args.solution, localfs=args.localfs)
+    try:
+        if args.localfs:
+            results = cluster.run_prereq()
+            for node, result in results.items():
+                checker.test_equal(0, result,
+                                   f'Run prereq-cortx-cloud.sh on {node}')
+        if not checker.fails:
+            run_benchmark(cluster, logger, checker, variant, args.iterations,
+                          history, args.baseline_runs, args.alpha,
+                          args.threshold, record=not args.no_record)
+    finally:
+        cluster.close()
+
+    sys.exit(checker.result())
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+
+##################################################
+# chart_render.py
+#
+# Renders the CORTX Helm chart without a cluster, with a
+# cache of rendered manifests, and diffs the manifests of
+# two sets of values.
+#
+# With hundreds of CVGs, most of the rendering time is
+# spent on the data StatefulSets, one per group of
+# containerGroupSize CVGs.  A StatefulSet only depends on
+# its CVG group, its index (in its name and node-type
+# label) and the rest of the values.  So:
+#
+#   * Each StatefulSet is cached by a hash of the chart,
+#     the values other than the storage, and its CVG
+#     group.  The index is substituted in when a cached
+#     StatefulSet is used.
+#   * Only groups that are not cached are rendered, all
+#     in one "helm template --show-only" call.
+#   * The other resources are rendered from a copy of the
+#     chart without the StatefulSet template, and cached
+#     by a hash of the chart and all values.
+#
+# The chart generates a random cluster id unless clusterId
+# is set, so a fixed one is used for rendering.
+#
+# Usage:
+#   chart_render.py render -f values.yaml > manifest.yaml
+#   chart_render.py diff old-values.yaml new-values.yaml
+#
+# Solution files can be given instead of values files with
+# --solution, see k8_cortx_cloud/chart_values.py.
+#
+##################################################
+
+import argparse
+import difflib
+import hashlib
+import json
+import os
+import re
+import shutil
+import subprocess  # nosec
+import sys
+import tempfile
+
+import yaml
+
+import k8_cortx_cloud_path  # noqa: F401
+from chart_values import build_values
+
+
+DEFAULT_CHART_DIR = os.path.normpath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '../../charts/cortx'))
+DEFAULT_CACHE_DIR = '/tmp/cortx-k8s-render-cache'  # nosec B108
+
+STATEFULSET_TEMPLATE = 'templates/data/statefulset.yaml'
+RENDER_CLUSTER_ID = '00000000-0000-0000-0000-000000000000'
+INDEX_MARK = '@STS_INDEX@'
+
+# Lines of a data StatefulSet that contain its index
+_INDEX_LINES = [
+    re.compile(r'^(  name: \S+-g)\d+$', re.M),
+    re.compile(r'^(\s+cortx\.io/node-type: \S+-)\d+$', re.M),
+]
+_KIND = re.compile(r'^kind: (\S+)$', re.M)
+_NAME = re.compile(r'^  name: "?([^"\s]+)"?$', re.M)
+
+
+class RenderError(Exception):
+    pass
+
+
+def _hash(*parts):
+    h = hashlib.sha256()
+    for part in parts:
+        data = part if isinstance(part, str) else \
+            json.dumps(part, sort_keys=True, default=str)
+        h.update(data.encode() + b'\0')
+    return h.hexdigest()
+
+
+def split_documents(manifest):
+    """Split helm template output into non-empty documents."""
+    docs = []
+    for doc in re.split(r'^---\s*$', manifest, flags=re.M):
+        if doc.strip():
+            docs.append(doc.strip('\n') + '\n')
+    return docs
+
+
+def resource_key(doc):
+    """Return "Kind/name" of a manifest document."""
+    kind = _KIND.search(doc)
+    name = _NAME.search(doc)
+    return f'{kind.group(1) if kind else "?"}/{name.group(1) if name else "?"}'
+
+
+def chunk(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class RenderCache:
+    def __init__(self, chart_dir=DEFAULT_CHART_DIR,
+                 cache_dir=DEFAULT_CACHE_DIR, release='cortx',
+                 namespace='default', helm='helm'):
+        """Renders the chart, caching the results in cache_dir."""
+        self.chart_dir = chart_dir
+        self.cache_dir = cache_dir
+        self.release = release
+        self.namespace = namespace
+        self.helm = helm
+        self.rendered = 0
+        self.cached = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._ensure_dependencies()
+        self.chart_hash = self._chart_hash()
+
+    def _ensure_dependencies(self):
+        chart = yaml.safe_load(
+            open(os.path.join(self.chart_dir, 'Chart.yaml')))
+        if chart.get('dependencies') and \
+                not os.path.isdir(os.path.join(self.chart_dir, 'charts')):
+            self._helm('dependency', 'build', self.chart_dir)
+
+    def _chart_hash(self):
+        h = hashlib.sha256()
+        for root, dirs, files in os.walk(self.chart_dir):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                h.update(os.path.relpath(path, self.chart_dir).encode() +
+                         b'\0')
+                with open(path, 'rb') as f:
+                    h.update(f.read())
+        return h.hexdigest()
+
+    def _helm(self, *args):
+        child = subprocess.run([self.helm] + list(args),  # nosec B603
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               check=False)
+        if child.returncode != 0:
+            raise RenderError(f'helm {" ".join(args)} failed: '
+                              f'{child.stderr.decode().strip()}')
+        return child.stdout.decode()
+
+    def _template(self, chart_dir, values, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.yaml') as f:
+            yaml.safe_dump(values, f)
+            f.flush()
+            return self._helm('template', self.release, chart_dir,
+                              '--namespace', self.namespace, '-f', f.name,
+                              *args)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + '.yaml')
+
+    def _load(self, key):
+        try:
+            with open(self._path(key)) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _save(self, key, text):
+        tmp = self._path(key) + f'.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(text)
+        os.replace(tmp, self._path(key))
+
+    def _render_rest(self, values):
+        """Return the documents of everything but the data StatefulSets."""
+        key = _hash(self.chart_hash, self.release, self.namespace,
+                    'rest', values)
+        text = self._load(key)
+        if text is None:
+            with tempfile.TemporaryDirectory() as tmp:
+                chart = os.path.join(tmp, os.path.basename(self.chart_dir))
+                skip = os.path.join(self.chart_dir, STATEFULSET_TEMPLATE)
+                shutil.copytree(self.chart_dir, chart, ignore=lambda d, names:
+                                [n for n in names
+                                 if os.path.join(d, n) == skip])
+                text = self._template(chart, values)
+            self._save(key, text)
+            self.rendered += 1
+        else:
+            self.cached += 1
+        return split_documents(text)
+
+    def _render_statefulsets(self, values, groups):
+        """Return the data StatefulSet of each CVG group, in order."""
+        storage_set = values['storageSets'][0]
+        base = dict(values)
+        base['storageSets'] = [dict(storage_set, storage=[])]
+        base_key = _hash(self.chart_hash, self.release, self.namespace,
+                         'statefulset', base)
+        keys = [_hash(base_key, group) for group in groups]
+
+        docs = [self._load(key) for key in keys]
+        missing = [i for i, doc in enumerate(docs) if doc is None]
+        self.cached += len(groups) - len(missing)
+        if missing:
+            # Render all missing groups at once.  Only the last group
+            # can be smaller than containerGroupSize, so concatenating
+            # them in order chunks them the same way.
+            storage = [cvg for i in missing for cvg in groups[i]]
+            batch = dict(base)
+            batch['storageSets'] = [dict(storage_set, storage=storage)]
+            rendered = split_documents(self._template(
+                self.chart_dir, batch, '--show-only', STATEFULSET_TEMPLATE))
+            if len(rendered) != len(missing):
+                raise RenderError(f'Expected {len(missing)} StatefulSets, '
+                                  f'helm rendered {len(rendered)}')
+            for i, doc in zip(missing, rendered):
+                for regex in _INDEX_LINES:
+                    doc = regex.sub(r'\g<1>' + INDEX_MARK, doc)
+                self._save(keys[i], doc)
+                docs[i] = doc
+            self.rendered += len(missing)
+
+        return [doc.replace(INDEX_MARK, str(i)) for i, doc in enumerate(docs)]
+
+    def render(self, values):
+        """Return the list of manifest documents for values."""
+        values = dict(values)
+        values.setdefault('clusterId', RENDER_CLUSTER_ID)
+        docs = self._render_rest(values)
+
+        storage_sets = values.get('storageSets') or []
+        if storage_sets and storage_sets[0].get('storage') and \
+                int(storage_sets[0].get('containerGroupSize') or 0):
+            groups = chunk(storage_sets[0]['storage'],
+                           int(storage_sets[0]['containerGroupSize']))
+            docs += self._render_statefulsets(values, groups)
+        return docs
+
+
+def diff_manifests(old_docs, new_docs, old_name='old', new_name='new'):
+    """Return (summary lines, unified diff) of two lists of documents."""
+    old = {resource_key(d): d for d in old_docs}
+    new = {resource_key(d): d for d in new_docs}
+    summary = []
+    diff = []
+    for key in list(old) + [k for k in new if k not in old]:
+        if key not in new:
+            summary.append(f'removed: {key}')
+        elif key not in old:
+            summary.append(f'added:   {key}')
+        elif old[key] != new[key]:
+            summary.append(f'changed: {key}')
+        else:
+            continue
+        diff += difflib.unified_diff(
+            old.get(key, '').splitlines(keepends=True),
+            new.get(key, '').splitlines(keepends=True),
+            f'{old_name}:{key}', f'{new_name}:{key}')
+    return summary, ''.join(diff)
+
+
+def load_values(filename, solution=False, worker_nodes=None):
+    with open(filename) as f:
+        data = yaml.safe_load(f)
+    if not solution:
+        return data
+    return build_values(data['solution'], worker_nodes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Render and diff the CORTX chart without a cluster')
+    parser.add_argument('--chart', default=DEFAULT_CHART_DIR)
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--namespace', default='default')
+    parser.add_argument('--solution', action='store_true',
+                        help='Inputs are solution files, not chart values')
+    parser.add_argument('--worker-nodes', type=int, default=3,
+                        help='Number of schedulable nodes, with --solution')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    render_parser = subparsers.add_parser('render',
+                                          help='Print the manifests')
+    render_parser.add_argument('-f', '--values', required=True)
+    diff_parser = subparsers.add_parser(
+        'diff', help='Print the differences between the manifests of two '
+                     'values files')
+    diff_parser.add_argument('old')
+    diff_parser.add_argument('new')
+    diff_parser.add_argument('--summary', action='store_true',
+                             help='Only list the changed resources')
+    args = parser.parse_args()
+
+    try:
+        cache = RenderCache(args.chart, args.cache_dir,
+                            namespace=args.namespace)
+        if args.command == 'render':
+            docs = cache.render(load_values(args.values, args.solution,
+                                            args.worker_nodes))
+            sys.stdout.write(''.join('---\n' + doc for doc in docs))
+            result = 0
+        else:
+            old_docs = cache.render(load_values(args.old, args.solution,
+                                                args.worker_nodes))
+            new_docs = cache.render(load_values(args.new, args.solution,
+                                                args.worker_nodes))
+            summary, diff = diff_manifests(old_docs, new_docs,
+                                           args.old, args.new)
+            if not args.summary:
+                sys.stdout.write(diff)
+            for line in summary:
+                print(line, file=sys.stderr)
+            result = 1 if summary else 0
+    except RenderError as e:
+        print(f'ERROR: {e}', file=sys.stderr)
+        sys.exit(2)
+    print(f'{cache.rendered} rendered, {cache.cached} from cache',
+          file=sys.stderr)
+    sys.exit(result)
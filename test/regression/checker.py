@@ -62,24 +62,24 @@ class Checker:
             self.logger.log()
             return 0
 
-    def test_pass(self, msg):
-        self.logger.logpass('PASS  ' + msg)
+    def test_pass(self, msg, node=None):
+        self.logger.logpass('PASS  ' + msg, node=node)
         self.count += 1
 
-    def test_fail(self, msg):
-        self.logger.logfail('FAIL  ' + msg)
+    def test_fail(self, msg, node=None):
+        self.logger.logfail('FAIL  ' + msg, node=node)
         self.count += 1
         self.fails.append(msg)
 
-    def test(self, condition, msg):
+    def test(self, condition, msg, node=None):
         if condition:
-            self.test_pass(msg)
+            self.test_pass(msg, node=node)
         else:
-            self.test_fail(msg)
+            self.test_fail(msg, node=node)
 
-    def test_equal(self, expected, actual, msg):
+    def test_equal(self, expected, actual, msg, node=None):
         if expected == actual:
-            self.test_pass(msg)
+            self.test_pass(msg, node=node)
         else:
-            self.test_fail(msg + ('expected=%s, actual=%s'%(expected, actual)))
-
+            self.test_fail(msg + ('expected=%s, actual=%s'%(expected, actual)),
+                           node=node)
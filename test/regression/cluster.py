@@ -9,21 +9,46 @@
 
 
 import os
-import subprocess  # nosec
 import sys
-from yaml import safe_load
+from concurrent.futures import ThreadPoolExecutor
 
+import yaml
+
+import k8_cortx_cloud_path  # noqa: F401
+import solution_check
+import solutions
 import utils
-from utils import RemoteRun, Logger
+from k8s import KubectlError, Snapshot
+from lifecycle import run_lifecycle
+from preflight import run_preflight
+from rollout import wait_for_rollout
+from status import ClusterStatus
+from teardown import run_teardown
+from timing import ScriptSpans, Timer
+from upgrade import run_upgrade
+from utils import RemoteRun, Logger, SSHConnectionPool
 
 
 class ClusterError(Exception):
     pass
 
+
+# Lines of deploy-cortx-cloud.sh output that start a phase, and that
+# report a completed rollout.  Used to time the phases of a deploy.
+DEPLOY_PHASES = [
+    r'(?P<name>Install Rancher Local Path Provisioner)',
+    r'^# (?P<name>Deploy CORTX.*?)\s*$',
+    r'(?P<name>Now waiting for all CORTX resources)',
+]
+DEPLOY_COMPLETED = [
+    r'Rollout of (?P<name>\S+) finished after (?P<seconds>\d+) seconds',
+]
+
 class Cluster:
 
     def __init__(self, solution_files, solution_outfile=None,
-                  localfs=None, logger=None):
+                  localfs=None, logger=None, ssh_idle_timeout=60,
+                  timer=None, validate=True):
         """Represents a CORTX cluster.
 
            Arguments:
@@ -60,10 +85,23 @@ class Cluster:
                       needed by the prereq function.
 
                 logger: If specified, use this logger object for logging
+
+                ssh_idle_timeout: Number of seconds an unused SSH
+                      connection to a node is kept open for reuse.
+                      Connections are shared by all remote commands
+                      run by this cluster until close() is called.
+
+                timer: If specified, a timing.Timer that spans for the
+                      phases of cluster operations are recorded in.
+
+                validate: If true, check the solution with the rules of
+                      solution-validation.sh, and raise ClusterError
+                      if it is not valid.
         """
         if not logger:
             logger = Logger()
         self.logger = logger
+        self.timer = timer or Timer()
 
         if isinstance(solution_files, str):
             solution_files = [solution_files]
@@ -72,24 +110,50 @@ class Cluster:
             # If just a single solution file, then use it in
             # place.  Do not generate a new solution file.
             self.solution_file = solution_files[0]
+            solution, lines = solution_check.load(self.solution_file)
 
         else:
-            self.solution_file = self._generate_solution_yaml(solution_files, outfile=solution_outfile)
+            self.solution_file, solution = self._generate_solution_yaml(
+                                   solution_files, outfile=solution_outfile)
             logger.log(f"Generated solution file: {self.solution_file}")
             if not self.solution_file:
                 # There was an error.  Exit.
                 raise ClusterError('Failed to generate solution file')
+            # The merged data has no line numbers
+            lines = None
 
+        if validate:
+            self._validate(solution, lines)
 
         self.user = 'root'  # TODO: parameterize this
         self.localfs = localfs
+        self.ssh_pool = SSHConnectionPool(idle_timeout=ssh_idle_timeout)
+        self.status_checks = []
 
-        solution = safe_load(open(self.solution_file))
         self.solution = solution['solution']
 
+    def _validate(self, solution, lines=None):
+        violations = solution_check.SolutionChecker().check(solution, lines)
+        for violation in violations:
+            self.logger.log(violation.format(self.solution_file),
+                            color=Logger.WARNING if violation.warning
+                            else Logger.FAILING)
+        errors = solution_check.errors(violations)
+        if errors:
+            raise ClusterError(f'{self.solution_file} is not valid: '
+                               f'{len(errors)} errors')
+
+    def close(self):
+        """Release resources held by the cluster, e.g. SSH connections."""
+        self.ssh_pool.close()
 
     @staticmethod
     def _generate_solution_yaml(input_files, outfile=None, path='/tmp'):
+        """Merge input_files into a new solution file.
+
+           Returns a tuple of the generated filename and the merged
+           data, or (None, None) on error.
+        """
         if not outfile:
             outfile_parts = []
             for file_ in reversed(input_files):
@@ -100,15 +164,14 @@ class Cluster:
                     file_ = 'solution'
                 outfile_parts.append(file_)
             outfile = os.path.join(path, '.'.join(outfile_parts) + '.yaml')
-        outf = open(outfile, 'w')
-        args = ['yq', 'ea', '. as $item ireduce ({}; . * $item )'] + input_files
-        child = subprocess.Popen(args, stdout=outf, stderr=subprocess.PIPE)
-        child.wait()
-        if child.returncode != 0:
-            os.remove(outfile)
-            print(child.stderr.read().decode().strip(), file=sys.stderr)
-            return None
-        return outfile
+        try:
+            merged = solutions.merge_files(input_files, outfile)
+        except (OSError, yaml.YAMLError) as e:
+            if os.path.exists(outfile):
+                os.remove(outfile)
+            print(e, file=sys.stderr)
+            return None, None
+        return outfile, merged
 
 
     @staticmethod
@@ -116,82 +179,234 @@ class Cluster:
         return os.path.relpath(os.path.join(os.path.dirname(__file__),
                                             '../../k8_cortx_cloud'))
 
-    def run_prereq(self):
-        """Run prereq script on all nodes."""
+    def _prereq_node(self, node, prefix=None, parent=None):
+        """Run the prereq pipeline (copy, run, cleanup) on one node."""
+        with self.timer.span(f'Prereq {node}', parent=parent, node=node):
+            return self._prereq_node_steps(node, prefix)
+
+    def _prereq_node_steps(self, node, prefix):
+        remote = RemoteRun(node, self.user, prefix=prefix, pool=self.ssh_pool,
+                           logger=self.logger)
+        files = [
+                  self.solution_file,
+                  os.path.join(self._get_k8_cortx_cloud_dir(),
+                               'prereq-deploy-cortx-cloud.sh'),
+                  os.path.join(self._get_k8_cortx_cloud_dir(),
+                               'cortx_solution.py')
+                ]
+        result = 0
+        result += remote.scp(files, '/tmp/cortx-k8s')  # nosec B108
+        result += remote.run(f'cd /tmp/cortx-k8s; '
+                             f'./prereq-deploy-cortx-cloud.sh -d {self.localfs} '
+                             f'-s {os.path.basename(self.solution_file)}')
+        result += remote.run('rm -rf /tmp/cortx-k8s')
+        return result
+
+    def run_prereq(self, parallel=1):
+        """Run prereq script on all nodes.
+
+           Arguments:
+               parallel: Maximum number of nodes to run the prereq
+                      script on concurrently.  When greater than 1,
+                      the output of each node is prefixed with its
+                      hostname.
+
+           Returns a dict mapping each node to its result (0 on
+           success), or None if no localfs was specified.
+        """
         # First copy the prereq script and solution file to the
         # node.  Then run the script.
         if not self.localfs:
             print("Cannot run prereq-deploy-cortx-cloud.sh. "
                   "No localfs specified.")
-            return
-
-        blkdev = self.localfs
-        result = 0
+            return None
 
         print("\nRunning prereq-deploy-cortx-cloud.sh\n")
 
         nodes = []
         for storage_set in self.solution['storage_sets']:
             nodes += storage_set['nodes']
+        # A node may appear in more than one storage set, but the
+        # prereq script must only run on it once.
+        nodes = list(dict.fromkeys(nodes))
+
+        results = {}
+        if parallel <= 1:
+            for node in nodes:
+                print(f"------------- prereq {node} --------------\n")
+                results[node] = self._prereq_node(node)
+                print("\n\n")
+            return results
+
+        parent = self.timer.current()
+        with ThreadPoolExecutor(max_workers=parallel) as executor:
+            futures = {node: executor.submit(self._prereq_node, node,
+                                             prefix=f'[{node}]',
+                                             parent=parent)
+                       for node in nodes}
         for node in nodes:
-            files = [
-                      self.solution_file,
-                      os.path.join(self._get_k8_cortx_cloud_dir(),
-                                   'prereq-deploy-cortx-cloud.sh')
-                    ]
-            print(f"------------- prereq {node} --------------\n")
-            result += RemoteRun(node, self.user).scp(
-                                files, '/tmp/cortx-k8s')  # nosec B108
-            result += RemoteRun(node, self.user).run(
-                                f'cd /tmp/cortx-k8s; '
-                                f'./prereq-deploy-cortx-cloud.sh -d {blkdev} '
-                                f'-s {os.path.basename(self.solution_file)}')
-            result += RemoteRun(node, self.user).run('rm -rf /tmp/cortx-k8s')
-            print("\n\n")
+            results[node] = futures[node].result()
 
+        return results
+
+    def preflight(self):
+        """Check the nodes of the cluster against the solution."""
+        result = run_preflight(self.solution, logger=self.logger)
+        if result != 0:
+            print("\nPreflight FAILED!\n")
         return result
 
-    def deploy(self):
+    def deploy(self, monitor=True):
+        """Run deploy-cortx-cloud.sh and wait for CORTX to be ready.
+
+           Arguments:
+               monitor: If true, wait for the CORTX workloads with a
+                      rollout.RolloutMonitor instead of in the script.
+        """
         cmd = ['./deploy-cortx-cloud.sh', os.path.abspath(self.solution_file)]
-        result = utils.run(cmd, cwd=self._get_k8_cortx_cloud_dir())
+        env = dict(os.environ, CORTX_DEPLOY_NO_WAIT='true') \
+            if monitor else None
+        phases = ScriptSpans(self.timer, DEPLOY_PHASES, DEPLOY_COMPLETED)
+        result = utils.run(cmd, cwd=self._get_k8_cortx_cloud_dir(),
+                           on_line=phases, env=env, logger=self.logger)
+        phases.finish()
+        if result == 0 and monitor:
+            with self.timer.span('Wait for CORTX resources'):
+                result = wait_for_rollout(self.solution['namespace'],
+                                          logger=self.logger,
+                                          timer=self.timer)
         if result != 0:
             print("\nDeploy FAILED!\n")
         return result
 
-    def destroy(self):
+    def destroy(self, force=False):
+        """Uninstall CORTX and delete its secret and PVCs.
+
+           Arguments:
+               force: If true, remove the finalizers of the PVCs
+                      before deleting them.
+        """
+        result = run_teardown(self.solution, logger=self.logger,
+                              force=force, timer=self.timer)
+        if result != 0:
+            print("\nDestroy FAILED!\n")
+        return result
+
+    def destroy_script(self):
+        """Run destroy-cortx-cloud.sh."""
         cmd = ['./destroy-cortx-cloud.sh', os.path.abspath(self.solution_file)]
-        result = utils.run(cmd, cwd=self._get_k8_cortx_cloud_dir())
+        result = utils.run(cmd, cwd=self._get_k8_cortx_cloud_dir(),
+                           logger=self.logger)
         if result != 0:
             print("\nDestroy FAILED!\n")
         return result
 
-    def shutdown(self):
+    def shutdown(self, timeouts=None):
+        """Shut down all CORTX pods, one tier at a time.
+
+           Arguments:
+               timeouts: Optional dict of component name (e.g. "data")
+                      to the number of seconds to wait for that tier.
+        """
+        result = run_lifecycle(self.solution, 'shutdown',
+                               logger=self.logger, timeouts=timeouts,
+                               timer=self.timer)
+        if result != 0:
+            print("\nShutdown FAILED!\n")
+        return result
+
+    def start(self, timeouts=None):
+        """Start all CORTX pods, one tier at a time.
+
+           Arguments:
+               timeouts: Optional dict of component name (e.g. "data")
+                      to the number of seconds to wait for that tier.
+        """
+        result = run_lifecycle(self.solution, 'start',
+                               logger=self.logger, timeouts=timeouts,
+                               timer=self.timer)
+        if result != 0:
+            print("\nStart FAILED!\n")
+        return result
+
+    def upgrade(self, image, max_unavailable=1, timeout=None):
+        """Upgrade the CORTX images without shutting down the cluster.
+
+           Arguments:
+               image: Any one of the CORTX images to upgrade to.
+               max_unavailable: Number or percentage of data pods to
+                      upgrade at a time.
+               timeout: Optional number of seconds to wait for each
+                      wave of data pods and each other component.
+        """
+        kwargs = {'timeout': timeout} if timeout else {}
+        result = run_upgrade(self.solution, image, max_unavailable,
+                             logger=self.logger, timer=self.timer, **kwargs)
+        if result != 0:
+            print("\nUpgrade FAILED!\n")
+        return result
+
+    def shutdown_script(self):
+        """Run shutdown-cortx-cloud.sh."""
         cmd = ['./shutdown-cortx-cloud.sh',
                os.path.abspath(self.solution_file)]
-        result = utils.run(cmd, cwd=self._get_k8_cortx_cloud_dir())
+        result = utils.run(cmd, cwd=self._get_k8_cortx_cloud_dir(),
+                           logger=self.logger)
         if result != 0:
             print("\nShutdown FAILED!\n")
         return result
 
-    def start(self):
+    def start_script(self):
+        """Run start-cortx-cloud.sh."""
         cmd = ['./start-cortx-cloud.sh', os.path.abspath(self.solution_file)]
-        result = utils.run(cmd, cwd=self._get_k8_cortx_cloud_dir())
+        result = utils.run(cmd, cwd=self._get_k8_cortx_cloud_dir(),
+                           logger=self.logger)
         if result != 0:
             print("\nStart FAILED!\n")
         return result
 
-    def status(self):
+    def status(self, snapshot=None):
+        """Check the status of the CORTX cluster.
+
+           Arguments:
+               snapshot: If specified, a k8s.Snapshot, or the name of
+                      a file recorded with Snapshot.save(), to check
+                      instead of querying the cluster.
+
+           The StatusCheck results are saved in self.status_checks.
+        """
+        try:
+            if snapshot is None:
+                snapshot = Snapshot.from_cluster(self.solution['namespace'])
+            elif isinstance(snapshot, str):
+                snapshot = Snapshot.from_file(snapshot)
+        except KubectlError as e:
+            print(f"\nStatus FAILED!  {e}\n")
+            return 1
+
+        status = ClusterStatus(self.solution, snapshot)
+        self.status_checks = status.run()
+        status.report(self.logger)
+
+        if status.failcount:
+            print(f"\nStatus FAILED!  {status.failcount} failed checks.\n")
+            return 1
+        return 0
+
+    def status_script(self):
+        """Run status-cortx-cloud.sh and scan its output for failures."""
         cmd = ['./status-cortx-cloud.sh', os.path.abspath(self.solution_file)]
-        result, stdout = utils.run(cmd, cwd=self._get_k8_cortx_cloud_dir(),
-                                   return_stdout=True)
-        # Scan stdout for anything but PASS
-        numfails = False
-        for line in stdout.splitlines():
-            if 'STATUS' not in line:
-                continue
-            if 'PASSED' not in line:
+        # Scan output for anything but PASS as it is produced
+        numfails = 0
+
+        def scan(line):
+            nonlocal numfails
+            if 'STATUS' in line and 'PASSED' not in line:
                 numfails += 1
 
+        result = utils.run(cmd, cwd=self._get_k8_cortx_cloud_dir(),
+                           on_line=scan, logger=self.logger)
+
         if result != 0 or numfails != 0:
             print(f"\nStatus FAILED!  {numfails} failed checks.\n")
 
@@ -9,14 +9,17 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('-s', '--solution', action='append', required=True)
     parser.add_argument('--local-fs')
+    parser.add_argument('--parallel', type=int, default=1,
+                        help='Number of nodes to run prereq on concurrently')
     args = parser.parse_args()
 
     print(f"args = {args}")
 
     cluster = Cluster(args.solution, localfs=args.local_fs)
     if args.local_fs:
-        result = cluster.run_prereq()
-        if result != 0:
+        results = cluster.run_prereq(parallel=args.parallel)
+        cluster.close()
+        if any(results.values()):
             sys.exit(1)
 
     result = cluster.deploy()
@@ -8,8 +8,16 @@ from cluster import Cluster
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('-s', '--solution', action='append')
+    parser.add_argument('-f', '--force', action='store_true',
+                        help='Remove the finalizers of the PVCs')
+    parser.add_argument('--script', action='store_true',
+                        help='Run destroy-cortx-cloud.sh')
     args = parser.parse_args()
 
-    cluster = Cluster(args.solution)
-    result = cluster.destroy()
+    # Do not let an invalid solution file stand in the way of cleanup
+    cluster = Cluster(args.solution, validate=False)
+    if args.script:
+        result = cluster.destroy_script()
+    else:
+        result = cluster.destroy(force=args.force)
     sys.exit(result)
@@ -0,0 +1,22 @@
+##################################################
+# k8_cortx_cloud_path.py
+#
+# Makes the Python modules of k8_cortx_cloud (k8s.py,
+# rollout.py, cortx_solution.py, ...), which the deploy
+# scripts use too, importable from the regression tests.
+#
+# Import it before any of them:
+#
+#   import k8_cortx_cloud_path  # noqa: F401
+#
+##################################################
+
+import os
+import sys
+
+
+K8_CORTX_CLOUD_DIR = os.path.normpath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '../../k8_cortx_cloud'))
+
+if K8_CORTX_CLOUD_DIR not in sys.path:
+    sys.path.append(K8_CORTX_CLOUD_DIR)
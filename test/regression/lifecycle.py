@@ -0,0 +1,198 @@
+##################################################
+# lifecycle.py
+#
+# Shutdown and start of a CORTX cluster.
+#
+# This performs the same steps as shutdown-cortx-cloud.sh
+# and start-cortx-cloud.sh: each tier of CORTX pods is
+# scaled down (or up) in turn, and the next tier is only
+# processed once all pods of the previous one are gone
+# (or ready).
+#
+# Rather than polling "kubectl get pods" once a second,
+# a single k8s.Watch on the namespace's pods is shared by
+# all tiers, and each tier waits on it with its own timeout.
+#
+##################################################
+
+import json
+import subprocess  # nosec
+import time
+
+import k8_cortx_cloud_path  # noqa: F401
+from k8s import KubectlError, pod_failed, pod_ready, Snapshot, Watch
+from k8s import match_labels, parse_selector
+from rollout import component_selector
+from timing import Timer
+from utils import Logger
+
+
+# Default number of seconds to wait for a tier to shut down or start
+DEFAULT_TIMEOUT = 600
+
+
+class LifecycleError(Exception):
+    pass
+
+
+class Tier:
+    def __init__(self, component, kind):
+        """A CORTX component that is shut down/started as a unit."""
+        self.component = component
+        self.kind = kind
+        self.selector = component_selector(component)
+
+    @property
+    def title(self):
+        return f'CORTX {self.component.capitalize()}'
+
+
+# Tiers in shutdown order.  They are started in the reverse order.
+TIERS = [
+    Tier('client', 'statefulset'),
+    Tier('ha', 'deployment'),
+    Tier('server', 'statefulset'),
+    Tier('data', 'statefulset'),
+    Tier('control', 'deployment'),
+]
+
+
+def helm_values(namespace):
+    cmd = ['helm', 'get', 'values', 'cortx', '--all',
+           '--namespace', namespace, '--output', 'json']
+    child = subprocess.run(cmd, stdout=subprocess.PIPE,  # nosec B603
+                           check=False)
+    if child.returncode != 0:
+        raise LifecycleError('Failed to get helm values for cortx')
+    return json.loads(child.stdout)
+
+
+class ClusterLifecycle:
+    def __init__(self, solution, logger=None, timeouts=None, timer=None):
+        """Shuts down and starts the CORTX pods of a cluster.
+
+           Arguments:
+               solution: The "solution" dict of a solution.yaml file.
+               logger: If specified, use this logger object for logging
+               timeouts: Optional dict of component name (e.g. "data")
+                      to the number of seconds to wait for that tier.
+                      Tiers not listed wait DEFAULT_TIMEOUT seconds.
+               timer: If specified, a timing.Timer that a span for
+                      each tier is recorded in.
+        """
+        if not logger:
+            logger = Logger()
+        self.logger = logger
+        self.timer = timer or Timer()
+        self.solution = solution
+        self.namespace = solution['namespace']
+        self.timeouts = timeouts or {}
+        self.num_nodes = len(solution['storage_sets'][0]['nodes'])
+        self.data_only = solution['deployment_type'] == 'data-only'
+
+    def _scale(self, tier, replicas):
+        # All workloads of a tier are scaled with a single request
+        cmd = ['kubectl', 'scale', tier.kind, '--selector', tier.selector,
+               '--replicas', str(replicas), '--namespace', self.namespace]
+        if subprocess.run(cmd, check=False).returncode != 0:  # nosec B603
+            raise LifecycleError(f'Failed to scale {tier.title}')
+
+    def _wait(self, watch, tier, predicate, action):
+        timeout = self.timeouts.get(tier.component, DEFAULT_TIMEOUT)
+        terms = parse_selector(tier.selector)
+        state = {'last': None}
+
+        def tier_done(pods):
+            pods = [p for p in pods
+                    if match_labels(p['metadata'].get('labels') or {}, terms)]
+            done, progress = predicate(pods)
+            if progress != state['last']:
+                state['last'] = progress
+                self.logger.log(f'{tier.title}: {progress}')
+            return done
+
+        start = time.monotonic()
+        if not watch.wait_for(tier_done, timeout):
+            raise LifecycleError(f'Timed out after {timeout}s waiting for '
+                                 f'{tier.title} to {action}')
+        self.logger.log(f'{tier.title} {action} completed in '
+                        f'{time.monotonic() - start:.1f}s')
+
+    def _workloads(self):
+        snapshot = Snapshot.from_cluster(self.namespace,
+                                         kinds='deployments,statefulsets')
+        workloads = {}
+        for tier in TIERS:
+            kind = 'Deployment' if tier.kind == 'deployment' else 'StatefulSet'
+            workloads[tier.component] = [
+                obj['metadata']['name']
+                for obj in snapshot.get(kind, tier.selector,
+                                        namespace=self.namespace)]
+        return workloads
+
+    def shutdown(self):
+        """Scale all CORTX tiers down to 0, one tier at a time."""
+        workloads = self._workloads()
+        with Watch('pods', self.namespace) as watch:
+            for tier in TIERS:
+                self.logger.logheader(f'Shutdown {tier.title}')
+                with self.timer.span(f'Shutdown {tier.title}'):
+                    if workloads[tier.component]:
+                        self._scale(tier, 0)
+                    self._wait(watch, tier,
+                               lambda pods: (not pods,
+                                             f'{len(pods)} pods left'),
+                               'shutdown')
+
+    def _replicas(self):
+        """Return the per-workload replica count for each tier."""
+        replicas = {
+            'data': self.num_nodes,
+            'client': self.num_nodes,
+        }
+        if not self.data_only:
+            s3 = self.solution['common']['s3']
+            values = helm_values(self.namespace)
+            replicas['server'] = self.num_nodes * s3['instances_per_node']
+            replicas['ha'] = 1
+            replicas['control'] = values['control']['replicaCount']
+        return replicas
+
+    def start(self):
+        """Scale all CORTX tiers up, one tier at a time."""
+        workloads = self._workloads()
+        replicas = self._replicas()
+        with Watch('pods', self.namespace) as watch:
+            for tier in reversed(TIERS):
+                names = workloads[tier.component]
+                if not names or tier.component not in replicas:
+                    continue
+                self.logger.logheader(f'Start {tier.title}')
+                with self.timer.span(f'Start {tier.title}'):
+                    self._start_tier(watch, tier,
+                                     replicas[tier.component] * len(names),
+                                     replicas[tier.component])
+
+    def _start_tier(self, watch, tier, expected, replicas):
+        self._scale(tier, replicas)
+
+        def started(pods):
+            failed = [p['metadata']['name'] for p in pods if pod_failed(p)]
+            if failed:
+                raise LifecycleError(f"'{failed[0]}' pod failed to start")
+            ready = sum(1 for p in pods if pod_ready(p))
+            return ready == expected, f'{ready}/{expected} pods ready'
+
+        self._wait(watch, tier, started, 'start')
+
+
+def run_lifecycle(solution, action, logger=None, timeouts=None, timer=None):
+    """Run "shutdown" or "start".  Returns 0 on success, 1 on failure."""
+    lifecycle = ClusterLifecycle(solution, logger=logger, timeouts=timeouts,
+                                 timer=timer)
+    try:
+        getattr(lifecycle, action)()
+    except (LifecycleError, KubectlError) as e:
+        lifecycle.logger.logfail(f'{action.capitalize()} failed: {e}')
+        return 1
+    return 0
@@ -1,12 +1,117 @@
 #!/usr/bin/env python3
 
+##################################################
+# make_solution.py
+#
+# Generates a solution file from a base solution file and
+# overlays, like the test scripts do.
+#
+# With --matrix, generates a variant for every combination
+# of the axes in a matrix file, e.g.:
+#
+#   axes:
+#     images:
+#       - cortxdata: ghcr.io/seagate/cortx-data:2.0.0-950
+#       - cortxdata: ghcr.io/seagate/cortx-data:2.0.0-960
+#     durability:
+#       - {sns: 1+0+0, dix: 1+0+0}
+#       - {sns: 4+2+0, dix: 1+2+0}
+#     nodes:
+#       - [node-1, node-2, node-3]
+#     setup_size: [small, large]
+#     deployment_type: [standard, data-only]
+#     solution.common.s3.instances_per_node: [1, 2]
+#
+# An axis is one of the names above, or a path.  A map
+# value is merged into the existing map, and any other value
+# replaces it.  Variants are written to --output-dir named
+# by a hash of their content, so identical variants are
+# written once.  index.jsonl lists the axis values, file and
+# validation errors of each variant.
+#
+##################################################
+
 import argparse
+import hashlib
+import json
+import os
+import sys
+
+import yaml
+
+import solution_check
+import solutions
+from cluster import Cluster, ClusterError
+
+
+class _Dumper(getattr(yaml, 'CSafeDumper', yaml.SafeDumper)):
+    # Variants share subtrees; never write them as YAML aliases
+    def ignore_aliases(self, data):
+        return True
+
+
+def write_matrix(solution_files, matrix_file, output_dir, validate=True):
+    """Write the variants of a matrix.  Returns (variants, files, invalid)."""
+    docs = []
+    for filename in solution_files:
+        with open(filename) as f:
+            docs.append(yaml.safe_load(f))
+    base = solutions.merge_all(docs)
+    with open(matrix_file) as f:
+        axes = yaml.safe_load(f)['axes']
+
+    checker = solution_check.SolutionChecker() if validate else None
+    os.makedirs(output_dir, exist_ok=True)
+    written = set()
+    count = invalid = 0
+    with open(os.path.join(output_dir, 'index.jsonl'), 'w') as index:
+        for choices, data in solutions.variants(base, axes):
+            count += 1
+            entry = {'axes': choices}
+            errors = solution_check.errors(checker.check(data)) \
+                if checker else []
+            if errors:
+                invalid += 1
+                entry['errors'] = [str(e) for e in errors]
+            else:
+                # Content-address by canonical JSON, which is much
+                # cheaper than YAML, and only dump new variants
+                key = hashlib.sha256(json.dumps(
+                    data, sort_keys=True).encode()).hexdigest()[:16]
+                entry['file'] = f'{key}.yaml'
+                if key not in written:
+                    path = os.path.join(output_dir, entry['file'])
+                    if not os.path.exists(path):
+                        with open(path, 'w') as f:
+                            yaml.dump(data, f, Dumper=_Dumper,
+                                      default_flow_style=False,
+                                      sort_keys=False)
+                    written.add(key)
+            index.write(json.dumps(entry) + '\n')
+    return count, len(written), invalid
 
-from cluster import Cluster
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument('-s', '--solution', action='append', required=True)
+    parser.add_argument('--no-validate', action='store_true',
+                        help='Do not check the generated solution file')
+    parser.add_argument('--matrix',
+                        help='File of axes to generate all variants of')
+    parser.add_argument('-o', '--output-dir', default='solutions',
+                        help='Directory to write --matrix variants to')
     args = parser.parse_args()
 
-    Cluster(args.solution)
+    if args.matrix:
+        count, files, invalid = write_matrix(
+            args.solution, args.matrix, args.output_dir,
+            validate=not args.no_validate)
+        print(f'{count} variants: {files} distinct files, {invalid} invalid. '
+              f'See {os.path.join(args.output_dir, "index.jsonl")}')
+        sys.exit(0)
+
+    try:
+        Cluster(args.solution, validate=not args.no_validate)
+    except ClusterError as e:
+        print(e)
+        sys.exit(1)
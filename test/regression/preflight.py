@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+##################################################
+# preflight.py
+#
+# Checks the nodes of a cluster before a deployment.
+#
+# deploy-cortx-cloud.sh (and status-cortx-cloud.sh and
+# destroy-cortx-cloud.sh) run "kubectl get nodes | grep"
+# and "kubectl describe nodes <node> | grep Taints" for
+# every node.  This fetches the node list once as JSON,
+# indexes it by name, and checks every node of the
+# solution's storage set in a single pass for:
+#
+#   * nodes that are not in the cluster
+#   * nodes that are not Ready
+#   * NoSchedule taints
+#   * allocatable CPU and memory less than the requests
+#     of the CORTX pods placed on every node, from the
+#     solution's resource_allocation section (with the
+#     model of k8_cortx_cloud/cortx_resources.py, which is
+#     shared with plan-cortx-cloud.py)
+#
+# Schedulable nodes that are not in the solution are
+# reported as warnings.
+#
+##################################################
+
+import argparse
+import sys
+
+from yaml import safe_load
+
+import k8_cortx_cloud_path  # noqa: F401
+from cortx_resources import parse_cpu, parse_memory, ResourceModel
+from k8s import KubectlError, kubectl_json, node_schedulable
+from utils import Logger
+
+
+def node_ready(node):
+    """Return True if a node's Ready condition is True."""
+    for condition in node.get('status', {}).get('conditions', []):
+        if condition.get('type') == 'Ready':
+            return condition.get('status') == 'True'
+    return False
+
+
+def node_requests(solution):
+    """Return the (cpu, memory) requests of the CORTX pods on each node.
+
+       Returns a pair of (cpu, memory) tuples: the requests of the pods
+       placed on every node of the storage set, and of the pods placed
+       on some of them only, assuming at most one of each per node.
+    """
+    model = ResourceModel(solution)
+    storage_set = solution['storage_sets'][0]
+    cvgs = len(storage_set.get('storage') or [])
+    groups = model.groups(cvgs, storage_set.get('container_group_size'))
+    local = model.local(groups, cvgs)
+    shared = model.spread(1, 1)
+    return (local.cpu, local.memory), (shared.cpu, shared.memory)
+
+
+class Finding:
+    def __init__(self, node, message, warning=False):
+        """A problem found with a node."""
+        self.node = node
+        self.message = message
+        self.warning = warning
+
+    def __str__(self):
+        level = 'WARNING' if self.warning else 'ERROR'
+        return f'{level}: {self.node}: {self.message}'
+
+
+class Preflight:
+    def __init__(self, solution, nodes):
+        """Checks the nodes of a cluster against a solution.
+
+           Arguments:
+               solution: The "solution" dict of a solution.yaml file.
+               nodes: A decoded "kubectl get nodes -o json" result.
+        """
+        self.solution = solution
+        self.nodes = {node['metadata']['name']: node
+                      for node in nodes.get('items', [])}
+
+    @classmethod
+    def from_cluster(cls, solution):
+        """Fetch the node list with a single kubectl call."""
+        return cls(solution, kubectl_json(['get', 'nodes']))
+
+    @property
+    def worker_nodes(self):
+        """Names of the nodes without NoSchedule taints."""
+        return [name for name, node in self.nodes.items()
+                if node_schedulable(node)]
+
+    @property
+    def not_ready_nodes(self):
+        return [name for name, node in self.nodes.items()
+                if not node_ready(node)]
+
+    def run(self):
+        """Return the list of Findings."""
+        findings = []
+        names = self.solution['storage_sets'][0].get('nodes') or []
+        (cpu, memory), (shared_cpu, shared_memory) = \
+            node_requests(self.solution)
+        for name in names:
+            node = self.nodes.get(name)
+            if node is None:
+                findings.append(Finding(name, 'not found in the cluster'))
+                continue
+            if not node_ready(node):
+                findings.append(Finding(name, 'is not Ready'))
+            if not node_schedulable(node):
+                findings.append(Finding(name, 'has a NoSchedule taint'))
+            allocatable = node.get('status', {}).get('allocatable', {})
+            for needed, shared, value, parse, fmt in (
+                    (cpu, shared_cpu, allocatable.get('cpu'), parse_cpu,
+                     lambda v: f'{v:.2f} CPUs'),
+                    (memory, shared_memory, allocatable.get('memory'),
+                     parse_memory, lambda v: f'{v / 2**30:.2f}Gi memory')):
+                if value is None:
+                    continue
+                available = parse(value)
+                if needed > available:
+                    findings.append(Finding(
+                        name, f'{fmt(needed)} requested by the CORTX pods on '
+                              f'every node, but only {fmt(available)} '
+                              f'allocatable'))
+                elif needed + shared > available:
+                    findings.append(Finding(
+                        name, f'{fmt(needed + shared)} requested if the '
+                              f'shared CORTX pods are placed on it, but only '
+                              f'{fmt(available)} allocatable', warning=True))
+        for name in self.worker_nodes:
+            if name not in names:
+                findings.append(Finding(name, 'schedulable node is not in '
+                                              'the solution', warning=True))
+        return findings
+
+    def report(self, findings, logger=None):
+        """Log the findings.  Returns the number of errors."""
+        if not logger:
+            logger = Logger()
+        workers = len(self.worker_nodes)
+        logger.log(f'Number of worker nodes detected: {workers}')
+        for finding in findings:
+            if finding.warning:
+                logger.logwarning(str(finding))
+            else:
+                logger.logfail(str(finding))
+        errors = sum(1 for f in findings if not f.warning)
+        if not errors:
+            logger.logpass('Node preflight checks passed')
+        return errors
+
+
+def run_preflight(solution, logger=None):
+    """Check the nodes of a cluster.  Returns 0 on success, 1 on failure."""
+    try:
+        preflight = Preflight.from_cluster(solution)
+    except KubectlError as e:
+        (logger or Logger()).logfail(f'Failed to get the nodes: {e}')
+        return 1
+    return 1 if preflight.report(preflight.run(), logger) else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Check the nodes of a cluster before deploying CORTX')
+    parser.add_argument('-s', '--solution', required=True)
+    args = parser.parse_args()
+
+    solution = safe_load(open(args.solution))['solution']
+    sys.exit(run_preflight(solution))
@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+
+##################################################
+# solution_check.py
+#
+# In-process validation of solution.yaml files, with the
+# same rules as solution_validation_scripts/solution-validation.sh:
+#
+#   * every path that solution-check.yaml marks "required"
+#     must be present
+#   * the namespace is at most 20 characters
+#   * the SNS total is at most the number of CVGs in the
+#     cluster, and the DIX total at most the number of nodes
+#
+# solution-check.yaml is compiled once into an index of
+# required paths, and a solution is checked against it in
+# a single traversal.  Unlike the yq merge in the shell
+# script, which only checks the first item of each list,
+# every list item is checked.  All violations are reported
+# at once, with line numbers when the solution was loaded
+# with load().
+#
+##################################################
+
+import argparse
+import os
+import sys
+
+import yaml
+
+
+DEFAULT_CHECK_FILE = os.path.normpath(os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '../../k8_cortx_cloud',
+    'solution_validation_scripts/solution-check.yaml'))
+
+MAX_NAMESPACE_LENGTH = 20
+
+REQUIRED = 'required'
+_LIST = '[]'
+
+_Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+
+class Violation:
+    def __init__(self, path, message, line=None, warning=False):
+        """A problem found in a solution.
+
+           path is a tuple of map keys and list indexes.
+        """
+        self.path = path
+        self.message = message
+        self.line = line
+        self.warning = warning
+
+    def path_str(self):
+        out = ''
+        for part in self.path:
+            if isinstance(part, int):
+                out += f'[{part}]'
+            else:
+                out += f'.{part}' if out else part
+        return out
+
+    def format(self, filename=None):
+        where = filename or ''
+        if self.line:
+            where += f':{self.line}'
+        level = 'WARNING' if self.warning else 'ERROR'
+        prefix = f'{where}: ' if where else ''
+        return f'{prefix}{level}: {self.path_str()}: {self.message}'
+
+    def __str__(self):
+        return self.format()
+
+
+def _index_lines(node, path, lines):
+    if isinstance(node, yaml.MappingNode):
+        for key_node, value_node in node.value:
+            child = path + (key_node.value,)
+            lines[child] = key_node.start_mark.line + 1
+            _index_lines(value_node, child, lines)
+    elif isinstance(node, yaml.SequenceNode):
+        for i, item in enumerate(node.value):
+            child = path + (i,)
+            lines[child] = item.start_mark.line + 1
+            _index_lines(item, child, lines)
+
+
+def load(filename):
+    """Load a YAML file.  Returns (data, lines).
+
+       lines maps the path of each map key and list item to its line
+       number.
+    """
+    with open(filename) as f:
+        loader = _Loader(f)
+        try:
+            node = loader.get_single_node()
+            data = loader.construct_document(node) if node else None
+        finally:
+            loader.dispose()
+    lines = {}
+    if node:
+        _index_lines(node, (), lines)
+    return data, lines
+
+
+def _compile(check):
+    """Compile solution-check.yaml data into a trie of required paths.
+
+       A map becomes a dict of key to its compiled value, a list
+       becomes {_LIST: compiled first item}, and "required" stays.
+    """
+    if isinstance(check, dict):
+        return {key: _compile(value) for key, value in check.items()}
+    if isinstance(check, list):
+        return {_LIST: _compile(check[0]) if check else REQUIRED}
+    return REQUIRED
+
+
+def _durability_total(value):
+    return sum(int(v) for v in str(value).split('+'))
+
+
+class SolutionChecker:
+    _compiled = {}
+
+    def __init__(self, check_file=DEFAULT_CHECK_FILE):
+        """Validates solutions against a solution-check.yaml file.
+
+           The compiled rules are cached, so creating a checker for
+           the same file again is free.
+        """
+        if check_file not in self._compiled:
+            with open(check_file) as f:
+                self._compiled[check_file] = _compile(yaml.load(f, _Loader))
+        self.rules = self._compiled[check_file]
+
+    def check(self, data, lines=None):
+        """Return the list of Violations in a solution.
+
+           Arguments:
+               data: Solution data, as loaded from YAML
+               lines: Optional path -> line number dict, from load()
+        """
+        lines = lines or {}
+        violations = []
+
+        def line_of(path):
+            # The line of the path, or of its closest ancestor
+            while path and path not in lines:
+                path = path[:-1]
+            return lines.get(path)
+
+        def add(path, message, warning=False):
+            violations.append(Violation(path, message, line_of(path),
+                                        warning))
+
+        def walk(rules, value, path):
+            if rules == REQUIRED:
+                return
+            if _LIST in rules:
+                if not isinstance(value, list) or not value:
+                    add(path, 'a non-empty list is required')
+                    return
+                for i, item in enumerate(value):
+                    walk(rules[_LIST], item, path + (i,))
+                return
+            if not isinstance(value, dict):
+                add(path, 'a map is required')
+                return
+            for key, sub in rules.items():
+                if key not in value:
+                    add(path + (key,), 'required key is missing')
+                else:
+                    walk(sub, value[key], path + (key,))
+
+        walk(self.rules, data, ())
+        solution = data.get('solution') if isinstance(data, dict) else None
+        if not isinstance(solution, dict):
+            return violations
+        root = ('solution',)
+
+        common = solution.get('common')
+        if isinstance(common, dict) and 'container_path' in common:
+            add(root + ('common', 'container_path'),
+                "section has been removed in v0.9.0.  Custom container "
+                "paths are not supported.", warning=True)
+
+        namespace = solution.get('namespace')
+        if isinstance(namespace, str) and \
+                len(namespace) > MAX_NAMESPACE_LENGTH:
+            add(root + ('namespace',),
+                f'namespace has {len(namespace)} characters, the maximum '
+                f'is {MAX_NAMESPACE_LENGTH}')
+
+        storage_sets = solution.get('storage_sets')
+        if not isinstance(storage_sets, list) or not storage_sets or \
+                not isinstance(storage_sets[0], dict):
+            return violations
+        if len(storage_sets) > 1:
+            add(root + ('storage_sets',),
+                'only 1 storage set is currently supported.  Only the '
+                'first one will be used.', warning=True)
+
+        path = root + ('storage_sets', 0)
+        storage_set = storage_sets[0]
+        storage = storage_set.get('storage')
+        nodes = storage_set.get('nodes')
+        num_cvgs = len(storage) if isinstance(storage, list) else 0
+        num_nodes = len(nodes) if isinstance(nodes, list) else 0
+        durability = storage_set.get('durability')
+        if not isinstance(durability, dict):
+            return violations
+        for name, limit, what in (
+                ('sns', num_cvgs * num_nodes, 'CVGs in the cluster'),
+                ('dix', num_nodes, 'worker nodes in the cluster')):
+            if durability.get(name) is None:
+                continue
+            try:
+                total = _durability_total(durability[name])
+            except ValueError:
+                add(path + ('durability', name),
+                    f'{durability[name]!r} is not of the form N+K+S')
+                continue
+            if total > limit:
+                add(path + ('durability', name),
+                    f'the sum of {name.upper()} ({total}) is greater than '
+                    f'the total number of {what} ({limit})')
+        return violations
+
+
+def errors(violations):
+    return [v for v in violations if not v.warning]
+
+
+def check_file(filename, checker=None):
+    """Load and check a solution file.  Returns the list of Violations."""
+    data, lines = load(filename)
+    return (checker or SolutionChecker()).check(data, lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Validate solution.yaml files')
+    parser.add_argument('solution', nargs='+', help='solution.yaml file')
+    parser.add_argument('--check-file', default=DEFAULT_CHECK_FILE,
+                        help='solution-check.yaml file with the required '
+                             'paths')
+    args = parser.parse_args()
+
+    checker = SolutionChecker(args.check_file)
+    failed = False
+    for filename in args.solution:
+        violations = check_file(filename, checker)
+        for violation in violations:
+            print(violation.format(filename))
+        failed = failed or bool(errors(violations))
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,196 @@
+##################################################
+# solutions.py
+#
+# Helpers for working with solution.yaml files.
+#
+# merge_files() combines a base solution file with
+# overlays the same way as:
+#
+#   yq ea '. as $item ireduce ({}; . * $item )' files...
+#
+# i.e. maps are merged recursively, and any other value
+# (including lists and nulls) in a later file replaces the
+# value from earlier files.
+#
+# Merged results are cached on disk, keyed by a hash of the
+# input file contents, so generating the same solution
+# variant again is just a file copy.
+#
+# variants() generates the cross product of a base solution
+# with axes of values at given paths.  Each variant only
+# copies the maps along the changed paths; everything else
+# is shared with the base.
+#
+# merge() and the solution value lookups (SolutionIndex)
+# are in k8_cortx_cloud/cortx_solution.py, which the
+# deploy scripts use too.
+#
+##################################################
+
+import hashlib
+import itertools
+import json
+import os
+import shutil
+
+import yaml
+
+import k8_cortx_cloud_path  # noqa: F401
+from cortx_solution import merge
+
+
+DEFAULT_CACHE_DIR = '/tmp/cortx-k8s-solution-cache'  # nosec B108
+
+
+def merge_all(docs):
+    merged = {}
+    for doc in docs:
+        merged = merge(merged, {} if doc is None else doc)
+    return merged
+
+
+def dump(data, stream=None):
+    return yaml.safe_dump(data, stream, default_flow_style=False,
+                          sort_keys=False)
+
+
+def content_hash(input_files):
+    """Return a hash of the contents of the input files, in order."""
+    h = hashlib.sha256()
+    for filename in input_files:
+        with open(filename, 'rb') as f:
+            data = f.read()
+        h.update(str(len(data)).encode() + b'\0')
+        h.update(data)
+    return h.hexdigest()
+
+
+def _string_keys(data):
+    """Return True if every map key in data is a string.
+
+       JSON turns other keys (e.g. the int key of "1: x") into strings,
+       so only such data is the same after a round trip through JSON.
+    """
+    if isinstance(data, dict):
+        return all(isinstance(key, str) and _string_keys(value)
+                   for key, value in data.items())
+    if isinstance(data, list):
+        return all(_string_keys(item) for item in data)
+    return True
+
+
+def merge_files(input_files, outfile, cache_dir=DEFAULT_CACHE_DIR):
+    """Merge solution files and write the result to outfile.
+
+       Returns the merged data.  If cache_dir is not None, the result
+       is cached there by content hash, and a cache hit skips both the
+       YAML parsing and the merge.  Results that JSON can't represent
+       exactly (non-string keys, timestamps) are not cached.
+    """
+    cached_yaml = cached_json = None
+    if cache_dir:
+        key = content_hash(input_files)
+        cached_yaml = os.path.join(cache_dir, key + '.yaml')
+        cached_json = os.path.join(cache_dir, key + '.json')
+        if os.path.exists(cached_yaml) and os.path.exists(cached_json):
+            shutil.copyfile(cached_yaml, outfile)
+            with open(cached_json) as f:
+                return json.load(f)
+
+    docs = []
+    for filename in input_files:
+        with open(filename) as f:
+            docs.append(yaml.safe_load(f))
+    merged = merge_all(docs)
+
+    with open(outfile, 'w') as f:
+        dump(merged, f)
+
+    if cache_dir:
+        if not _string_keys(merged):
+            # A cache hit would return different keys.  Don't cache it.
+            return merged
+        try:
+            encoded = json.dumps(merged)
+        except TypeError:
+            # Not representable as JSON (e.g. YAML timestamps).
+            # Don't cache it.
+            return merged
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to temporary names and rename, so that concurrent
+        # runs never see a partially written cache entry.
+        tmp = f'.{os.getpid()}.tmp'
+        shutil.copyfile(outfile, cached_yaml + tmp)
+        with open(cached_json + tmp, 'w') as f:
+            f.write(encoded)
+        os.replace(cached_json + tmp, cached_json)
+        os.replace(cached_yaml + tmp, cached_yaml)
+
+    return merged
+
+
+# Shorthand names for common variant axes
+AXIS_PATHS = {
+    'images': 'solution.images',
+    'durability': 'solution.storage_sets[0].durability',
+    'nodes': 'solution.storage_sets[0].nodes',
+    'setup_size': 'solution.common.setup_size',
+    'deployment_type': 'solution.deployment_type',
+}
+
+
+def parse_path(path):
+    """Split a path such as "solution.storage_sets[0].nodes" into keys.
+
+       List indexes become ints.
+    """
+    keys = []
+    for part in path.split('.'):
+        name, _, rest = part.partition('[')
+        if name:
+            keys.append(name)
+        while rest:
+            index, _, rest = rest.partition(']')
+            keys.append(int(index))
+            rest = rest.lstrip('[')
+    return keys
+
+
+def set_path(data, keys, value):
+    """Return a copy of data with value merged in at keys.
+
+       Only the maps and lists along the path are copied; the rest is
+       shared with data.  A map value is merged with yq "*" semantics,
+       anything else replaces the existing value.
+    """
+    if not keys:
+        return merge(data, value)
+    key = keys[0]
+    if isinstance(key, int):
+        copy = list(data or [])
+        copy[key] = set_path(copy[key], keys[1:], value)
+    else:
+        copy = dict(data or {})
+        copy[key] = set_path(copy.get(key), keys[1:], value)
+    return copy
+
+
+def variants(base, axes):
+    """Generate the cross product of axes applied to base, lazily.
+
+       Arguments:
+           base: Base solution data
+           axes: Dict of axis to list of values.  An axis is one of
+                 the names in AXIS_PATHS, or a path.
+
+       Yields (choices, data), where choices is a dict of axis to the
+       value used.  The variants share unchanged subtrees with base
+       and with each other, so they must not be modified.
+    """
+    names = list(axes)
+    paths = [parse_path(AXIS_PATHS.get(name, name)) for name in names]
+    for values in itertools.product(*(axes[name] for name in names)):
+        data = base
+        for keys, value in zip(paths, values):
+            data = set_path(data, keys, value)
+        yield dict(zip(names, values)), data
@@ -0,0 +1,337 @@
+#!/usr/bin/env python3
+
+##################################################
+# status.py
+#
+# In-memory CORTX cluster status checks.
+#
+# This evaluates the same checks as status-cortx-cloud.sh,
+# but against a single k8s.Snapshot instead of issuing a
+# kubectl query per component and resource kind.  Results
+# are returned as StatusCheck objects rather than text.
+#
+##################################################
+
+import argparse
+import re
+import sys
+
+from yaml import safe_load
+
+import k8_cortx_cloud_path  # noqa: F401
+from k8s import node_schedulable, pod_ready, Snapshot
+from rollout import RELEASE_SELECTOR, component_selector
+from utils import Logger
+
+
+CONSUL_SELECTOR = 'release=cortx,app=consul'
+
+# Maximum number of 3rd party (consul, kafka, zookeeper) replicas
+MAX_3RD_PARTY_REPLICAS = 3
+
+
+class StatusCheck:
+    def __init__(self, component, name, expected):
+        """Result of one status check, e.g. "CORTX Data: Pods".
+
+           items is a list of (object name, passed) tuples, one for
+           each object the check looked at.  The check passes if all
+           items passed and the number that passed is as expected.
+        """
+        self.component = component
+        self.name = name
+        self.expected = expected
+        self.items = []
+        self.count_ok = True
+
+    def add(self, name, passed):
+        self.items.append((name, passed))
+
+    @property
+    def count(self):
+        return sum(1 for _, passed in self.items if passed)
+
+    @property
+    def failures(self):
+        fails = sum(1 for _, passed in self.items if not passed)
+        return fails + (0 if self.count_ok else 1)
+
+    @property
+    def passed(self):
+        return self.failures == 0
+
+    def __repr__(self):
+        return (f'StatusCheck({self.component}: {self.name}, '
+                f'{self.count}/{self.expected}, '
+                f'{"PASSED" if self.passed else "FAILED"})')
+
+
+class ClusterStatus:
+    def __init__(self, solution, snapshot):
+        """Evaluates CORTX status checks against a snapshot.
+
+           Arguments:
+               solution: The "solution" dict of a solution.yaml file.
+               snapshot: A k8s.Snapshot of the CORTX namespace.
+        """
+        self.solution = solution
+        self.snapshot = snapshot
+        self.namespace = solution['namespace']
+        self.checks = []
+
+        storage_set = solution['storage_sets'][0]
+        self.num_nodes = len(storage_set['nodes'])
+        self.num_cvgs = len(storage_set['storage'])
+        self.num_devices = sum(len(devs)
+                               for cvg in storage_set['storage']
+                               for devs in cvg['devices'].values())
+        group_size = storage_set['container_group_size']
+        self.num_data_sts = (self.num_cvgs + group_size - 1) // group_size
+        self.data_only = solution['deployment_type'] == 'data-only'
+
+        common = solution['common']
+        self.server_instances_per_node = common['s3']['instances_per_node']
+        self.num_motr_client = common['motr']['num_client_inst']
+        self.s3_service_type = common['external_services']['s3']['type']
+        self.s3_service_count = common['external_services']['s3']['count']
+
+        self.num_worker_nodes = sum(1 for n in snapshot.get('Node')
+                                    if node_schedulable(n))
+        self.num_replicas = min(self.num_worker_nodes, MAX_3RD_PARTY_REPLICAS)
+
+    @classmethod
+    def from_cluster(cls, solution):
+        return cls(solution, Snapshot.from_cluster(solution['namespace']))
+
+    def _get(self, kind, selector, name_filter=None):
+        objs = self.snapshot.get(kind, selector, namespace=self.namespace)
+        if name_filter:
+            objs = [o for o in objs
+                    if re.search(name_filter, o['metadata']['name'])]
+        return objs
+
+    def _check(self, component, name, expected):
+        check = StatusCheck(component, name, expected)
+        self.checks.append(check)
+        return check
+
+    def check_workloads(self, component, kind, selector, expected):
+        """Check Deployments/StatefulSets have all replicas ready."""
+        check = self._check(component, kind, expected)
+        for obj in self._get(kind, selector):
+            desired = obj.get('spec', {}).get('replicas', 1)
+            ready = obj.get('status', {}).get('readyReplicas', 0)
+            check.add(obj['metadata']['name'], ready == desired)
+        check.count_ok = check.count == expected
+        return check
+
+    def check_pods(self, component, selector, expected):
+        check = self._check(component, 'Pods', expected)
+        for pod in self._get('Pod', selector):
+            check.add(pod['metadata']['name'], pod_ready(pod))
+        check.count_ok = check.count == expected
+        return check
+
+    def check_services(self, component, name, selector, expected,
+                       service_type='ClusterIP', name_filter=None,
+                       max_count=None):
+        """Check the Services of a component.
+
+           If service_type is None, the Service type is not checked.
+        """
+        check = self._check(component, f'Services: {name}', expected)
+        for svc in self._get('Service', selector, name_filter):
+            check.add(svc['metadata']['name'],
+                      service_type is None
+                      or svc['spec'].get('type') == service_type)
+        if max_count is None:
+            check.count_ok = check.count == expected
+        else:
+            check.count_ok = expected <= check.count <= max_count
+        return check
+
+    def check_storage(self, component, name, selector, pv_claim,
+                      expected, pvc_filter=None):
+        """Check PVCs and their PVs are Bound.
+
+           pv_claim is a regex matched against the "namespace/name"
+           claim reference of each PV.
+        """
+        check = self._check(component, f'Storage: {name} [PVCs/PVs]',
+                            expected)
+        for pvc in self._get('PersistentVolumeClaim', selector, pvc_filter):
+            check.add('PVC: ' + pvc['metadata']['name'],
+                      pvc.get('status', {}).get('phase') == 'Bound')
+        pv_claim = re.compile(f'{re.escape(self.namespace)}/{pv_claim}')
+        for pv in self.snapshot.get('PersistentVolume'):
+            ref = pv['spec'].get('claimRef') or {}
+            claim = f'{ref.get("namespace")}/{ref.get("name")}'
+            if pv_claim.search(claim):
+                check.add('PV: ' + claim,
+                          pv.get('status', {}).get('phase') == 'Bound')
+        check.count_ok = check.count == expected
+        return check
+
+    def check_control(self):
+        component = 'CORTX Control'
+        selector = component_selector('control')
+        expected = 0 if self.data_only else 1
+        self.check_workloads(component, 'Deployment', selector, expected)
+        # The expected number of control pods is the replica count
+        # the control Deployment was created with.
+        num_pods = sum(d.get('spec', {}).get('replicas', 1)
+                       for d in self._get('Deployment', selector))
+        if self.data_only:
+            num_pods = 0
+        self.check_pods(component, selector, num_pods)
+        # The control service type is configurable, so only the count
+        # is checked, as status-cortx-cloud.sh does.
+        self.check_services(component, 'cortx-control', selector, expected,
+                            service_type=None)
+
+    def check_data(self):
+        component = 'CORTX Data'
+        selector = component_selector('data')
+        self.check_workloads(component, 'StatefulSet', selector,
+                             self.num_data_sts)
+        self.check_pods(component, selector,
+                        self.num_nodes * self.num_data_sts)
+        self.check_services(component, 'Headless', selector, 1)
+        self.check_storage(component, 'Local', selector,
+                           r'data-cortx-data-g[0-9]+-[0-9]+',
+                           self.num_nodes * self.num_data_sts * 2,
+                           pvc_filter=r'^data')
+        self.check_storage(component, 'Block Devices', selector,
+                           r'block-.*-cortx-data-',
+                           self.num_nodes * self.num_devices * 2,
+                           pvc_filter=r'^block-.*-cortx-data-')
+
+    def check_server(self):
+        component = 'CORTX Server'
+        selector = component_selector('server')
+        num_pods = self.num_nodes * self.server_instances_per_node
+        expected = 0 if self.data_only else 1
+        if self.data_only:
+            num_pods = 0
+        self.check_workloads(component, 'StatefulSet', selector, expected)
+        self.check_pods(component, selector, num_pods)
+        self.check_services(component, 'Headless', selector, expected,
+                            name_filter=r'-headless')
+        self.check_services(component, 'cortx-server-N', selector, expected,
+                            service_type=self.s3_service_type,
+                            name_filter=r'^(?!.*-headless)',
+                            max_count=self.s3_service_count)
+        self.check_storage(component, 'Local', selector,
+                           r'data-cortx-server-[0-9]', num_pods * 2)
+
+    def check_ha(self):
+        component = 'CORTX HA'
+        selector = component_selector('ha')
+        expected = 0 if self.data_only else 1
+        self.check_workloads(component, 'Deployment', selector, expected)
+        self.check_pods(component, selector, expected)
+        self.check_services(component, 'Headless', selector, expected)
+        self.check_storage(component, 'Local', selector, r'cortx-ha',
+                           expected * 2)
+
+    def check_client(self):
+        component = 'CORTX Client'
+        selector = component_selector('client')
+        enabled = self.num_motr_client > 0
+        self.check_workloads(component, 'StatefulSet', selector,
+                             1 if enabled else 0)
+        self.check_pods(component, selector,
+                        self.num_nodes if enabled else 0)
+        self.check_services(component, 'Headless', selector,
+                            1 if enabled else 0)
+
+    def check_3rd_party(self):
+        for name in ('kafka', 'zookeeper'):
+            component = name.capitalize()
+            selector = f'{RELEASE_SELECTOR},app.kubernetes.io/component={name}'
+            self.check_workloads(component, 'StatefulSet', selector, 1)
+            self.check_pods(component, selector, self.num_replicas)
+            self.check_services(component, 'Cluster IP', selector, 1,
+                                name_filter=rf'^(?!.*-{name}-headless)')
+            self.check_services(component, 'Headless', selector, 1,
+                                name_filter=rf'-{name}-headless')
+            self.check_storage(component, 'Local', selector,
+                               rf'data-.*{name}-', self.num_replicas * 2)
+
+        component = 'Consul'
+        self.check_workloads(component, 'StatefulSet', CONSUL_SELECTOR, 1)
+        check = self._check(component, 'DaemonSet', 1)
+        for ds in self._get('DaemonSet', CONSUL_SELECTOR):
+            ready = ds.get('status', {}).get('numberReady', 0)
+            check.add(ds['metadata']['name'], ready == self.num_worker_nodes)
+        check.count_ok = check.count == 1
+        server_selector = CONSUL_SELECTOR + ',component=server'
+        self.check_pods(component, server_selector, self.num_replicas)
+        self.check_services(component, 'DNS Cluster IP',
+                            CONSUL_SELECTOR + ',component=dns', 1)
+        self.check_services(component, 'Server Headless', server_selector, 1)
+        self.check_storage(component, 'Server Local', server_selector,
+                           r'data-.*consul-server-', self.num_replicas * 2)
+
+    def run(self):
+        """Run all status checks.  Returns the list of StatusChecks."""
+        self.checks = []
+        self.check_control()
+        self.check_data()
+        self.check_server()
+        self.check_ha()
+        self.check_client()
+        self.check_3rd_party()
+        return self.checks
+
+    @property
+    def failcount(self):
+        return sum(check.failures for check in self.checks)
+
+    def report(self, logger=None):
+        """Log the check results in the style of status-cortx-cloud.sh."""
+        if not logger:
+            logger = Logger()
+        component = None
+        for check in self.checks:
+            if check.component != component:
+                component = check.component
+                logger.log('#'*54, color=Logger.WARNING)
+                logger.log(f'# {component}', color=Logger.WARNING)
+                logger.log('#'*54, color=Logger.WARNING)
+            logger.log(f'| Checking {check.name} |', color=Logger.OKCYAN)
+            for name, passed in check.items:
+                status = 'PASSED' if passed else 'FAILED'
+                logger.log(f'{name}...STATUS: {status}')
+            status = 'PASSED' if check.count_ok else 'FAILED'
+            logger.log(f'OVERALL STATUS: {status}')
+        logger.log('-'*42)
+        if self.failcount:
+            logger.logfail(f'{self.failcount} status checks failed')
+        else:
+            logger.logpass('All status checks passed')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Check the status of a CORTX cluster')
+    parser.add_argument('-s', '--solution', required=True)
+    parser.add_argument('--snapshot',
+                        help='Evaluate a recorded snapshot instead of '
+                             'querying the cluster')
+    parser.add_argument('--record',
+                        help='Save the cluster snapshot to this file')
+    args = parser.parse_args()
+
+    solution = safe_load(open(args.solution))['solution']
+    if args.snapshot:
+        snapshot = Snapshot.from_file(args.snapshot)
+    else:
+        snapshot = Snapshot.from_cluster(solution['namespace'])
+    if args.record:
+        snapshot.save(args.record)
+
+    status = ClusterStatus(solution, snapshot)
+    status.run()
+    status.report()
+    sys.exit(1 if status.failcount else 0)
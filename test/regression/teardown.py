@@ -0,0 +1,205 @@
+##################################################
+# teardown.py
+#
+# Destroy of a CORTX cluster.
+#
+# This performs the same steps as destroy-cortx-cloud.sh:
+# the CORTX Helm releases are uninstalled, the generated
+# secret is deleted, and then the PVCs of CORTX and Consul
+# are deleted (after removing their finalizers, with
+# force).  Instead of one "kubectl patch" per PVC:
+#
+#   * the PVCs are listed once,
+#   * finalizer patches and deletes (in batches of PVC
+#     names) are run concurrently by a bounded pool,
+#   * a single k8s.Watch on the PVs waits until every PV
+#     that was bound to a deleted PVC has been released,
+#     so that the next deploy starts from clean storage.
+#
+# Each kind of resource is timed as a timing.Timer span.
+#
+##################################################
+
+import json
+import subprocess  # nosec
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import k8_cortx_cloud_path  # noqa: F401
+from k8s import KubectlError, Snapshot, Watch, match_labels
+from lifecycle import DEFAULT_TIMEOUT
+from preflight import Preflight
+from timing import Timer
+from utils import Logger
+
+
+# Helm releases installed by deploy-cortx-cloud.sh
+RELEASES = ['cortx', 'cortx-block-data']
+
+# PVCs that are not removed by uninstalling the charts
+PVC_SELECTORS = ['app.kubernetes.io/instance=cortx',
+                 'app=consul,release=cortx']
+
+# Default maximum number of concurrent kubectl/helm calls
+DEFAULT_WORKERS = 16
+
+# Number of PVCs deleted by each "kubectl delete" call
+DELETE_BATCH_SIZE = 50
+
+# PV phases once its claim is gone
+RELEASED_PHASES = ('Released', 'Available', 'Failed')
+
+
+class TeardownError(Exception):
+    pass
+
+
+def _run(cmd, ignore=None):
+    child = subprocess.run(cmd, stdout=subprocess.PIPE,  # nosec B603
+                           stderr=subprocess.PIPE, check=False)
+    stderr = child.stderr.decode().strip()
+    if child.returncode != 0 and not (ignore and ignore in stderr):
+        raise TeardownError(f'{" ".join(cmd[:3])} failed: {stderr}')
+
+
+class ClusterTeardown:
+    def __init__(self, solution, logger=None, force=False,
+                 workers=DEFAULT_WORKERS, timeout=DEFAULT_TIMEOUT,
+                 timer=None):
+        """Destroys the CORTX deployment of a cluster.
+
+           Arguments:
+               solution: The "solution" dict of a solution.yaml file.
+               logger: If specified, use this logger object for logging
+               force: If true, remove the finalizers of the PVCs, like
+                      "destroy-cortx-cloud.sh --force".
+               workers: Maximum number of concurrent kubectl calls.
+               timeout: Number of seconds to wait for the PVs to be
+                      released.
+               timer: If specified, a timing.Timer that a span for
+                      each kind of resource is recorded in.
+        """
+        if not logger:
+            logger = Logger()
+        self.logger = logger
+        self.timer = timer or Timer()
+        self.solution = solution
+        self.namespace = solution['namespace']
+        self.force = force
+        self.workers = workers
+        self.timeout = timeout
+        self.timings = []
+
+    def _parallel(self, func, items):
+        """Call func on every item using the pool.  Raises the first error."""
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for future in [executor.submit(func, item) for item in items]:
+                future.result()
+
+    def _stage(self, kind, count, func, *args):
+        """Run a stage of the destroy, and record its timing."""
+        self.logger.logheader(kind)
+        start = time.monotonic()
+        with self.timer.span(f'Destroy {kind}', count=count):
+            func(*args)
+        elapsed = time.monotonic() - start
+        self.timings.append((kind, count, elapsed))
+        self.logger.log(f'{count} {kind} done in {elapsed:.1f}s')
+
+    def _uninstall(self, release):
+        # "release: not found" is expected for releases not deployed
+        _run(['helm', 'uninstall', release, '--namespace', self.namespace],
+             ignore='release: not found')
+
+    def _delete_secrets(self, names):
+        if names:
+            _run(['kubectl', 'delete', 'secret', *names,
+                  '--namespace', self.namespace, '--ignore-not-found=true'])
+
+    def _remove_finalizers(self, name):
+        _run(['kubectl', 'patch', 'pvc', name, '--namespace', self.namespace,
+              '--patch', json.dumps({'metadata': {'finalizers': None}})],
+             ignore='NotFound')
+
+    def _delete_pvcs(self, names):
+        _run(['kubectl', 'delete', 'pvc', *names, '--namespace',
+              self.namespace, '--ignore-not-found', '--wait=false'])
+
+    def _wait_released(self, watch, claims):
+        """Wait until no PV is bound to any of the claims."""
+        state = {'last': None}
+
+        def released(pvs):
+            bound = 0
+            for pv in pvs:
+                ref = pv.get('spec', {}).get('claimRef') or {}
+                if ref.get('uid') in claims and \
+                        pv.get('status', {}).get('phase') not in \
+                        RELEASED_PHASES:
+                    bound += 1
+            progress = f'{len(claims) - bound}/{len(claims)} PVs released'
+            if progress != state['last']:
+                state['last'] = progress
+                self.logger.log(progress)
+            return not bound
+
+        if not watch.wait_for(released, self.timeout):
+            raise TeardownError(f'Timed out after {self.timeout}s waiting '
+                                f'for the PVs to be released')
+
+    def run(self):
+        try:
+            not_ready = Preflight.from_cluster(self.solution).not_ready_nodes
+        except KubectlError:
+            not_ready = []
+        if not_ready:
+            self.logger.logwarning(f'NotReady nodes may keep resources from '
+                                   f'being deleted: {", ".join(not_ready)}')
+        snapshot = Snapshot.from_cluster(self.namespace, kinds='pvc')
+        pvcs = [pvc for pvc in snapshot.get('PersistentVolumeClaim',
+                                            namespace=self.namespace)
+                if any(match_labels(pvc['metadata'].get('labels') or {}, s)
+                       for s in PVC_SELECTORS)]
+        names = [pvc['metadata']['name'] for pvc in pvcs]
+        # Claims that have a PV to wait for, by uid
+        claims = {pvc['metadata']['uid'] for pvc in pvcs
+                  if pvc.get('spec', {}).get('volumeName')}
+
+        self._stage('Helm releases', len(RELEASES),
+                    self._parallel, self._uninstall, RELEASES)
+        secret = (self.solution.get('secrets') or {}).get('name')
+        self._stage('Secrets', 1 if secret else 0,
+                    self._delete_secrets, [secret] if secret else [])
+        if not names:
+            return
+        with Watch('persistentvolumes') as watch:
+            if self.force:
+                self._stage('PVC finalizers', len(names), self._parallel,
+                            self._remove_finalizers, names)
+            batches = [names[i:i + DELETE_BATCH_SIZE]
+                       for i in range(0, len(names), DELETE_BATCH_SIZE)]
+            self._stage('PVCs', len(names), self._parallel,
+                        self._delete_pvcs, batches)
+            self._stage('PVs', len(claims), self._wait_released,
+                        watch, claims)
+
+    def report(self):
+        """Log the time taken by each kind of resource."""
+        self.logger.logheader('Destroy timing')
+        for kind, count, elapsed in self.timings:
+            self.logger.log(f'{kind:<16} {count:>5}  {elapsed:8.1f}s')
+
+
+def run_teardown(solution, logger=None, force=False, workers=DEFAULT_WORKERS,
+                 timeout=DEFAULT_TIMEOUT, timer=None):
+    """Destroy a cluster.  Returns 0 on success, 1 on failure."""
+    teardown = ClusterTeardown(solution, logger=logger, force=force,
+                               workers=workers, timeout=timeout, timer=timer)
+    try:
+        teardown.run()
+    except (TeardownError, KubectlError) as e:
+        teardown.logger.logfail(f'Destroy failed: {e}')
+        return 1
+    finally:
+        teardown.report()
+    return 0
@@ -7,7 +7,8 @@ import sys
 
 from checker import Checker
 from cluster import Cluster
-from utils import Logger, StopWatch
+from timing import Timer
+from utils import Logger
 
 
 def get_expected_cortx_control_pods(namespace):
@@ -53,9 +54,9 @@ def verify_pods_in_namespace(checker, namespace, data_only=False):
     checker.test(deployed_pods['cortx-data'] >= 1,
                  f'Verify at least one cortx-data pod deployed in namespace {namespace}')
 
-def run_deploy_test(cluster, logger, checker, shutdown=False):
+def run_deploy_test(cluster, logger, checker, shutdown=False, parallel=1):
 
-    sw = StopWatch()
+    timer = cluster.timer
 
     logger.logheader('Generated Solution File for Test')
     logger.logfile(cluster.solution_file)
@@ -67,11 +68,27 @@ def run_deploy_test(cluster, logger, checker, shutdown=False):
     logger.logheader('\n\n')
     logger.logheader('-'*80)
     logger.log('\n\n')
-    sw.start()
-    result = cluster.run_prereq()
-    sw.stop()
-    checker.test_equal(0, result, 'Run prereq-cortx-cloud.sh')
-    logger.log(f'TIMING: Prereq: {sw.elapsed():.0f}s', color=Logger.OKBLUE)
+    with timer.span('Prereq') as span:
+        results = cluster.run_prereq(parallel=parallel)
+    if results is None:
+        checker.test_fail('Run prereq-cortx-cloud.sh')
+    else:
+        for node, result in results.items():
+            checker.test_equal(0, result,
+                               f'Run prereq-cortx-cloud.sh on {node}',
+                               node=node)
+    logger.log(f'TIMING: Prereq: {span.elapsed:.1f}s', color=Logger.OKBLUE)
+
+    logger.log('\n\n')
+    logger.logheader('-'*80)
+    logger.logheader('\n\n')
+    logger.logheader('\nChecking nodes\n')
+    logger.logheader('\n\n')
+    logger.logheader('-'*80)
+    logger.log('\n\n')
+    with timer.span('Preflight'):
+        result = cluster.preflight()
+    checker.test_equal(0, result, 'Check nodes')
 
     logger.log('\n\n')
     logger.logheader('-'*80)
@@ -80,11 +97,10 @@ def run_deploy_test(cluster, logger, checker, shutdown=False):
     logger.logheader('\n\n')
     logger.logheader('-'*80)
     logger.log('\n\n')
-    sw.start()
-    result = cluster.deploy()
-    sw.stop()
+    with timer.span('Deploy') as span:
+        result = cluster.deploy()
     checker.test_equal(0, result, 'Run deploy-cortx-cloud.sh')
-    logger.log(f'TIMING: Deploy: {sw.elapsed():.0f}s', color=Logger.OKBLUE)
+    logger.log(f'TIMING: Deploy: {span.elapsed:.1f}s', color=Logger.OKBLUE)
 
 
     # Verify cortx pods running in expected namespace
@@ -99,42 +115,44 @@ def run_deploy_test(cluster, logger, checker, shutdown=False):
     logger.log('\n\n')
     logger.logheader('-'*80)
     logger.logheader('\n\n')
-    logger.logheader('\nRunning status-cortx-cloud.sh\n')
+    logger.logheader('\nChecking cluster status\n')
     logger.logheader('\n\n')
     logger.logheader('-'*80)
     logger.log('\n\n')
-    sw.start()
-    result = cluster.status()
-    sw.stop()
-    checker.test_equal(0, result, 'Run status-cortx-cloud.sh')
-    logger.log(f'TIMING: Status: {sw.elapsed():.0f}s', color=Logger.OKBLUE)
+    with timer.span('Status') as span:
+        result = cluster.status()
+    checker.test_equal(0, result, 'Check cluster status')
+    for check in cluster.status_checks:
+        if not check.passed:
+            checker.test_fail(f'Status {check.component}: {check.name} '
+                              f'({check.count} of {check.expected} ok)')
+    logger.log(f'TIMING: Status: {span.elapsed:.1f}s', color=Logger.OKBLUE)
 
     if shutdown:
         logger.log('\n\n')
         logger.logheader('-'*80)
         logger.logheader('\n\n')
-        logger.logheader('\nRunning shutdown-cortx-cloud.sh\n')
+        logger.logheader('\nShutting down cluster\n')
         logger.logheader('\n\n')
         logger.logheader('-'*80)
         logger.log('\n\n')
-        sw.start()
-        result = cluster.shutdown()
-        sw.stop()
-        checker.test_equal(0, result, 'Run shutdown-cortx-cloud.sh')
-        logger.log(f'TIMING: Status: {sw.elapsed():.0f}s', color=Logger.OKBLUE)
+        with timer.span('Shutdown') as span:
+            result = cluster.shutdown()
+        checker.test_equal(0, result, 'Shut down cluster')
+        logger.log(f'TIMING: Shutdown: {span.elapsed:.1f}s',
+                   color=Logger.OKBLUE)
 
         logger.log('\n\n')
         logger.logheader('-'*80)
         logger.logheader('\n\n')
-        logger.logheader('\nRunning start-cortx-cloud.sh\n')
+        logger.logheader('\nStarting cluster\n')
         logger.logheader('\n\n')
         logger.logheader('-'*80)
         logger.log('\n\n')
-        sw.start()
-        result = cluster.start()
-        sw.stop()
-        checker.test_equal(0, result, 'Run start-cortx-cloud.sh')
-        logger.log(f'TIMING: Status: {sw.elapsed():.0f}s', color=Logger.OKBLUE)
+        with timer.span('Start') as span:
+            result = cluster.start()
+        checker.test_equal(0, result, 'Start cluster')
+        logger.log(f'TIMING: Start: {span.elapsed:.1f}s', color=Logger.OKBLUE)
 
         # Verify cortx pods running in expected namespace
         verify_pods_in_namespace(checker, namespace, data_only)
@@ -142,15 +160,14 @@ def run_deploy_test(cluster, logger, checker, shutdown=False):
     logger.log('\n\n')
     logger.logheader('-'*80)
     logger.logheader('\n\n')
-    logger.logheader('\nRunning destroy-cortx-cloud.sh\n')
+    logger.logheader('\nDestroying cluster\n')
     logger.logheader('\n\n')
     logger.logheader('-'*80)
     logger.log('\n\n')
-    sw.start()
-    result = cluster.destroy()
-    sw.stop()
-    checker.test_equal(0, result, 'Run destroy-cortx-cloud.sh')
-    logger.log(f'TIMING: Destroy: {sw.elapsed():.0f}s', color=Logger.OKBLUE)
+    with timer.span('Destroy') as span:
+        result = cluster.destroy()
+    checker.test_equal(0, result, 'Destroy cluster')
+    logger.log(f'TIMING: Destroy: {span.elapsed:.1f}s', color=Logger.OKBLUE)
 
 
 if __name__ == "__main__":
@@ -159,12 +176,31 @@ if __name__ == "__main__":
     parser.add_argument('--localfs')
 
     parser.add_argument('--shutdown', action='store_true')
+    parser.add_argument('--parallel', type=int, default=1,
+                        help='Number of nodes to run prereq on concurrently')
     parser.add_argument('--logdir', dest='logdir', default='.')
+    parser.add_argument('--log-file', help='File to copy the log to')
+    parser.add_argument('--json-log',
+                        help='File to write JSON-lines log records to')
+    parser.add_argument('--timing-report',
+                        help='File to write a JSON report of phase timings to')
+    parser.add_argument('--trace',
+                        help='File to write phase timings to in Chrome trace '
+                             'format (for chrome://tracing or Perfetto)')
     args = parser.parse_args()
 
-    logger = Logger()
+    logger = Logger(args.log_file, args.json_log)
     checker = Checker(logger)
-    cluster = Cluster(args.solution, localfs=args.localfs)
-    run_deploy_test(cluster, logger, checker, args.shutdown)
+    timer = Timer()
+    cluster = Cluster(args.solution, localfs=args.localfs, timer=timer)
+    try:
+        run_deploy_test(cluster, logger, checker, args.shutdown, args.parallel)
+    finally:
+        cluster.close()
+        if args.timing_report:
+            timer.save_report(args.timing_report)
+        if args.trace:
+            timer.save_trace(args.trace)
+        logger.close()
 
     sys.exit(checker.result())
@@ -12,8 +12,12 @@ import shlex
 import subprocess  # nosec
 import argparse
 import time
+import threading
+import json
+import hashlib
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
-from utils import Logger
+from utils import Logger, stream
 
 
 def get_duration_str(start, stop):
@@ -29,6 +33,60 @@ def get_duration_str(start, stop):
     return duration
 
 
+class ResultStore:
+    # Modes for skipping tests based on previous results
+    RERUN_FAILED = 'rerun-failed'
+    SKIP_UNCHANGED = 'skip-unchanged'
+
+    def __init__(self, filename):
+        """Persistent store of test results, keyed by test id.
+
+           Each record holds the result of the last run of a test and
+           the input key (see Test.input_key) it was run with.
+        """
+        self.filename = filename
+        self.results = {}
+        self.lock = threading.Lock()
+        if os.path.exists(filename):
+            with open(filename) as f:
+                self.results = json.load(f)
+
+    def should_skip(self, test, mode):
+        """Return True if the test can be skipped in the given mode.
+
+           RERUN_FAILED skips any test whose last run passed.
+           SKIP_UNCHANGED skips a test whose last run passed with the
+           same command and solution file contents.
+        """
+        record = self.results.get(test.id)
+        if not record or record['result'] != 0:
+            return False
+        if mode == self.RERUN_FAILED:
+            return True
+        if mode == self.SKIP_UNCHANGED:
+            return record['key'] == test.input_key()
+        return False
+
+    def record(self, test, result, duration):
+        with self.lock:
+            self._record(test, result, duration)
+
+    def _record(self, test, result, duration):
+        self.results[test.id] = {
+            'name': test.name,
+            'cmd': test.cmd,
+            'key': test.input_key(),
+            'result': result,
+            'duration': round(duration, 1),
+            'timestamp': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        # Save after every test so an interrupted run keeps its results
+        tmpfile = self.filename + '.tmp'
+        with open(tmpfile, 'w') as f:
+            json.dump(self.results, f, indent=2, sort_keys=True)
+        os.replace(tmpfile, self.filename)
+
+
 class TestList:
     def __init__(self, source, vars_):
         """Represents a test list."""
@@ -80,14 +138,93 @@ class TestList:
 
         self.testlist = []
         for test in source['testlist']:
+            resources = self.tests[test].get('resources')
+            if resources and 'namespace' in resources:
+                resources['namespace'] = self._replacevar(
+                                            str(resources['namespace']))
             self.testlist.append(Test(test, self.tests[test]['id'],
-                                      self.tests[test]['cmd']))
+                                      self.tests[test]['cmd'], resources))
+
+    def _run_test(self, i, test, logger, store, prefix=None):
+        def header(s=''):
+            logger.log(s, prefix=prefix, color=Logger.HEADER, test_id=test.id)
+
+        header()
+        header('-'*50)
+        header(f'Running {i+1}/{len(self.testlist)}  {test.id}: {test.name}')
+        header(test.cmd)
+        header('-'*50)
+        header()
+
+        teststart = time.time()
+
+        result = test.run(logger=logger, prefix=prefix)
+
+        teststop = time.time()
+        duration = get_duration_str(teststart, teststop)
+        if store:
+            store.record(test, result, teststop - teststart)
+
+        if result == 0:
+            logger.log(f"Test {test.id}: {test.name} passed in {duration}",
+                       prefix=prefix, color=Logger.PASSING, test_id=test.id)
+        else:
+            logger.log(f"Test {test.id}: {test.name} failed in {duration}",
+                       prefix=prefix, color=Logger.FAILING, test_id=test.id)
+        logger.log(prefix=prefix)
+        logger.log(prefix=prefix)
+        return result
+
+    def _run_parallel(self, to_run, logger, store, jobs):
+        """Run tests concurrently, never running conflicting tests together.
+
+           Tests are started in list order.  A test that conflicts with
+           a running test is passed over for later ones, except for an
+           exclusive test, which waits for all running tests to finish
+           and holds back everything after it.
+        """
+        pending = list(to_run)
+        running = {}
+        results = {}
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            while pending or running:
+                for item in list(pending):
+                    if len(running) >= jobs:
+                        break
+                    i, test = item
+                    if test.exclusive and running:
+                        break
+                    if any(test.conflicts(t) for _, t in running.values()):
+                        continue
+                    pending.remove(item)
+                    future = executor.submit(self._run_test, i, test, logger,
+                                             store, prefix=f'[{test.id}]')
+                    running[future] = item
+                    if test.exclusive:
+                        break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    i, _ = running.pop(future)
+                    results[i] = future.result()
+        return results
 
     def _replacevar(self, s):
         r = re.sub(r'{{\s*(\w+)\s*}}', self.repl, s)
         return r
 
-    def run(self, logger=None):
+    def run(self, logger=None, store=None, mode=None, jobs=1):
+        """Run the tests in the list.
+
+           Arguments:
+               logger: If specified, use this logger object for logging
+               store: Optional ResultStore that results are recorded in
+               mode: ResultStore.RERUN_FAILED or
+                     ResultStore.SKIP_UNCHANGED to skip tests based on
+                     the results in store.  None runs every test.
+               jobs: Maximum number of tests to run concurrently.  Tests
+                     only run together if their resources (see Test)
+                     do not conflict.
+        """
         if not logger:
             logger = Logger()
         logger.log('Starting testlist.  %d tests.' % (len(self.testlist)))
@@ -95,42 +232,44 @@ class TestList:
             logger.log("%3d.  %s: %s" % (i+1, test.id, test.name))
         logger.log()
 
-        tests_run = 0
-        tests_failed = 0
-
-        liststart = time.time()
-
+        tests_skipped = 0
+        to_run = []
         for i, test in enumerate(self.testlist):
-            logger.logheader()
-            logger.logheader('-'*50)
-            logger.logheader(f'Running {i+1}/{len(self.testlist)}  '
-                             f'{test.id}: {test.name}')
-            logger.logheader(test.cmd)
-            logger.logheader('-'*50)
-            logger.logheader()
+            if store and mode and store.should_skip(test, mode):
+                logger.log(f'Skipping {i+1}/{len(self.testlist)}  '
+                           f'{test.id}: {test.name} (passed previously)')
+                tests_skipped += 1
+                continue
+            to_run.append((i, test))
 
-            teststart = time.time()
-
-            result = test.run()
+        liststart = time.time()
 
-            teststop = time.time()
-            duration = get_duration_str(teststart, teststop)
+        results = {}
+        if jobs <= 1:
+            for i, test in to_run:
+                results[i] = self._run_test(i, test, logger, store)
+        else:
+            results = self._run_parallel(to_run, logger, store, jobs)
 
-            tests_run += 1
-            if result == 0:
-                logger.logpass(f"Test {test.id}: {test.name} passed "
-                               f"in {duration}")
-            else:
-                logger.logfail(f"Test {test.id}: {test.name} failed "
-                               f"in {duration}")
-                tests_failed += 1
-            logger.log()
+        # Summarize in testlist order, however the tests were scheduled
+        tests_run = len(results)
+        tests_failed = 0
+        if jobs > 1:
             logger.log()
+        for i, test in to_run:
+            if results[i] != 0:
+                tests_failed += 1
+            if jobs > 1:
+                log = logger.logpass if results[i] == 0 else logger.logfail
+                log(f'{i+1:3d}.  {test.id}: {test.name} '
+                    f'{"passed" if results[i] == 0 else "failed"}')
 
         liststop = time.time()
         duration = get_duration_str(liststart, liststop)
 
         logger.log(f'\n\n  Test List Completed in {duration}\n\n')
+        if tests_skipped:
+            logger.log(f'    {tests_skipped} tests skipped')
         if tests_failed == 0:
             logger.logpass('-'*50)
             logger.logpass()
@@ -149,25 +288,64 @@ class TestList:
 
 
 class Test:
-    def __init__(self, name, id_, cmd):
+    def __init__(self, name, id_, cmd, resources=None):
         """Represents a single regression test."""
         #Parameters:
         #  * name of the test
         #  * test id (e.g. TEST-DEPLOY-0001)
         #  * cmd to run -- any executable
+        #  * resources the test uses, from its "resources" entry in the
+        #    test list:
+        #      namespace: Kubernetes namespace the test deploys into
+        #      nodes: List of nodes the test uses
+        #      exclusive: If true, no other test may run concurrently
+        #    A test without resources is exclusive.
         self.name = name
         self.id = id_
         self.cmd = cmd
-
-    def run(self):
+        resources = resources or {}
+        self.namespace = resources.get('namespace')
+        self.nodes = set(resources.get('nodes') or [])
+        self.exclusive = resources.get('exclusive', not resources)
+
+    def conflicts(self, other):
+        """Return True if this test cannot run alongside other."""
+        if self.exclusive or other.exclusive:
+            return True
+        if self.namespace and self.namespace == other.namespace:
+            return True
+        return bool(self.nodes & other.nodes)
+
+    def solution_files(self):
+        """Return the existing YAML files referenced by the command."""
+        return [arg for arg in shlex.split(self.cmd)
+                if arg.endswith(('.yaml', '.yml')) and os.path.isfile(arg)]
+
+    def input_key(self):
+        """Return a hash of the test id, command and solution files."""
+        h = hashlib.sha256()
+        h.update(self.id.encode() + b'\0' + self.cmd.encode() + b'\0')
+        for filename in self.solution_files():
+            with open(filename, 'rb') as f:
+                h.update(f.read())
+        return h.hexdigest()
+
+    def run(self, logger=None, prefix=None):
+        """Run the test.
+
+           If prefix is specified, each line of output is logged with
+           that prefix through logger, so that the output of concurrent
+           tests can be told apart.
+        """
         proc = subprocess.Popen(shlex.split(self.cmd), stdout=subprocess.PIPE, # nosec B603
                                 stderr=subprocess.STDOUT)
-        while True:
-            out = proc.stdout.readline()
-            sys.stdout.write(out.decode('utf-8'))
-            sys.stdout.flush()
-            if not out:
-                break
+        if prefix is None:
+            stream(proc, logfile=logger.tee() if logger else None)
+        else:
+            stream(proc, echo=False,
+                   on_line=lambda line: logger.log(line, prefix=prefix,
+                                                   log_timestamp=False,
+                                                   test_id=self.id))
 
         result = proc.wait()
         return result
@@ -178,7 +356,24 @@ if __name__ == '__main__':
     parser.add_argument('-s', '--solution-segment', required=True)
     parser.add_argument('--local-fs', default='/dev/sdb')
     parser.add_argument('-t', dest='testlist', required=True)
+    parser.add_argument('--results',
+                        help='File to record test results in')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--rerun-failed', dest='mode', action='store_const',
+                      const=ResultStore.RERUN_FAILED,
+                      help='Only run tests that did not pass last time')
+    mode.add_argument('--skip-unchanged', dest='mode', action='store_const',
+                      const=ResultStore.SKIP_UNCHANGED,
+                      help='Skip tests that passed last time with the same '
+                           'command and solution files')
+    parser.add_argument('-j', '--jobs', type=int, default=1,
+                        help='Number of tests to run concurrently')
+    parser.add_argument('--log-file', help='File to copy the log to')
+    parser.add_argument('--json-log',
+                        help='File to write JSON-lines log records to')
     args = parser.parse_args()
+    if args.mode and not args.results:
+        parser.error(f'--{args.mode} requires --results')
 
     vars_ = {
                   'solution': args.solution_segment,
@@ -189,5 +384,9 @@ if __name__ == '__main__':
                                                   '../../k8_cortx_cloud')),
            }
     testlist = TestList(args.testlist, vars_)
-    tests_passed = testlist.run()
+    store = ResultStore(args.results) if args.results else None
+    logger = Logger(args.log_file, args.json_log)
+    tests_passed = testlist.run(logger=logger, store=store, mode=args.mode,
+                                jobs=args.jobs)
+    logger.close()
     sys.exit(0 if tests_passed else 1)
@@ -0,0 +1,236 @@
+##################################################
+# timing.py
+#
+# Nested timing spans for test phases.
+#
+# A Timer records a tree of named spans measured with
+# time.perf_counter().  Spans nest per thread, so a phase
+# that runs work on several threads (e.g. prereq on each
+# node) gets one child span per thread.  The tree can be
+# saved as a JSON timing report, or in Chrome trace format
+# to be viewed in chrome://tracing or https://ui.perfetto.dev
+#
+# Usage:
+#     timer = Timer()
+#     with timer.span('Deploy') as span:
+#         with timer.span('helm install'):
+#             ...
+#     print(span.elapsed)
+#     timer.save_report('timing.json')
+#     timer.save_trace('trace.json')
+#
+##################################################
+
+import json
+import os
+import re
+import threading
+import time
+
+
+class Span:
+    def __init__(self, name, parent=None, attrs=None):
+        """A named, timed phase.  Times are perf_counter() values."""
+        self.name = name
+        self.parent = parent
+        self.attrs = attrs or {}
+        self.children = []
+        self.start = None
+        self.end = None
+        self.tid = threading.get_ident()
+
+    @property
+    def elapsed(self):
+        """Duration in seconds.  For an open span, the time so far."""
+        if self.start is None:
+            return 0.0
+        end = self.end if self.end is not None else time.perf_counter()
+        return end - self.start
+
+    def find(self, name):
+        """Return the first descendant span with the given name, or None."""
+        for child in self.children:
+            if child.name == name:
+                return child
+            found = child.find(name)
+            if found:
+                return found
+        return None
+
+
+class Timer:
+    def __init__(self):
+        """Records a tree of timing spans."""
+        self.root = Span('root')
+        self.root.start = time.perf_counter()
+        # Wall clock time corresponding to root.start, for reports
+        self.wall_start = time.time()
+        self.lock = threading.Lock()
+        self.local = threading.local()
+
+    def _stack(self):
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    def current(self):
+        """Return the innermost open span of the calling thread."""
+        stack = self._stack()
+        return stack[-1] if stack else self.root
+
+    def begin(self, name, parent=None, **attrs):
+        """Open a span and make it current for the calling thread.
+
+           parent defaults to the current span of the calling thread.
+           Pass it explicitly to nest spans opened on worker threads
+           under a span of the thread that started them.
+        """
+        parent = parent or self.current()
+        span = Span(name, parent, attrs)
+        with self.lock:
+            parent.children.append(span)
+        self._stack().append(span)
+        span.start = time.perf_counter()
+        return span
+
+    def end(self, span):
+        span.end = time.perf_counter()
+        stack = self._stack()
+        if span in stack:
+            del stack[stack.index(span):]
+
+    def span(self, name, parent=None, **attrs):
+        """Context manager that times a span."""
+        return _SpanContext(self, name, parent, attrs)
+
+    def add(self, name, start, end, parent=None, **attrs):
+        """Record an already completed span with perf_counter() times."""
+        parent = parent or self.current()
+        span = Span(name, parent, attrs)
+        span.start = start
+        span.end = end
+        with self.lock:
+            parent.children.append(span)
+        return span
+
+    def _span_dict(self, span):
+        d = {
+            'name': span.name,
+            'start': round(span.start - self.root.start, 6),
+            'duration': round(span.elapsed, 6),
+        }
+        if span.attrs:
+            d['attrs'] = span.attrs
+        if span.children:
+            d['children'] = [self._span_dict(c) for c in span.children]
+        return d
+
+    def report(self):
+        """Return the spans as a JSON serializable dict.
+
+           Span start times are seconds since the Timer was created.
+        """
+        return {
+            'start_time': time.strftime('%Y-%m-%dT%H:%M:%S%z',
+                                        time.localtime(self.wall_start)),
+            'spans': [self._span_dict(c) for c in self.root.children],
+        }
+
+    def trace_events(self):
+        """Return the spans as Chrome trace "complete" events."""
+        events = []
+        pid = os.getpid()
+
+        def add(span):
+            events.append({
+                'name': span.name,
+                'ph': 'X',
+                'ts': round((span.start - self.root.start) * 1e6),
+                'dur': round(span.elapsed * 1e6),
+                'pid': pid,
+                'tid': span.tid,
+                'args': span.attrs,
+            })
+            for child in span.children:
+                add(child)
+
+        for span in self.root.children:
+            add(span)
+        return events
+
+    def save_report(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+    def save_trace(self, filename):
+        with open(filename, 'w') as f:
+            json.dump({'traceEvents': self.trace_events(),
+                       'displayTimeUnit': 'ms'}, f)
+
+
+class _SpanContext:
+    def __init__(self, timer, name, parent, attrs):
+        self.timer = timer
+        self.name = name
+        self.parent = parent
+        self.attrs = attrs
+        self.span = None
+
+    def __enter__(self):
+        self.span = self.timer.begin(self.name, self.parent, **self.attrs)
+        return self.span
+
+    def __exit__(self, *exc):
+        self.timer.end(self.span)
+
+
+class ScriptSpans:
+    def __init__(self, timer, phases, completed=None):
+        """Line callback that derives spans from a script's output.
+
+           Use as the on_line callback of utils.run() to time the phases
+           of a shell script that only reports them in its output.
+
+           Arguments:
+               timer: Timer to record spans in.  They are nested under
+                      the span that is current when this is created.
+               phases: List of regular expressions.  A line matching
+                      one starts a span, which ends when the next phase
+                      starts or finish() is called.  The span is named
+                      after the "name" group of the match, or the
+                      whole match.
+               completed: Optional list of regular expressions for lines
+                      that report a completed step.  They must have
+                      "name" and "seconds" groups; a span of that many
+                      seconds ending now is recorded under the current
+                      phase.
+        """
+        self.timer = timer
+        self.parent = timer.current()
+        self.phases = [re.compile(p) for p in phases]
+        self.completed = [re.compile(p) for p in completed or []]
+        self.span = None
+
+    def __call__(self, line):
+        for regex in self.phases:
+            m = regex.search(line)
+            if m:
+                self.finish()
+                name = m.groupdict().get('name') or m.group(0)
+                self.span = self.timer.add(name.strip(), time.perf_counter(),
+                                           None, parent=self.parent)
+                return
+        for regex in self.completed:
+            m = regex.search(line)
+            if m:
+                end = time.perf_counter()
+                self.timer.add(m.group('name'),
+                               end - float(m.group('seconds')), end,
+                               parent=self.span or self.parent)
+                return
+
+    def finish(self):
+        """End the current phase span."""
+        if self.span:
+            self.span.end = time.perf_counter()
+            self.span = None
@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+
+##################################################
+# upgrade.py
+#
+# Rolling upgrade of the CORTX images of a cluster.
+#
+# upgrade-cortx-cloud.sh shuts down every CORTX pod, sets
+# the new images and starts the pods again.  This instead
+# upgrades a running cluster:
+#
+#   * The data StatefulSets (cortx-data-g*) are patched to
+#     the new image with the OnDelete update strategy, so
+#     the controller does not replace any pod by itself.
+#     Their pods are then deleted in waves of at most
+#     --max-unavailable pods across all of the StatefulSets,
+#     and a wave is only started once every pod of the
+#     previous one is back, ready and on the new image.
+#     Pods are ordered by node, so that a wave takes down
+#     as few nodes as possible.  Once all pods are upgraded
+#     the original update strategy is restored.
+#   * The other components are updated like the shell
+#     script does, and their controllers roll them out.
+#
+# All waits share a single k8s.Watch on the CORTX pods, and
+# each wave is recorded as a timing.Timer span.
+#
+# Pods that already run the new image are not deleted, so
+# an interrupted upgrade can be run again to resume it.
+#
+# Usage:
+#   upgrade.py -s solution.yaml -i ghcr.io/seagate/cortx-data:2.0.0-835 \
+#       --max-unavailable 25%
+#
+##################################################
+
+import argparse
+import json
+import re
+import subprocess  # nosec
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from yaml import safe_load
+
+import k8_cortx_cloud_path  # noqa: F401
+from k8s import KubectlError, pod_failed, pod_ready, Snapshot, Watch
+from k8s import match_labels, parse_selector
+from lifecycle import DEFAULT_TIMEOUT, TIERS
+from rollout import CORTX_SELECTOR
+from timing import Timer
+from utils import Logger
+
+
+# Image of each component, like upgrade-cortx-cloud.sh
+COMPONENT_IMAGES = {
+    'client': 'data',
+    'control': 'control',
+    'data': 'data',
+    'ha': 'control',
+    'server': 'rgw',
+}
+
+# Annotation that keeps the update strategy of a data StatefulSet
+# while it is set to OnDelete by an upgrade
+STRATEGY_ANNOTATION = 'cortx.io/upgrade-update-strategy'
+
+# Maximum number of concurrent "kubectl patch" calls
+MAX_PATCH_WORKERS = 8
+
+
+class UpgradeError(Exception):
+    pass
+
+
+def component_images(image):
+    """Return the image of each component for an upgrade image.
+
+       image may be any of the cortx-data, cortx-rgw and cortx-control
+       images; the others are the same version.
+    """
+    return {component: re.sub(r'cortx-.*:', f'cortx-{name}:', image, count=1)
+            for component, name in COMPONENT_IMAGES.items()}
+
+
+def parse_max_unavailable(value, total):
+    """Return the number of pods for a count or a percentage of total.
+
+       Like a maxUnavailable field, a percentage is rounded down, but
+       at least one pod is always allowed.
+    """
+    value = str(value).strip()
+    if value.endswith('%'):
+        count = total * int(value[:-1]) // 100
+    else:
+        count = int(value)
+    if count < 0:
+        raise ValueError(f'Invalid maximum unavailable pods: {value}')
+    return max(1, min(count, total))
+
+
+def pod_images(pod):
+    spec = pod.get('spec', {})
+    return {c['image'] for key in ('initContainers', 'containers')
+            for c in spec.get(key, [])}
+
+
+def template_images(workload):
+    return pod_images(workload['spec']['template'])
+
+
+def _owner(pod):
+    for ref in pod['metadata'].get('ownerReferences') or []:
+        if ref.get('kind') == 'StatefulSet':
+            return ref.get('name')
+    return None
+
+
+class ClusterUpgrade:
+    def __init__(self, solution, image, max_unavailable=1, logger=None,
+                 timeout=DEFAULT_TIMEOUT, timer=None):
+        """Upgrades the CORTX images of a running cluster.
+
+           Arguments:
+               solution: The "solution" dict of a solution.yaml file.
+               image: Any one of the CORTX images to upgrade to.
+               max_unavailable: Maximum number of data pods that are
+                      upgraded at the same time, either a number or
+                      a percentage (e.g. "25%") of all data pods.
+               logger: If specified, use this logger object for logging
+               timeout: Number of seconds to wait for each wave of data
+                      pods, and for each other component.
+               timer: If specified, a timing.Timer that a span for
+                      each wave and component is recorded in.
+        """
+        if not logger:
+            logger = Logger()
+        self.logger = logger
+        self.timer = timer or Timer()
+        self.namespace = solution['namespace']
+        self.images = component_images(image)
+        self.max_unavailable = max_unavailable
+        self.timeout = timeout
+        self.waves = []
+
+    def _kubectl(self, *args):
+        cmd = ['kubectl'] + list(args) + ['--namespace', self.namespace]
+        child = subprocess.run(cmd, stdout=subprocess.PIPE,  # nosec B603
+                               stderr=subprocess.PIPE, check=False)
+        if child.returncode != 0:
+            raise UpgradeError(f'kubectl {" ".join(args[:2])} failed: '
+                               f'{child.stderr.decode().strip()}')
+
+    def _patch(self, workload, patch):
+        self._kubectl('patch', workload['kind'].lower(),
+                      workload['metadata']['name'], '--patch',
+                      json.dumps(patch))
+
+    def _patch_all(self, patches):
+        """Apply (workload, patch) pairs concurrently."""
+        with ThreadPoolExecutor(max_workers=MAX_PATCH_WORKERS) as executor:
+            for future in [executor.submit(self._patch, workload, patch)
+                           for workload, patch in patches]:
+                future.result()
+
+    def _image_patch(self, workload, image):
+        spec = workload['spec']['template']['spec']
+        return {'spec': {'template': {'spec': {
+            key: [{'name': c['name'], 'image': image}
+                  for c in spec.get(key, [])]
+            for key in ('initContainers', 'containers') if spec.get(key)}}}}
+
+    def _check_ready(self, snapshot):
+        pods = snapshot.get('Pod', CORTX_SELECTOR, namespace=self.namespace)
+        not_ready = [p['metadata']['name'] for p in pods if not pod_ready(p)]
+        if not_ready:
+            raise UpgradeError(f'{len(not_ready)} pods are not ready, e.g. '
+                               f"'{not_ready[0]}'.  Ensure all pods are "
+                               f'healthy and try again.')
+
+    def _wait(self, watch, title, predicate):
+        state = {'last': None}
+
+        def done(pods):
+            finished, progress = predicate(pods)
+            if progress != state['last']:
+                state['last'] = progress
+                self.logger.log(f'{title}: {progress}')
+            return finished
+
+        if not watch.wait_for(done, self.timeout):
+            raise UpgradeError(f'Timed out after {self.timeout}s waiting '
+                               f'for {title}')
+
+    def run(self):
+        """Upgrade all components, in the order they are started in."""
+        snapshot = Snapshot.from_cluster(self.namespace,
+                                         kinds='deployments,statefulsets,pods')
+        self._check_ready(snapshot)
+        with Watch('pods', self.namespace, CORTX_SELECTOR) as watch:
+            for tier in reversed(TIERS):
+                kind = 'Deployment' if tier.kind == 'deployment' \
+                    else 'StatefulSet'
+                workloads = snapshot.get(kind, tier.selector,
+                                         namespace=self.namespace)
+                if not workloads:
+                    continue
+                self.logger.logheader(f'Upgrade {tier.title}')
+                with self.timer.span(f'Upgrade {tier.title}'):
+                    if tier.component == 'data':
+                        self._upgrade_data(watch, workloads, snapshot)
+                    else:
+                        self._upgrade_tier(watch, tier, workloads)
+
+    def _upgrade_tier(self, watch, tier, workloads):
+        image = self.images[tier.component]
+        pending = [w for w in workloads if template_images(w) != {image}]
+        if pending:
+            self._patch_all((w, self._image_patch(w, image))
+                            for w in pending)
+        expected = sum(w['spec'].get('replicas', 1) for w in workloads)
+        terms = parse_selector(tier.selector)
+
+        def upgraded(pods):
+            pods = [p for p in pods
+                    if match_labels(p['metadata'].get('labels') or {}, terms)]
+            failed = [p['metadata']['name'] for p in pods if pod_failed(p)]
+            if failed:
+                raise UpgradeError(f"'{failed[0]}' pod failed to start")
+            ready = sum(1 for p in pods
+                        if pod_ready(p) and pod_images(p) == {image})
+            return (ready == expected == len(pods),
+                    f'{ready}/{expected} pods upgraded')
+
+        self._wait(watch, tier.title, upgraded)
+
+    def _upgrade_data(self, watch, statefulsets, snapshot):
+        image = self.images['data']
+        names = {sts['metadata']['name'] for sts in statefulsets}
+
+        # Stop the controller from rolling the pods itself.  The
+        # strategy is kept in an annotation, so that it can also be
+        # restored after an interrupted upgrade is resumed.
+        patches = []
+        restore = []
+        for sts in statefulsets:
+            strategy = sts['spec'].get('updateStrategy') or {}
+            saved = (sts['metadata'].get('annotations') or {}).get(
+                STRATEGY_ANNOTATION)
+            patch = self._image_patch(sts, image)
+            if saved is None and strategy.get('type') != 'OnDelete':
+                saved = json.dumps(strategy)
+                patch['metadata'] = {'annotations': {
+                    STRATEGY_ANNOTATION: saved}}
+                patch['spec']['updateStrategy'] = {'type': 'OnDelete',
+                                                   'rollingUpdate': None}
+            patches.append((sts, patch))
+            if saved is not None:
+                restore.append((sts, {
+                    'metadata': {'annotations': {STRATEGY_ANNOTATION: None}},
+                    'spec': {'updateStrategy': json.loads(saved)}}))
+        self._patch_all(patches)
+
+        pods = [p for p in snapshot.get('Pod', CORTX_SELECTOR,
+                                        namespace=self.namespace)
+                if _owner(p) in names]
+        total = len(pods)
+        pending = sorted((p for p in pods if pod_images(p) != {image}),
+                         key=lambda p: (p['spec'].get('nodeName') or '',
+                                        p['metadata']['name']))
+        size = parse_max_unavailable(self.max_unavailable, total)
+        self.logger.log(f'{len(pending)} of {total} data pods to upgrade, '
+                        f'{size} at a time')
+
+        for start in range(0, len(pending), size):
+            self._upgrade_wave(watch, len(self.waves) + 1, image,
+                               pending[start:start + size])
+
+        # Every pod is upgraded, so this does not start a rollout
+        self._patch_all(restore)
+
+    def _upgrade_wave(self, watch, number, image, pods):
+        old_uids = {p['metadata']['name']: p['metadata']['uid'] for p in pods}
+        nodes = sorted({p['spec'].get('nodeName') or '?' for p in pods})
+        title = f'Data wave {number}'
+        self.logger.log(f'{title}: upgrading {", ".join(sorted(old_uids))} '
+                        f'on {", ".join(nodes)}')
+
+        def upgraded(objs):
+            ready = 0
+            for pod in objs:
+                name = pod['metadata']['name']
+                if name not in old_uids or \
+                        pod['metadata']['uid'] == old_uids[name]:
+                    continue
+                if pod_failed(pod):
+                    raise UpgradeError(f"'{name}' pod failed to start")
+                if pod_ready(pod) and pod_images(pod) == {image}:
+                    ready += 1
+            return (ready == len(old_uids),
+                    f'{ready}/{len(old_uids)} pods upgraded')
+
+        start = time.monotonic()
+        with self.timer.span(f'Upgrade {title}', pods=len(pods),
+                             nodes=nodes):
+            self._kubectl('delete', 'pods', *sorted(old_uids),
+                          '--wait=false')
+            self._wait(watch, title, upgraded)
+        elapsed = time.monotonic() - start
+        self.waves.append((title, len(pods), nodes, elapsed))
+        self.logger.log(f'{title} completed in {elapsed:.1f}s')
+
+    def report(self):
+        """Log the duration of each wave of data pods."""
+        if not self.waves:
+            return
+        self.logger.logheader('Data waves')
+        for title, count, nodes, elapsed in self.waves:
+            self.logger.log(f'{title:<14} {count:>4} pods  {elapsed:8.1f}s  '
+                            f'{", ".join(nodes)}')
+        total = sum(w[3] for w in self.waves)
+        self.logger.log(f'{len(self.waves)} waves in {total:.1f}s, '
+                        f'{total / len(self.waves):.1f}s per wave')
+
+
+def run_upgrade(solution, image, max_unavailable=1, logger=None,
+                timeout=DEFAULT_TIMEOUT, timer=None):
+    """Upgrade a cluster.  Returns 0 on success, 1 on failure."""
+    upgrade = ClusterUpgrade(solution, image, max_unavailable=max_unavailable,
+                             logger=logger, timeout=timeout, timer=timer)
+    try:
+        upgrade.run()
+    except (UpgradeError, KubectlError) as e:
+        upgrade.logger.logfail(f'Upgrade failed: {e}')
+        upgrade.logger.log('Run the upgrade again to resume it')
+        return 1
+    finally:
+        upgrade.report()
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description='Upgrade the CORTX images of a running cluster')
+    parser.add_argument('-s', '--solution', required=True)
+    parser.add_argument('-i', '--image', required=True,
+                        help='Any one of the cortx-data, cortx-rgw and '
+                             'cortx-control images to upgrade to')
+    parser.add_argument('--max-unavailable', default='1',
+                        help='Number or percentage of data pods to upgrade '
+                             'at a time (default: %(default)s)')
+    parser.add_argument('--timeout', type=int, default=DEFAULT_TIMEOUT,
+                        help='Seconds to wait for each wave and component '
+                             '(default: %(default)s)')
+    parser.add_argument('--timing-report',
+                        help='Save the timing of each wave to this JSON file')
+    args = parser.parse_args()
+
+    solution = safe_load(open(args.solution))['solution']
+    try:
+        parse_max_unavailable(args.max_unavailable, 1)
+    except ValueError:
+        parser.error(f'invalid --max-unavailable: {args.max_unavailable}')
+    timer = Timer()
+    result = run_upgrade(solution, args.image, args.max_unavailable,
+                         timeout=args.timeout, timer=timer)
+    if args.timing_report:
+        timer.save_report(args.timing_report)
+    sys.exit(result)
@@ -1,7 +1,14 @@
-import datetime
+import atexit
+import codecs
+import collections
+import json
 import os
+import shlex
+import shutil
 import subprocess  # nosec
 import sys
+import tempfile
+import threading
 import time
 
 
@@ -23,52 +30,109 @@ class Logger:
     FAILING = '\033[91m'
     ENDC = '\033[0m'
 
-    def __init__(self, logfile=None):
+    # Record levels used in JSON-lines output, by color
+    LEVELS = {
+        PASSING: 'pass',
+        FAILING: 'fail',
+        WARNING: 'warning',
+        HEADER: 'header',
+    }
+
+    def __init__(self, logfile=None, json_logfile=None, test_id=None,
+                 node=None, buffer_size=64*1024):
         """Class for facilitationg test output."""
         #Key elements:
         #  * Prepend a timestamp
         #  * Support terminal colord output
+        #  * Optionally copy output to logfile, and/or write it as
+        #    JSON-lines records (timestamp, level, test_id, node,
+        #    message) to json_logfile.  Both files are written
+        #    through buffers of buffer_size bytes; call flush() or
+        #    close() to write them out (done automatically at exit).
+        #  * test_id and node are the defaults for the JSON record
+        #    fields of the same name.  log() can override them.
 
         # Default is to log only things that are logged all the time
         # By raising this level you can get more verbose logging
         self.loglevel = 0
         self.shortdate = False
+        self.test_id = test_id
+        self.node = node
         self.f = None
         if logfile:
-            self.f = open(logfile, 'a')
+            self.f = open(logfile, 'a', buffering=buffer_size)
+        self.jf = None
+        if json_logfile:
+            self.jf = open(json_logfile, 'a', buffering=buffer_size)
+        if self.f or self.jf:
+            atexit.register(self.flush)
+        # Serializes output from concurrent threads
+        self.lock = threading.Lock()
+        # Formatted timestamps are cached for the current second
+        self._ts_second = None
+        self._ts = None
+
+    def _timestamps(self):
+        """Return (short, long, iso) timestamp strings for now."""
+        now = time.time()
+        second = int(now)
+        if second != self._ts_second:
+            t = time.localtime(second)
+            self._ts = (time.strftime('%H:%M:%S', t),
+                        time.strftime('%Y-%m-%d %H:%M:%S', t),
+                        time.strftime('%Y-%m-%dT%H:%M:%S%z', t))
+            self._ts_second = second
+        return self._ts
 
     def timestamp(self):
-        if self.shortdate:
-            datestr = datetime.datetime.now().strftime('%H:%M:%S')
-        else:
-            datestr = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        return datestr + ' '
+        short, long_, _ = self._timestamps()
+        return (short if self.shortdate else long_) + ' '
 
-    def log(self, s='', prefix=None, level=0, color=None, log_timestamp=True):
+    def log(self, s='', prefix=None, level=0, color=None, log_timestamp=True,
+            test_id=None, node=None):
         if level > self.loglevel:
             return
 
         if not s:
             # empty string should at least print a newline
             s = ' '
-        for line in s.splitlines():
-            if prefix is not None:
-                line = prefix + ' ' + line
+        lines = s.splitlines() if '\n' in s or '\r' in s else [s]
+        if prefix is not None:
+            lines = [prefix + ' ' + line for line in lines]
+        with self.lock:
+            if log_timestamp or self.jf:
+                _, _, iso = self._timestamps()
+                ts = self.timestamp()
             if log_timestamp:
-                line = self.timestamp() + line
+                lines = [ts + line for line in lines]
+            text = '\n'.join(lines) + '\n'
             if color:
-                pline = color + line + Logger.ENDC
+                sys.stdout.write(''.join(color + line + Logger.ENDC + '\n'
+                                         for line in lines))
             else:
-                pline = line
-            print(pline)
+                sys.stdout.write(text)
+            sys.stdout.flush()
             if self.f:
-                print(line, file=self.f)
+                self.f.write(text)
+            if self.jf:
+                self._write_json(s, iso, color, test_id, node)
+
+    def _write_json(self, s, timestamp, color, test_id, node):
+        record = {
+            'timestamp': timestamp,
+            'level': Logger.LEVELS.get(color, 'info'),
+            'test_id': test_id or self.test_id,
+            'node': node or self.node,
+        }
+        for line in s.splitlines() or ['']:
+            record['message'] = line
+            self.jf.write(json.dumps(record) + '\n')
 
-    def logpass(self, s=''):
-        self.log(s, color=Logger.PASSING)
+    def logpass(self, s='', node=None):
+        self.log(s, color=Logger.PASSING, node=node)
 
-    def logfail(self, s=''):
-        self.log(s, color=Logger.FAILING)
+    def logfail(self, s='', node=None):
+        self.log(s, color=Logger.FAILING, node=node)
 
     def logwarning(self, s=''):
         self.log(s, color=Logger.WARNING)
@@ -83,9 +147,51 @@ class Logger:
         else:
             dashstr = '-' * (separator_width - len(hstr))
         self.log(hstr + ' ' + dashstr)
-        self.log(open(filename).read())
+        # Log the file in batches of lines rather than reading it whole
+        with open(filename, errors='replace') as f:
+            while True:
+                lines = f.readlines(64*1024)
+                if not lines:
+                    break
+                self.log(''.join(lines))
         self.log('-'*separator_width)
 
+    def tee(self):
+        """Return a binary file object that copies raw output to the log file.
+
+           Returns None if there is no log file.  Use it as the logfile
+           of stream() to log the output of a command as is.
+        """
+        return _LogTee(self) if self.f else None
+
+    def flush(self):
+        with self.lock:
+            for f in (self.f, self.jf):
+                if f and not f.closed:
+                    f.flush()
+
+    def close(self):
+        self.flush()
+        with self.lock:
+            for f in (self.f, self.jf):
+                if f:
+                    f.close()
+        atexit.unregister(self.flush)
+
+
+class _LogTee:
+    def __init__(self, logger):
+        """Writes bytes to the buffered log file of a Logger."""
+        self.logger = logger
+        # Output is read in chunks that may split multi-byte characters
+        self.decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+    def write(self, data):
+        text = self.decoder.decode(data)
+        if text:
+            with self.logger.lock:
+                self.logger.f.write(text)
+
 
 class StopWatch:
     def __init__(self):
@@ -94,45 +200,241 @@ class StopWatch:
         self.stoptime = 0
 
     def start(self):
-        self.starttime = time.time()
+        self.starttime = time.perf_counter()
 
     def stop(self):
-        self.stoptime = time.time()
+        self.stoptime = time.perf_counter()
 
     def elapsed(self):
         return self.stoptime - self.starttime
 
 
-def run(cmd, cwd=None, return_stdout=False):
-    print(f"Running: {cmd}, cwd={cwd}")
-    stdout = []
-    proc = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, # nosec B603
-                            stderr=subprocess.STDOUT)
+class OutputBuffer:
+    def __init__(self, spill_size=1024*1024, max_size=None):
+        """Bounded store for captured command output.
+
+           By default all output is kept: the first spill_size bytes in
+           memory, and anything beyond that in a temporary file.  If
+           max_size is specified, only the last max_size bytes are kept
+           (in memory), like a ring buffer.
+        """
+        self.max_size = max_size
+        self.size = 0
+        if max_size:
+            self.chunks = collections.deque()
+            self.f = None
+        else:
+            self.f = tempfile.SpooledTemporaryFile(max_size=spill_size)
+
+    def write(self, data):
+        if self.f:
+            self.f.write(data)
+            return
+        self.chunks.append(data)
+        self.size += len(data)
+        while self.size - len(self.chunks[0]) >= self.max_size:
+            self.size -= len(self.chunks.popleft())
+
+    def getvalue(self):
+        if self.f:
+            self.f.seek(0)
+            data = self.f.read()
+        else:
+            data = b''.join(self.chunks)[-self.max_size:]
+        return data.decode('utf-8', errors='replace')
+
+    def close(self):
+        if self.f:
+            self.f.close()
+
+
+def stream(proc, echo=True, logfile=None, on_line=None, capture=None,
+           chunk_size=64*1024):
+    """Copy the output of a child process as it is produced.
+
+       Output is read in chunks of up to chunk_size bytes, as soon as
+       it is available, rather than line by line.
+
+       Arguments:
+           proc: subprocess.Popen object with stdout=subprocess.PIPE
+           echo: If true, write the output to stdout
+           logfile: Optional binary file object the output is copied to,
+                  e.g. Logger.tee()
+           on_line: Optional callable called with each decoded line of
+                  output (without the line ending)
+           capture: Optional OutputBuffer the output is written to
+    """
+    fd = proc.stdout.fileno()
+    out = getattr(sys.stdout, 'buffer', None) if echo else None
+    if echo:
+        sys.stdout.flush()
+    partial = b''
     while True:
-        out = proc.stdout.readline().decode('utf-8')
-        if not out:
+        data = os.read(fd, chunk_size)
+        if not data:
             break
-        sys.stdout.write(out)
-        sys.stdout.flush()
-        stdout.append(out)
+        if echo:
+            if out:
+                out.write(data)
+                out.flush()
+            else:
+                sys.stdout.write(data.decode('utf-8', errors='replace'))
+                sys.stdout.flush()
+        if logfile:
+            logfile.write(data)
+        if capture:
+            capture.write(data)
+        if on_line:
+            lines = (partial + data).split(b'\n')
+            partial = lines.pop()
+            for line in lines:
+                on_line(line.decode('utf-8', errors='replace').rstrip('\r'))
+    if on_line and partial:
+        on_line(partial.decode('utf-8', errors='replace').rstrip('\r'))
+    proc.stdout.close()
+
+
+def run(cmd, cwd=None, return_stdout=False, on_line=None, max_stdout=None,
+        env=None, logger=None):
+    """Run a command, streaming its output to stdout.
+
+       Arguments:
+           cmd: Command to run, as a list
+           cwd: Directory to run the command in
+           return_stdout: If true, return (result, stdout) instead of
+                  just result.  Output beyond 1 MiB is spilled to disk.
+           on_line: Optional callable called with each line of output
+           max_stdout: If specified, only the last max_stdout bytes of
+                  output are returned
+           env: Optional environment for the command
+           logger: If specified, the output is also copied to the log
+                  file of this Logger
+    """
+    print(f"Running: {cmd}, cwd={cwd}")
+    proc = subprocess.Popen(cmd, cwd=cwd, stdout=subprocess.PIPE, # nosec B603
+                            stderr=subprocess.STDOUT, env=env)
+    capture = OutputBuffer(max_size=max_stdout) if return_stdout else None
+    stream(proc, on_line=on_line, capture=capture,
+           logfile=logger.tee() if logger else None)
 
     result = proc.wait()
     if return_stdout:
-        return result, '\n'.join(stdout)
+        stdout = capture.getvalue()
+        capture.close()
+        return result, stdout
     return result
 
 
+# Serializes console writes from concurrent RemoteRun streams so lines
+# from different nodes are never interleaved mid-line.
+_output_lock = threading.Lock()
+
+
+class SSHConnectionPool:
+    def __init__(self, idle_timeout=60, ssh='ssh'):
+        """Pool of multiplexed SSH connections, one per user@host.
+
+           The first command run against a user@host starts an OpenSSH
+           control master.  Later ssh and rsync commands to the same
+           target reuse its control channel instead of doing a new
+           handshake.  A master that has been idle for idle_timeout
+           seconds exits on its own (0 keeps it until close() is
+           called); close() shuts down all of them.
+
+           ssh is the ssh executable to use.  Tests may point this at
+           a fake transport.
+        """
+        self.idle_timeout = idle_timeout
+        self.ssh = ssh
+        self.control_dir = None
+        self.targets = set()
+        self._lock = threading.Lock()
+
+    def _control_path(self):
+        with self._lock:
+            if not self.control_dir:
+                self.control_dir = tempfile.mkdtemp(prefix='cortx-ssh-')
+        # %C is a hash of the connection parameters.  It keeps the socket
+        # path short enough for the unix socket path limit.
+        return os.path.join(self.control_dir, '%C')
+
+    def ssh_command(self, user, host):
+        """Return the ssh command prefix to use for user@host."""
+        with self._lock:
+            self.targets.add((user, host))
+        opts = [
+            '-o', 'ControlMaster=auto',
+            '-o', f'ControlPath={self._control_path()}',
+            '-o', f'ControlPersist={self.idle_timeout}',
+        ]
+        return ' '.join([self.ssh] + [shlex.quote(o) for o in opts])
+
+    def close(self):
+        """Shut down all control masters started by this pool."""
+        with self._lock:
+            targets = sorted(self.targets)
+            self.targets.clear()
+        for user, host in targets:
+            cmd = [self.ssh, '-o', f'ControlPath={self._control_path()}',
+                   '-O', 'exit', f'{user}@{host}']
+            subprocess.run(cmd, stdout=subprocess.DEVNULL,  # nosec B603
+                           stderr=subprocess.DEVNULL, check=False)
+        with self._lock:
+            if self.control_dir:
+                shutil.rmtree(self.control_dir, ignore_errors=True)
+                self.control_dir = None
+
+
 class RemoteRun:
-    def __init__(self, host, user):
-        """Class for facilitating running remote commands."""
+    def __init__(self, host, user, prefix=None, pool=None, logger=None):
+        """Class for facilitating running remote commands.
+
+           If prefix is specified, command output is captured and each
+           line is prefixed with it before being written to stdout.
+           This is useful when running on several hosts concurrently.
+
+           If pool is specified, it is an SSHConnectionPool whose
+           multiplexed connection to user@host is reused.
+
+           If logger is specified, command output is captured and
+           logged through it, with host as the node of each record.
+        """
         self.host = host
         self.user = user
+        self.prefix = prefix
+        self.pool = pool
+        self.logger = logger
+
+    def _ssh(self):
+        if self.pool is None:
+            return 'ssh'
+        return self.pool.ssh_command(self.user, self.host)
+
+    def _print(self, s):
+        if self.logger:
+            self.logger.log(s, prefix=self.prefix, log_timestamp=False,
+                            node=self.host)
+            return
+        if self.prefix is not None:
+            s = f'{self.prefix} {s}'
+        with _output_lock:
+            print(s)
+            sys.stdout.flush()
+
+    def _system(self, cmd):
+        if self.prefix is None and not self.logger:
+            return os.system(cmd)  # nosec
+
+        proc = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE,  # nosec
+                                stderr=subprocess.STDOUT)
+        stream(proc, echo=False, on_line=self._print)
+        return proc.wait()
 
     def test(self):
         cmd = 'date &> /dev/null'
         sys.stdout.flush()
         sys.stderr.flush()
-        result = os.system(f'ssh {self.user}@{self.host} "{cmd}"')
+        result = os.system(f'{self._ssh()} {self.user}@{self.host} "{cmd}"')  # nosec
         sys.stdout.flush()
         sys.stderr.flush()
         if result != 0:
@@ -140,11 +442,11 @@ class RemoteRun:
                                  f'{self.user}@{self.host}')
 
     def run(self, cmd):
-        cmd = f'ssh {self.user}@{self.host} "{cmd}"'
-        print(f"Running: {cmd}")
+        cmd = f'{self._ssh()} {self.user}@{self.host} "{cmd}"'
+        self._print(f"Running: {cmd}")
         sys.stdout.flush()
         sys.stderr.flush()
-        result = os.system(cmd)
+        result = self._system(cmd)
         sys.stdout.flush()
         sys.stderr.flush()
         return result
@@ -152,12 +454,15 @@ class RemoteRun:
     def scp(self, sourcefiles, dest):
         if isinstance(sourcefiles, list):
             sourcefiles = ' '.join(sourcefiles)
-        self.run(f'mkdir -p {dest}')
-        cmd = f'rsync {sourcefiles} {self.user}@{self.host}:{dest}'
-        print(f"Running: {cmd}")
+        # Create the destination directory as part of the rsync
+        # connection rather than with a separate ssh round trip.
+        cmd = (f'rsync -e {shlex.quote(self._ssh())} '
+               f'--rsync-path="mkdir -p {dest} && rsync" '
+               f'{sourcefiles} {self.user}@{self.host}:{dest}')
+        self._print(f"Running: {cmd}")
         sys.stdout.flush()
         sys.stderr.flush()
-        result = os.system(cmd)
+        result = self._system(cmd)
         sys.stdout.flush()
         sys.stderr.flush()
         return result